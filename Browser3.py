@@ -1,4 +1,5 @@
 import sys
+import re
 import socket
 import json
 import os
@@ -7,19 +8,35 @@ import threading
 import time
 import hashlib
 import sqlite3
-from datetime import datetime, timedelta
-from urllib.parse import urlparse
-from PyQt5.QtCore import QUrl, pyqtSignal, QObject, QTimer, pyqtSlot, QThread, QSettings, Qt
-from PyQt5.QtGui import QKeySequence, QFont, QIcon, QPixmap
+import queue
+import bisect
+import heapq
+import ssl
+import http.client
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from html import unescape
+from itertools import islice, zip_longest
+from urllib.parse import urlparse, urlsplit, urljoin, parse_qs
+from PyQt5.QtCore import (
+    QUrl, pyqtSignal, QObject, QTimer, pyqtSlot, QThread, QSettings, Qt, QRunnable, QThreadPool,
+    QAbstractListModel, QAbstractItemModel, QModelIndex, QBuffer, QByteArray, QIODevice, QSize, QFile, QRect
+)
+from PyQt5.QtGui import QKeySequence, QFont, QIcon, QPixmap, QImage, QImageWriter
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget,
     QPushButton, QLineEdit, QHBoxLayout, QTabWidget, QToolBar, QAction,
     QShortcut, QMessageBox, QDialog, QLabel, QComboBox, QProgressBar,
     QTextEdit, QCheckBox, QSlider, QSpinBox, QGroupBox, QSplitter,
-    QListWidget, QListWidgetItem, QMenu, QSystemTrayIcon, QFrame,
-    QDialogButtonBox
+    QMenu, QSystemTrayIcon, QFrame,
+    QDialogButtonBox, QCompleter, QFileDialog, QProgressDialog, QTreeView, QListView
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineProfile, QWebEngineSettings
+from PyQt5.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+from PyQt5.QtWebChannel import QWebChannel
 
 # --- Constants and Configuration ---
 APP_NAME = "Null Browser"
@@ -28,7 +45,99 @@ DEFAULT_TOR_PORTS = [9050, 9150]
 DEFAULT_DOWNLOAD_FOLDER_NAME = "NullBrowser_Media"
 HISTORY_DB_NAME = "history.db"
 BOOKMARKS_FILE_NAME = "bookmarks.json"
+FAVICON_MAP_FILE_NAME = "favicon_map.json"  # Optional user additions to the emoji favicon map
+FAVICON_CACHE_DIR_NAME = "favicons"  # Real site favicons, one PNG per distinct icon
+THUMBNAIL_CACHE_DIR_NAME = "thumbnails"  # Start page screenshots of top sites, one file per URL
+LEGACY_HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".null_browser_history.jsonl")  # browser.py's journal
 BROWSER_DATA_DIR = os.path.join(os.path.expanduser("~"), ".null_browser")
+# Internal pages: null://home/ is served by NullSchemeHandler; null://<action> links trigger browser actions
+NULL_SCHEME = b"null"
+HOMEPAGE_URL = "null://home/"
+NULL_ACTIONS = ('clear-history', 'settings', 'downloads')
+NULL_API_MAX_ROWS = 500  # Largest "limit" the JSON endpoints accept
+HOMEPAGE_RECENT_SITES = 12
+HOMEPAGE_MOST_VISITED = 8
+
+# SQLite tuning for the long-lived history connections
+SQLITE_CACHE_SIZE_KB = 8192  # Page cache per connection (negative PRAGMA value = KiB)
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024  # Memory-mapped I/O window
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_STATEMENT_CACHE = 256  # Prepared statements kept per connection
+HISTORY_FLUSH_INTERVAL_MS = 500  # Longest a queued visit waits before being committed
+HISTORY_FLUSH_MAX_EVENTS = 64  # Queued visits that force an early commit
+# history.db schema: version 1 stores visit times as integer epoch microseconds (UTC)
+HISTORY_SCHEMA_VERSION = 1
+HISTORY_MIGRATION_CHUNK = 5000  # Rows converted per writer transaction during the upgrade
+HISTORY_PURGE_CHUNK = 1000  # History entries handled per writer transaction when clearing a time range
+HISTORY_DELETE_BATCH = 500  # URLs or domains bound per DELETE ... IN (...) statement of a bulk delete
+HISTORY_IGNORED_SCHEMES = ('data:', 'about:', 'chrome:', 'devtools:', 'null:')
+HISTORY_IMPORT_BATCH = 20000  # Rows per transaction (and per read) when importing or exporting history
+CHROME_EPOCH_OFFSET_US = 11644473600 * 1_000_000  # Chrome counts microseconds from 1601-01-01
+BOOKMARK_DEFAULT_FOLDER = "General"
+BOOKMARK_FETCH_BATCH = 200  # Bookmark tree rows read per fetchMore when a folder is expanded or scrolled
+BOOKMARK_IMPORT_BATCH = 5000  # Rows per transaction when importing bookmark HTML
+BOOKMARK_IMPORT_CHUNK = 64 * 1024  # Characters of bookmark HTML parsed at a time
+# Bookmark link checks: states stored in link_checks.state, and how the checks are run
+LINK_OK = 0
+LINK_REDIRECTED = 1
+LINK_SLOW = 2
+LINK_BROKEN = 3  # The server answered with an error status
+LINK_UNREACHABLE = 4  # DNS, connection, TLS or timeout failure
+LINK_STATES = (LINK_OK, LINK_REDIRECTED, LINK_SLOW, LINK_BROKEN, LINK_UNREACHABLE)
+LINK_CHECK_WORKERS = 32
+LINK_CHECK_PER_HOST = 2  # Concurrent requests per host, to stay polite
+LINK_CHECK_TIMEOUT_S = 8
+LINK_CHECK_SLOW_MS = 3000
+LINK_CHECK_MAX_REDIRECTS = 5
+LINK_CHECK_TTL_S = 7 * 24 * 3600  # Results younger than this are not checked again
+LINK_CHECK_BATCH = 200  # Results written per transaction
+# Visit transition types, stored in visits.transition
+TRANSITION_LINK = 0
+TRANSITION_TYPED = 1
+TRANSITION_BOOKMARK = 2
+TRANSITION_RELOAD = 3
+TRANSITION_REDIRECT = 4  # Older visits only; redirects now keep the transition that started them
+# Frecency: each visit adds a bonus by transition type, and all scores decay on a schedule
+FRECENCY_TRANSITION_BONUS = {
+    TRANSITION_LINK: 100.0, TRANSITION_TYPED: 200.0, TRANSITION_BOOKMARK: 140.0,
+    TRANSITION_RELOAD: 0.0, TRANSITION_REDIRECT: 25.0
+}
+FRECENCY_DECAY_INTERVAL_S = 24 * 3600
+FRECENCY_DECAY_FACTOR = 0.975  # Per interval; roughly a four-week half-life
+SIDEBAR_HISTORY_ROWS = 10
+AUTOCOMPLETE_MAX_RESULTS = 8
+AUTOCOMPLETE_LOAD_DELAY_MS = 500  # Index is built this long after the window first shows
+AUTOCOMPLETE_SPARSE_LIMIT = 4000  # Above this many postings a term is "broad" and served by a frecency scan
+AUTOCOMPLETE_TOKEN_PATTERN = re.compile(r'\w+')
+AUTOCOMPLETE_IGNORED_TOKENS = frozenset(('http', 'https', 'www'))
+FTS_CANDIDATE_LIMIT = 200  # Highest-frecency text matches re-ranked by bm25, visit count and recency
+FTS_COMMON_MATCHES = 10000  # Searches matching more rows walk idx_frecency rather than every match
+FTS_TOKEN_PATTERN = re.compile(r'\w+')
+HISTORY_SEARCH_DEBOUNCE_MS = 150  # Typing pause before the history dialog searches
+HISTORY_SEARCH_LIMIT = 500  # Most results a history dialog search returns
+HISTORY_SEARCH_PAGE = 50  # Results handed to the view at a time
+HISTORY_SEARCH_PROGRESS_OPS = 1000  # SQLite steps between checks for a cancelled search
+HISTORY_BROWSER_PAGE = 200  # History dialog entries read per keyset page
+HISTORY_BROWSER_CACHED_PAGES = 16  # Pages whose rows are kept; the others are read again when scrolled back to
+DEFAULT_FAVICON = '🌐'
+FAVICON_MEMO_SIZE = 4096  # Domains whose favicon lookups are remembered
+FAVICON_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Least recently used icons are evicted past this
+FAVICON_ICON_CACHE_SIZE = 256  # Decoded QIcons kept in memory
+FAVICON_PIXELS = 32  # Site icons are stored as PNG at this size
+FAVICON_TOUCH_INTERVAL_US = 3600 * 1_000_000  # An icon's last use is written at most this often
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Least recently used thumbnails are removed past this
+THUMBNAIL_SIZE = QSize(400, 250)  # Stored size; pages are captured at the same 16:10 shape
+THUMBNAIL_QUALITY = 80  # WebP quality where the image plugin is installed; PNG is stored otherwise
+THUMBNAIL_TOP_SITES = 24  # Only sites this high in frecency are captured
+THUMBNAIL_CAPTURE_DELAY_MS = 3000  # After loadFinished, so late images are in and the load itself is never slowed
+THUMBNAIL_CAPTURE_INTERVAL_MS = 2000  # At most one capture this often
+THUMBNAIL_REFRESH_INTERVAL_S = 6 * 3600  # A site's thumbnail is not captured again before it is this old
+THUMBNAIL_TOUCH_INTERVAL_S = 3600  # A thumbnail's last use (its file time) is written at most this often
+THUMBNAIL_WORKERS = 2
+NEW_TAB_POOL_SIZE = 2  # Start pages kept loaded in hidden views, ready for the next new tab
+NEW_TAB_POOL_MAX_MEMORY_MB = 2048  # The pool stops growing while the browser and its web processes use more
+NEW_TAB_POOL_START_DELAY_MS = 3000  # The first pooled view is made this long after startup
+NEW_TAB_POOL_REFILL_DELAY_MS = 1000  # Pause after a new tab, and between pooled views, before making the next
 
 # --- Global Dark Theme Stylesheet (QSS) ---
 DARK_THEME_STYLESHEET = """
@@ -213,21 +322,21 @@ QCheckBox::indicator:checked {
     background-color: #4285f4;
     image: url(check_icon.png); /* Placeholder for a custom check icon */
 }
-QListWidget {
+QListWidget, QTreeView {
     background-color: #2d2d2d;
     color: #e0e0e0;
     border: 1px solid #4a4a4a;
     border-radius: 5px;
     padding: 5px;
 }
-QListWidget::item {
+QListWidget::item, QTreeView::item {
     padding: 5px;
 }
-QListWidget::item:selected {
+QListWidget::item:selected, QTreeView::item:selected {
     background-color: #4285f4;
     color: #ffffff;
 }
-QListWidget::item:hover {
+QListWidget::item:hover, QTreeView::item:hover {
     background-color: #3a3a3a;
 }
 QMenu {
@@ -318,7 +427,18 @@ def setup_webengine_settings():
     except Exception as e:
         print(f"⚠️ WebEngine configuration error: {e}")
 
+def register_null_scheme():
+    """
+    Registers null:// with Chromium; this must happen before the QApplication is created.
+    As a local scheme, web pages can neither load nor navigate to null:// URLs.
+    """
+    scheme = QWebEngineUrlScheme(NULL_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalScheme)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
 setup_webengine_settings()
+register_null_scheme()
 
 # --- Proxy Management ---
 class ProxyManager:
@@ -352,39 +472,1512 @@ class ProxyManager:
             return {"type": "socks5", "host": "127.0.0.1", "port": self.tor_port}
         return {"type": "direct"}
 
+# --- History Storage ---
+class HistoryDatabase:
+    """
+    Long-lived SQLite connections for the history database.
+    One writer connection is shared behind a lock; every thread that reads gets its
+    own reader connection. WAL journaling lets readers run while a write is in progress.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        self.generation = 0 # Bumped after every committed write; cached query results are stamped with it
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """Opens a connection with the shared pragmas applied."""
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, cached_statements=SQLITE_STATEMENT_CACHE)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA foreign_keys=ON')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+        return conn
+
+    def read(self) -> sqlite3.Connection:
+        """Returns the calling thread's reader connection, opening it on first use."""
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = self._connect(read_only=True)
+            self._local.reader = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def release_reader(self):
+        """Closes the calling thread's reader connection; for short-lived worker threads."""
+        conn = getattr(self._local, 'reader', None)
+        if conn is not None:
+            self._local.reader = None
+            with self._readers_lock:
+                self._readers.remove(conn)
+            conn.close()
+
+    @contextmanager
+    def write(self):
+        """Yields the writer connection inside a transaction, committing on success and bumping the generation."""
+        with self._write_lock:
+            with self._writer:
+                yield self._writer
+            self.generation += 1
+
+    def close(self):
+        """Closes every connection. Called once when the application shuts down."""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        with self._write_lock:
+            try:
+                self._writer.execute('PRAGMA optimize')
+            except sqlite3.Error as e:
+                print(f"History optimize error: {e}")
+            self._writer.close()
+
+class HistoryWriter(threading.Thread):
+    """
+    Write-behind thread for the history database.
+    Visits are queued from the GUI thread and committed in batches: repeat visits to the
+    same URL are merged, and a batch is written as one transaction every
+    HISTORY_FLUSH_INTERVAL_MS or once HISTORY_FLUSH_MAX_EVENTS visits are waiting.
+    Submitted tasks share the batch's transaction, each inside its own savepoint, so a failing task
+    only loses its own writes. Periodic maintenance tasks run on the same thread when they fall due.
+    """
+    _VISIT, _TASK, _FLUSH, _STOP = range(4)
+
+    class _Task:
+        """A submitted task, and the error it ended with."""
+        __slots__ = ('run', 'done', 'on_error', 'error')
+
+        def __init__(self, run, done: threading.Event, on_error):
+            self.run = run
+            self.done = done
+            self.on_error = on_error
+            self.error = None
+
+    def __init__(self, db: HistoryDatabase, interval_ms: int = HISTORY_FLUSH_INTERVAL_MS,
+                 max_events: int = HISTORY_FLUSH_MAX_EVENTS):
+        super().__init__(name="HistoryWriter", daemon=True)
+        self.db = db
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+        self.transactions_committed = 0
+        self.visits_queued = 0
+        self._queue = queue.Queue()
+        self._periodic = []
+
+    def add_visit(self, url: str, title: str, domain: str, favicon: str, visit_time: int,
+                  transition: int, frecency_bonus: float):
+        """Queues a visit made at visit_time (epoch microseconds); returns immediately."""
+        self.visits_queued += 1
+        self._queue.put((self._VISIT, (url, title, domain, favicon, visit_time, transition, frecency_bonus)))
+
+    def add_periodic(self, task, interval_s: float):
+        """Registers task(conn) to run every interval_s seconds. Must be called before start()."""
+        self._periodic.append([task, interval_s, 0.0])
+
+    def submit(self, task, wait: bool = False, on_error=None):
+        """
+        Queues task(conn) to run on the writer thread, in order with the queued visits.
+        With wait=True, blocks until the task's transaction has been committed, and raises the task's
+        error if it failed. Otherwise a failure is passed to on_error(exception) on the writer thread,
+        or printed when there is no on_error.
+        """
+        job = self._Task(task, threading.Event() if wait else None, on_error)
+        if self.is_alive():
+            self._queue.put((self._TASK, job))
+            if job.done:
+                job.done.wait()
+        else:
+            try:
+                with self.db.write() as conn:
+                    self._run_task(conn, job)
+            except Exception as e:
+                job.error = job.error or e
+            self._report(job)
+        if wait and job.error is not None:
+            raise job.error
+
+    @staticmethod
+    def _run_task(conn: sqlite3.Connection, job: '_Task'):
+        """Runs a task in its own savepoint, rolling back only its writes if it raises."""
+        conn.execute('SAVEPOINT task')
+        try:
+            job.run(conn)
+        except Exception as e:
+            conn.execute('ROLLBACK TO task')
+            job.error = e
+        conn.execute('RELEASE task')
+
+    @staticmethod
+    def _report(job: '_Task'):
+        """Hands a failed task's error to its submitter; one that waits raises it itself."""
+        if job.error is None or job.done:
+            return
+        if job.on_error:
+            try:
+                job.on_error(job.error)
+            except Exception as e:
+                print(f"History write error handler error: {e}")
+        else:
+            print(f"History write error: {job.error}")
+
+    def flush(self):
+        """Blocks until everything queued so far has been committed."""
+        if self.is_alive():
+            done = threading.Event()
+            self._queue.put((self._FLUSH, done))
+            done.wait()
+
+    def stop(self):
+        """Commits whatever is still queued and ends the thread."""
+        if self.is_alive():
+            self._queue.put((self._STOP, None))
+            self.join()
+
+    def run(self):
+        """Collects queued events into batches and commits each batch in one transaction."""
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self._seconds_until_periodic())]
+            except queue.Empty:
+                self._run_periodic()
+                continue
+            deadline = time.monotonic() + self.interval
+            pending_visits = 1 if batch[0][0] == self._VISIT else 0
+            while batch[-1][0] == self._VISIT and pending_visits < self.max_events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(event)
+                pending_visits += event[0] == self._VISIT
+            running = self._commit(batch)
+            if running and self._seconds_until_periodic() == 0:
+                self._run_periodic()
+        # Tasks queued by other tasks while stopping, e.g. the remaining chunks of a purge, still run.
+        while not self._queue.empty():
+            self._commit([self._queue.get()])
+
+    def _seconds_until_periodic(self):
+        """Seconds until the next periodic task is due, or None when there are none."""
+        if not self._periodic:
+            return None
+        return max(min(entry[2] for entry in self._periodic) - time.monotonic(), 0)
+
+    def _run_periodic(self):
+        """Runs every periodic task that is due, each in its own transaction."""
+        now = time.monotonic()
+        for entry in self._periodic:
+            task, interval_s, due = entry
+            if due <= now:
+                entry[2] = now + interval_s
+                try:
+                    with self.db.write() as conn:
+                        task(conn)
+                except Exception as e:
+                    print(f"History maintenance error: {e}")
+
+    def _commit(self, batch: list) -> bool:
+        """Writes one batch; returns False once a stop request has been handled."""
+        merged = {}
+        visits = []
+        waiters = []
+        running = True
+        jobs = []
+        try:
+            with self.db.write() as conn:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN') # So the task savepoints nest in the batch's transaction
+                for kind, payload in batch:
+                    if kind == self._VISIT:
+                        url, title, domain, favicon, visit_time, transition, bonus = payload
+                        previous = merged.get(url)
+                        if previous:
+                            merged[url] = (url, title or previous[1], domain, favicon, visit_time,
+                                           previous[5] + 1, previous[6] + bonus)
+                        else:
+                            merged[url] = (url, title, domain, favicon, visit_time, 1, bonus)
+                        visits.append((visit_time, transition, url))
+                    elif kind == self._TASK:
+                        # Tasks see every visit queued before them.
+                        self._write_visits(conn, merged, visits)
+                        jobs.append(payload)
+                        self._run_task(conn, payload)
+                        if payload.done:
+                            waiters.append(payload.done)
+                    else:
+                        if kind == self._STOP:
+                            running = False
+                        else:
+                            waiters.append(payload)
+                self._write_visits(conn, merged, visits)
+            self.transactions_committed += 1
+        except Exception as e:
+            print(f"History write error: {e}")
+            for job in jobs:
+                job.error = job.error or e # Rolled back with the rest of the batch
+        finally:
+            for job in jobs:
+                self._report(job)
+            for done in waiters:
+                done.set()
+        return running
+
+    @staticmethod
+    def _write_visits(conn: sqlite3.Connection, merged: dict, visits: list):
+        """Upserts the merged history rows, logs every individual visit, and empties both."""
+        if merged:
+            conn.executemany('''
+                INSERT INTO history (url, title, domain, favicon, visit_time, visit_count, frecency)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    title = excluded.title,
+                    visit_time = excluded.visit_time,
+                    visit_count = visit_count + excluded.visit_count,
+                    frecency = frecency + excluded.frecency
+            ''', merged.values())
+            conn.executemany('''
+                INSERT INTO visits (url_id, visit_time, transition)
+                SELECT id, ?, ? FROM history WHERE url = ?
+            ''', visits)
+            merged.clear()
+            visits.clear()
+
+class HistoryEntry:
+    """
+    One history row as returned by HistoryManager queries; visit_time is in epoch microseconds.
+    Cached query results hand out the same records, so treat them as read-only.
+    """
+    __slots__ = ('url', 'title', 'visit_time', 'favicon', 'domain', 'visit_count')
+
+    def __init__(self, url: str, title: str, visit_time: int, favicon: str, domain: str, visit_count: int):
+        self.url = url
+        self.title = title or domain or url
+        self.visit_time = visit_time
+        self.favicon = favicon
+        self.domain = domain
+        self.visit_count = visit_count
+
+    def to_dict(self) -> dict:
+        """The form the homepage's JavaScript expects; 'visitTime' is in epoch milliseconds."""
+        return {
+            'url': self.url,
+            'title': self.title,
+            'visitTime': self.visit_time // 1000,
+            'favicon': self.favicon,
+            'domain': self.domain,
+            'visitCount': self.visit_count
+        }
+
+# --- Bookmark Storage ---
+class BookmarkNode:
+    """One row of the bookmark tree: a folder, or a bookmark with a URL. added_time is in epoch microseconds."""
+    __slots__ = ('id', 'parent_id', 'is_folder', 'title', 'url', 'position', 'favicon', 'added_time')
+
+    def __init__(self, id: int, parent_id: int, is_folder: bool, title: str, url: str,
+                 position: int, favicon: str, added_time: int):
+        self.id = id
+        self.parent_id = parent_id
+        self.is_folder = bool(is_folder)
+        self.title = title or ''
+        self.url = url
+        self.position = position
+        self.favicon = favicon
+        self.added_time = added_time
+
+
+class BookmarkStore(QObject):
+    """
+    Bookmark tree stored in the history database: folders and bookmarks ordered by position
+    within their parent, plus free-form tags. Only the set of bookmarked URLs (for constant-time
+    "is bookmarked" checks) and the top-level folder names are kept in memory; folder contents
+    are read on demand.
+    Changes are applied to that in-memory state at once and written behind by the HistoryWriter.
+    Node ids and positions are assigned here, so callers get a complete node without waiting for the write.
+    """
+    node_added = pyqtSignal(object) # BookmarkNode
+    nodes_removed = pyqtSignal(list) # node ids; the subtrees of removed folders go with them
+    reset = pyqtSignal()
+    link_health_changed = pyqtSignal()
+
+    _COLUMNS = 'id, parent_id, is_folder, title, url, position, favicon, added_time'
+
+    def __init__(self, db: HistoryDatabase, writer: HistoryWriter, legacy_path: str, parent: QObject = None):
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self._url_counts = {} # url -> number of bookmarks with that URL
+        self._folder_ids = {} # top-level folder title -> id
+        self._next_positions = {} # parent id -> next free position, for parents touched this session
+        self.link_problems = {} # url -> (state, status, final url, error) for links whose last check was not LINK_OK
+        self._next_id = 1
+        self._id_lock = threading.Lock() # Bulk importers reserve ids from worker threads
+        self._unsynced = False
+        try:
+            with self.db.write() as conn:
+                self._create_tables(conn)
+                migrated = self._migrate_json(conn, legacy_path)
+            if migrated:
+                os.replace(legacy_path, legacy_path + '.migrated')
+            self._load_index()
+            self.refresh_link_health()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Bookmarks init error: {e}")
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        """Creates the bookmark tables; parent_id is NULL for top-level nodes."""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bookmarks (
+                id INTEGER PRIMARY KEY,
+                parent_id INTEGER REFERENCES bookmarks(id) ON DELETE CASCADE,
+                is_folder INTEGER NOT NULL DEFAULT 0,
+                title TEXT NOT NULL DEFAULT '',
+                url TEXT,
+                position INTEGER NOT NULL,
+                favicon TEXT,
+                added_time INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bookmark_tags (
+                bookmark_id INTEGER NOT NULL REFERENCES bookmarks(id) ON DELETE CASCADE,
+                tag TEXT NOT NULL COLLATE NOCASE,
+                PRIMARY KEY (bookmark_id, tag)
+            ) WITHOUT ROWID
+        ''')
+        # Covers ordered child listings (including "parent_id IS NULL") and the cascade on parent_id.
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_parent ON bookmarks(parent_id, position)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bookmarks_url ON bookmarks(url) WHERE url IS NOT NULL')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bookmark_tags_tag ON bookmark_tags(tag)')
+        # Latest BookmarkLinkChecker result per URL; checked_at is in epoch microseconds.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS link_checks (
+                url TEXT PRIMARY KEY,
+                state INTEGER NOT NULL,
+                status INTEGER,
+                final_url TEXT,
+                elapsed_ms INTEGER,
+                error TEXT,
+                checked_at INTEGER NOT NULL
+            )
+        ''')
+
+    def _migrate_json(self, conn: sqlite3.Connection, legacy_path: str) -> bool:
+        """
+        Copies bookmarks.json into the tree once, turning each 'folder' string into a top-level folder.
+        Returns True if the file was migrated and should be moved aside.
+        """
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'bookmarks_json_migrated'").fetchone():
+            return False
+        conn.execute("INSERT INTO meta (key, value) VALUES ('bookmarks_json_migrated', ?)", (int(time.time()),))
+        if not os.path.exists(legacy_path):
+            return False
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                bookmarks = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Bookmarks load error: {e}")
+            return False
+        next_id = (conn.execute('SELECT MAX(id) FROM bookmarks').fetchone()[0] or 0) + 1
+        now = int(time.time() * 1_000_000)
+        folders = {} # title -> [id, next position]
+        rows = []
+        for bookmark in bookmarks if isinstance(bookmarks, list) else ():
+            if not isinstance(bookmark, dict) or not bookmark.get('url'):
+                continue
+            title = bookmark.get('folder') or BOOKMARK_DEFAULT_FOLDER
+            if title not in folders:
+                folders[title] = [next_id, 0]
+                rows.append((next_id, None, 1, title, None, len(folders) - 1, None, now))
+                next_id += 1
+            folder = folders[title]
+            try:
+                added = int(datetime.fromisoformat(bookmark['added_time']).timestamp() * 1_000_000)
+            except (KeyError, TypeError, ValueError):
+                added = now
+            rows.append((next_id, folder[0], 0, bookmark.get('title') or '', bookmark['url'], folder[1],
+                         bookmark.get('favicon'), added))
+            folder[1] += 1
+            next_id += 1
+        conn.executemany(f'INSERT INTO bookmarks ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        print(f"📚 Migrated {len(rows) - len(folders)} bookmarks from {BOOKMARKS_FILE_NAME}.")
+        return True
+
+    def _load_index(self):
+        """Reads the bookmarked URLs, the top-level folders and the next free id."""
+        conn = self.db.read()
+        self._url_counts.clear()
+        for url, count in conn.execute('SELECT url, COUNT(*) FROM bookmarks WHERE url IS NOT NULL GROUP BY url'):
+            self._url_counts[url] = count
+        self._folder_ids = {title: id for id, title in conn.execute(
+            'SELECT id, title FROM bookmarks WHERE parent_id IS NULL AND is_folder = 1 ORDER BY position DESC')}
+        last_id = conn.execute('SELECT MAX(id) FROM bookmarks').fetchone()[0] or 0
+        with self._id_lock:
+            self._next_id = max(self._next_id, last_id + 1)
+
+    def reserve_ids(self, count: int) -> int:
+        """Reserves count consecutive node ids and returns the first; safe to call from any thread."""
+        with self._id_lock:
+            first = self._next_id
+            self._next_id += count
+        return first
+
+    def refresh(self, folder: BookmarkNode = None):
+        """
+        Re-reads the in-memory index after a bulk writer filled the tables directly,
+        then announces the top-level folder it wrote into.
+        """
+        self._sync()
+        self._load_index()
+        if folder is not None:
+            self.node_added.emit(folder)
+
+    def refresh_link_health(self):
+        """Re-reads the links whose last check found a problem, for the sidebar to flag."""
+        rows = self.db.read().execute(
+            'SELECT url, state, status, final_url, error FROM link_checks WHERE state != ?', (LINK_OK,))
+        self.link_problems = {row[0]: row[1:] for row in rows}
+        self.link_health_changed.emit()
+
+    def link_problem(self, url: str) -> str:
+        """Describes the problem found by the last check of url, or returns None."""
+        problem = self.link_problems.get(url)
+        if problem is None:
+            return None
+        state, status, final_url, error = problem
+        if state == LINK_REDIRECTED:
+            return f"Redirects to {final_url}"
+        if state == LINK_SLOW:
+            return "Responds slowly"
+        if state == LINK_BROKEN and status in BookmarkLinkChecker.REDIRECT_STATUSES:
+            return "Broken link (too many redirects)"
+        if state == LINK_BROKEN:
+            return f"Broken link (HTTP {status})"
+        return f"Unreachable: {error}"
+
+    def _submit(self, task):
+        """Queues task(conn) on the writer; reads made before it commits wait for it (see _sync)."""
+        self._unsynced = True
+        self.writer.submit(task)
+
+    def _sync(self):
+        """Waits for queued bookmark writes before reading the tree from the database."""
+        if self._unsynced:
+            self.writer.flush()
+            self._unsynced = False
+
+    def __len__(self):
+        return sum(self._url_counts.values())
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._url_counts
+
+    def _take_position(self, parent_id: int) -> int:
+        """Returns the next free position at the end of a parent's children."""
+        position = self._next_positions.get(parent_id)
+        if position is None:
+            self._sync()
+            position = self.db.read().execute('SELECT COALESCE(MAX(position) + 1, 0) FROM bookmarks WHERE parent_id IS ?',
+                                              (parent_id,)).fetchone()[0]
+        self._next_positions[parent_id] = position + 1
+        return position
+
+    def _insert(self, node: BookmarkNode, tags=()):
+        """Queues the insert of a new node (and its tags) and announces it."""
+        row = (node.id, node.parent_id, int(node.is_folder), node.title, node.url, node.position,
+               node.favicon, node.added_time)
+        tags = [(node.id, tag) for tag in tags]
+        def insert(conn):
+            conn.execute(f'INSERT INTO bookmarks ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row)
+            conn.executemany('INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag) VALUES (?, ?)', tags)
+        self._submit(insert)
+        self.node_added.emit(node)
+
+    def new_folder(self, title: str, parent_id: int = None) -> BookmarkNode:
+        """
+        Returns a folder appended to parent_id (None for the top level) with its id and position
+        reserved, but neither written nor announced; for bulk writers, which finish with refresh().
+        """
+        return BookmarkNode(self.reserve_ids(1), parent_id, True, title, None, self._take_position(parent_id),
+                            None, int(time.time() * 1_000_000))
+
+    def add_folder(self, title: str, parent_id: int = None) -> BookmarkNode:
+        """Appends a folder to parent_id (None for the top level)."""
+        node = self.new_folder(title, parent_id)
+        if parent_id is None:
+            self._folder_ids.setdefault(title, node.id)
+        self._insert(node)
+        return node
+
+    def folder_id(self, title: str) -> int:
+        """Returns the id of the top-level folder with this title, creating the folder if needed."""
+        folder_id = self._folder_ids.get(title)
+        if folder_id is None:
+            folder_id = self.add_folder(title).id
+        return folder_id
+
+    def add(self, url: str, title: str, parent_id: int, favicon: str = None, tags=()) -> BookmarkNode:
+        """Appends a bookmark to a folder and returns it; duplicates are the caller's concern."""
+        node = BookmarkNode(self.reserve_ids(1), parent_id, False, title, url, self._take_position(parent_id),
+                            favicon, int(time.time() * 1_000_000))
+        self._url_counts[url] = self._url_counts.get(url, 0) + 1
+        self._insert(node, tags)
+        return node
+
+    def remove_url(self, url: str) -> bool:
+        """Removes every bookmark of url; False if it was not bookmarked."""
+        if self._url_counts.pop(url, None) is None:
+            return False
+        self._sync()
+        ids = [row[0] for row in self.db.read().execute('SELECT id FROM bookmarks WHERE url = ?', (url,))]
+        self._submit(lambda conn: conn.execute('DELETE FROM bookmarks WHERE url = ?', (url,)))
+        self.nodes_removed.emit(ids)
+        return True
+
+    def remove_folder(self, folder_id: int) -> list:
+        """Removes a folder with everything in it; returns the URLs that are no longer bookmarked at all."""
+        self._sync()
+        urls = [row[0] for row in self.db.read().execute('''
+            WITH RECURSIVE subtree(id) AS (
+                SELECT ? UNION ALL SELECT b.id FROM bookmarks b JOIN subtree s ON b.parent_id = s.id
+            )
+            SELECT b.url FROM bookmarks b JOIN subtree USING (id) WHERE b.url IS NOT NULL
+        ''', (folder_id,))]
+        gone = []
+        for url in urls:
+            count = self._url_counts.get(url, 0) - 1
+            if count > 0:
+                self._url_counts[url] = count
+            elif self._url_counts.pop(url, None) is not None:
+                gone.append(url)
+        self._folder_ids = {title: id for title, id in self._folder_ids.items() if id != folder_id}
+        self._submit(lambda conn: conn.execute('DELETE FROM bookmarks WHERE id = ?', (folder_id,)))
+        self.nodes_removed.emit([folder_id])
+        return gone
+
+    def clear(self):
+        """Removes every bookmark and folder."""
+        self._url_counts.clear()
+        self._folder_ids.clear()
+        self._next_positions.clear()
+        self._submit(lambda conn: conn.execute('DELETE FROM bookmarks'))
+        self.reset.emit()
+
+    def children(self, parent_id: int, after_position: int = -1, limit: int = BOOKMARK_FETCH_BATCH) -> list:
+        """Returns up to limit children of parent_id (None for the top level) positioned after after_position."""
+        self._sync()
+        try:
+            rows = self.db.read().execute(f'''
+                SELECT {self._COLUMNS} FROM bookmarks
+                WHERE parent_id IS ? AND position > ?
+                ORDER BY position
+                LIMIT ?
+            ''', (parent_id, after_position, limit)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Bookmarks read error: {e}")
+            return []
+        return [BookmarkNode(*row) for row in rows]
+
+    def set_tags(self, node_id: int, tags):
+        """Replaces a bookmark's tags."""
+        rows = [(node_id, tag) for tag in tags]
+        def replace(conn):
+            conn.execute('DELETE FROM bookmark_tags WHERE bookmark_id = ?', (node_id,))
+            conn.executemany('INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag) VALUES (?, ?)', rows)
+        self._submit(replace)
+
+    def tags(self, node_id: int) -> list:
+        """Returns a bookmark's tags in alphabetical order."""
+        self._sync()
+        return [row[0] for row in self.db.read().execute(
+            'SELECT tag FROM bookmark_tags WHERE bookmark_id = ? ORDER BY tag', (node_id,))]
+
+    def tagged(self, tag: str) -> list:
+        """Returns the bookmarks carrying a tag (case-insensitive)."""
+        self._sync()
+        rows = self.db.read().execute('''
+            SELECT b.id, b.parent_id, b.is_folder, b.title, b.url, b.position, b.favicon, b.added_time
+            FROM bookmark_tags t JOIN bookmarks b ON b.id = t.bookmark_id
+            WHERE t.tag = ?
+            ORDER BY b.title
+        ''', (tag,)).fetchall()
+        return [BookmarkNode(*row) for row in rows]
+
+
+class BookmarkTreeItem:
+    """A loaded node of a BookmarkTreeModel; the root item has no node."""
+    __slots__ = ('node', 'parent', 'children', 'complete')
+
+    def __init__(self, node: BookmarkNode, parent: 'BookmarkTreeItem'):
+        self.node = node
+        self.parent = parent
+        self.children = []
+        self.complete = node is not None and not node.is_folder # Folders still have children to fetch
+
+    @property
+    def is_folder(self) -> bool:
+        return self.node is None or self.node.is_folder
+
+
+class BookmarkTreeModel(QAbstractItemModel):
+    """
+    Lazy tree model over a BookmarkStore for the sidebar.
+    A folder's children are read only when the view expands it (canFetchMore/fetchMore), and then
+    BOOKMARK_FETCH_BATCH rows at a time as it scrolls, so memory grows with the folders actually opened.
+    Changes from the store are applied as single row insertions and removals. The model is only connected to
+    the store and favicon signals while active (its view shown); activating it again starts over from the
+    top-level folders, which the view then fetches afresh.
+    """
+    def __init__(self, store: BookmarkStore, icons: 'FaviconCache' = None, parent: QObject = None):
+        super().__init__(parent)
+        self.store = store
+        self.icons = icons
+        self._root = BookmarkTreeItem(None, None)
+        self._items = {} # node id -> loaded BookmarkTreeItem
+        self._active = False
+        self._connections = [
+            (store.node_added, self._on_node_added),
+            (store.nodes_removed, self._on_nodes_removed),
+            (store.reset, self._on_reset),
+            (store.link_health_changed, self._on_link_health_changed),
+        ]
+        if icons is not None:
+            self._connections.append((icons.icon_stored, self._on_icon_stored))
+
+    def set_active(self, active: bool):
+        """Follows store changes while active; activating drops the loaded rows so they are read again."""
+        if active == self._active:
+            return
+        self._active = active
+        for signal, slot in self._connections:
+            if active:
+                signal.connect(slot)
+            else:
+                signal.disconnect(slot)
+        if active:
+            self._on_reset()
+
+    def _item(self, index: QModelIndex) -> BookmarkTreeItem:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def _index_of(self, item: BookmarkTreeItem) -> QModelIndex:
+        if item is self._root:
+            return QModelIndex()
+        return self.createIndex(item.parent.children.index(item), 0, item)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        children = self._item(parent).children
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self._index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.column() > 0 else len(self._item(parent).children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        item = self._item(parent)
+        return item.is_folder and (bool(item.children) or not item.complete)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not self._item(parent).complete
+
+    def fetchMore(self, parent: QModelIndex):
+        """Loads the next batch of a folder's children from the store."""
+        item = self._item(parent)
+        if item.complete:
+            return
+        after = item.children[-1].node.position if item.children else -1
+        nodes = self.store.children(item.node.id if item.node else None, after)
+        item.complete = len(nodes) < BOOKMARK_FETCH_BATCH
+        if nodes:
+            first = len(item.children)
+            self.beginInsertRows(parent, first, first + len(nodes) - 1)
+            for node in nodes:
+                self._append(item, node)
+            self.endInsertRows()
+
+    def _append(self, parent: BookmarkTreeItem, node: BookmarkNode):
+        child = BookmarkTreeItem(node, parent)
+        parent.children.append(child)
+        self._items[node.id] = child
+
+    def _forget(self, item: BookmarkTreeItem):
+        """Drops a removed item and its loaded descendants from the id lookup."""
+        self._items.pop(item.node.id, None)
+        for child in item.children:
+            self._forget(child)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer().node
+        if role == Qt.DisplayRole:
+            if node.is_folder:
+                return f"📁 {node.title}"
+            problem = self.store.link_problems.get(node.url)
+            if problem and problem[0] in (LINK_BROKEN, LINK_UNREACHABLE):
+                return f"⚠️ {node.title or node.url}"
+            if self._site_icon(node):
+                return node.title or node.url
+            return f"{node.favicon or DEFAULT_FAVICON} {node.title or node.url}"
+        if role == Qt.DecorationRole:
+            problem = self.store.link_problems.get(node.url)
+            if not problem or problem[0] not in (LINK_BROKEN, LINK_UNREACHABLE):
+                return self._site_icon(node)
+            return None
+        if role == Qt.ToolTipRole:
+            problem = None if node.is_folder else self.store.link_problem(node.url)
+            return f"{node.url}\n{problem}" if problem else node.url or node.title
+        if role == Qt.UserRole:
+            return node.url
+        if role == Qt.UserRole + 1:
+            return node.title or node.url
+        if role == Qt.UserRole + 2:
+            return node.id
+        return None
+
+    def _site_icon(self, node: BookmarkNode) -> QIcon:
+        """The real favicon stored for a bookmark's site, if any."""
+        if self.icons is None or node.is_folder or not node.url:
+            return None
+        return self.icons.icon_for_url(node.url)
+
+    def _on_node_added(self, node: BookmarkNode):
+        """Appends a new node if its parent is loaded; otherwise it arrives with the parent's next fetch."""
+        parent = self._root if node.parent_id is None else self._items.get(node.parent_id)
+        if parent is None or not parent.complete:
+            return
+        row = len(parent.children)
+        self.beginInsertRows(self._index_of(parent), row, row)
+        self._append(parent, node)
+        self.endInsertRows()
+
+    def _on_nodes_removed(self, ids: list):
+        """Removes the rows of deleted nodes that have been loaded."""
+        for node_id in ids:
+            item = self._items.get(node_id)
+            if item is None:
+                continue
+            row = item.parent.children.index(item)
+            self.beginRemoveRows(self._index_of(item.parent), row, row)
+            del item.parent.children[row]
+            self._forget(item)
+            self.endRemoveRows()
+
+    def _on_link_health_changed(self):
+        """Repaints the loaded rows after a link check, so broken links get flagged."""
+        self._repaint_loaded([Qt.DisplayRole, Qt.DecorationRole, Qt.ToolTipRole])
+
+    def _on_icon_stored(self, host: str):
+        """Repaints the loaded rows once a site's real favicon is known."""
+        self._repaint_loaded([Qt.DisplayRole, Qt.DecorationRole])
+
+    def _repaint_loaded(self, roles: list):
+        for item in [self._root, *self._items.values()]:
+            if item.children:
+                parent = self._index_of(item)
+                self.dataChanged.emit(self.index(0, 0, parent), self.index(len(item.children) - 1, 0, parent), roles)
+
+    def _on_reset(self):
+        """Starts over from the top-level folders, after every bookmark has been removed or on activation."""
+        self.beginResetModel()
+        self._root = BookmarkTreeItem(None, None)
+        self._items.clear()
+        self.endResetModel()
+
+# --- Favicon Matching ---
+class FaviconMatcher:
+    """
+    Maps domains to emoji favicons by their most specific known suffix, so scholar.google.com
+    gets its own icon while mail.google.com falls back to google.com's, and notgithub.com.evil matches nothing.
+    The map is compiled once into a trie of reversed domain labels; lookups are memoized.
+    Users can add or override entries in favicon_map.json, e.g. {"news.ycombinator.com": "🟧", ".dev": "🛠️"}.
+    """
+    DEFAULT_MAP = {
+        'github.com': '🐙', 'gitlab.com': '🦊', 'stackoverflow.com': '📚',
+        'developer.mozilla.org': '🦎', 'docs.python.org': '🐍', 'pypi.org': '🐍',
+        'youtube.com': '📺', 'youtu.be': '📺', 'netflix.com': '🎬', 'twitch.tv': '🎮',
+        'vimeo.com': '📹', 'tiktok.com': '🎵', 'spotify.com': '🎵', 'soundcloud.com': '🎵',
+        'reddit.com': '🤖', 'twitter.com': '🐦', 'x.com': '🐦', 'facebook.com': '📘',
+        'instagram.com': '📷', 'linkedin.com': '💼', 'discord.com': '💬',
+        'gmail.com': '📧', 'mail.proton.me': '🛡️', 'outlook.com': '📧',
+        'google.com': '🔍', 'duckduckgo.com': '🦆', 'wikipedia.org': '📖',
+        'archive.org': '📚', 'scholar.google.com': '🎓',
+        'amazon.com': '📦', 'ebay.com': '🏪', 'etsy.com': '🎨',
+        'bbc.com': '📰', 'cnn.com': '📰', 'reuters.com': '📰',
+        'protonmail.com': '🛡️', 'signal.org': '🔒', 'torproject.org': '🧅',
+        # Top-level domains
+        'edu': '🎓', 'gov': '🏛️', 'org': '🌐', 'mil': '⚔️',
+        'news': '📰', 'blog': '📝', 'shop': '🛍️'
+    }
+
+    def __init__(self, map_path: str = None):
+        mapping = dict(self.DEFAULT_MAP)
+        if map_path and os.path.exists(map_path):
+            try:
+                with open(map_path, 'r', encoding='utf-8') as f:
+                    user_map = json.load(f)
+                if not isinstance(user_map, dict):
+                    raise ValueError("expected a JSON object of domain: emoji")
+                mapping.update((str(key), str(icon)) for key, icon in user_map.items())
+            except (OSError, ValueError) as e:
+                print(f"Favicon map load error: {e}")
+        self._trie = {}
+        for suffix, icon in mapping.items():
+            node = self._trie
+            for label in reversed(suffix.strip().strip('.').lower().split('.')):
+                node = node.setdefault(label, {})
+            node[None] = icon
+        # A hit costs one dict lookup; lru_cache is also safe to call from the import threads.
+        self.lookup = lru_cache(maxsize=FAVICON_MEMO_SIZE)(self._match)
+
+    def _match(self, domain: str) -> str:
+        """Walks the trie from the top-level label down and keeps the deepest icon found."""
+        host = domain.rpartition('@')[2].lower()
+        if host.startswith('['):
+            return DEFAULT_FAVICON  # IPv6 literal
+        host = host.partition(':')[0].rstrip('.')
+        icon = DEFAULT_FAVICON
+        node = self._trie
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            icon = node.get(None, icon)
+        return icon
+
+# --- Site Favicon Cache ---
+class FaviconCache(QObject):
+    """
+    Real site favicons, captured from each page's iconChanged signal. Icons are stored as PNG files named
+    by their SHA-256, so hosts sharing an icon share one file; favicon_hosts maps each host to its icon and
+    favicon_blobs records sizes and last use, which decide what is evicted once the files pass max_bytes.
+    Icons already stored for an icon URL are not encoded again, and decoded QIcons are kept in a small LRU.
+    Lookups are answered from memory; files are written and removed behind by the HistoryWriter.
+    """
+    icon_stored = pyqtSignal(str) # host
+
+    def __init__(self, db: HistoryDatabase, writer: HistoryWriter, directory: str,
+                 max_bytes: int = FAVICON_CACHE_MAX_BYTES, parent: QObject = None):
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._hosts = {} # host -> icon hash
+        self._icon_urls = {} # icon URL -> icon hash
+        self._blobs = OrderedDict() # icon hash -> [size, last used (epoch microseconds)], least recently used first
+        self._icons = OrderedDict() # icon hash -> decoded QIcon, least recently used first
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with self.db.write() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS favicon_blobs (
+                        hash TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        last_used INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS favicon_hosts (
+                        host TEXT PRIMARY KEY,
+                        hash TEXT NOT NULL REFERENCES favicon_blobs(hash) ON DELETE CASCADE,
+                        icon_url TEXT
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_favicon_hosts_hash ON favicon_hosts(hash)')
+            conn = self.db.read()
+            for digest, size, last_used in conn.execute('SELECT hash, size, last_used FROM favicon_blobs ORDER BY last_used'):
+                self._blobs[digest] = [size, last_used]
+                self.total_bytes += size
+            for host, digest, icon_url in conn.execute('SELECT host, hash, icon_url FROM favicon_hosts'):
+                self._hosts[host] = digest
+                if icon_url:
+                    self._icon_urls[icon_url] = digest
+        except (sqlite3.Error, OSError) as e:
+            print(f"Favicon cache init error: {e}")
+
+    def __len__(self):
+        return len(self._blobs)
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        """The key icons are stored under: the URL's netloc, as in history.domain."""
+        return urlsplit(url).netloc.lower()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + '.png')
+
+    @staticmethod
+    def _encode(icon: QIcon) -> bytes:
+        """Renders an icon at FAVICON_PIXELS and returns it as PNG."""
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        icon.pixmap(QSize(FAVICON_PIXELS, FAVICON_PIXELS)).save(buffer, 'PNG')
+        return bytes(buffer.data())
+
+    def store(self, page_url: str, icon_url: str, icon: QIcon):
+        """Records the icon a page shows; a no-op for icons already stored for the page's host."""
+        host = self.host_of(page_url)
+        if not host or icon.isNull():
+            return
+        now = int(time.time() * 1_000_000)
+        digest = self._icon_urls.get(icon_url) if icon_url else None
+        if digest not in self._blobs:
+            data = self._encode(icon)
+            if not data:
+                return
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in self._blobs:
+                self._add_blob(digest, data, now)
+            self._icons[digest] = icon
+            self._trim_icons()
+        if icon_url:
+            self._icon_urls[icon_url] = digest
+        blob = self._blobs[digest]
+        self._blobs.move_to_end(digest)
+        changed = self._hosts.get(host) != digest
+        if changed or now - blob[1] > FAVICON_TOUCH_INTERVAL_US:
+            blob[1] = now
+            self._hosts[host] = digest
+            def record(conn):
+                conn.execute('UPDATE favicon_blobs SET last_used = ? WHERE hash = ?', (now, digest))
+                if changed:
+                    conn.execute('INSERT OR REPLACE INTO favicon_hosts (host, hash, icon_url) VALUES (?, ?, ?)',
+                                 (host, digest, icon_url or None))
+            self.writer.submit(record)
+        self._evict()
+        if changed:
+            self.icon_stored.emit(host)
+
+    def _add_blob(self, digest: str, data: bytes, now: int):
+        """Queues a new icon file; the row is only written once the file is on disk."""
+        self._blobs[digest] = [len(data), now]
+        self.total_bytes += len(data)
+        path = self._path(digest)
+        def write(conn):
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"Favicon write error: {e}")
+                return
+            conn.execute('INSERT OR REPLACE INTO favicon_blobs (hash, size, last_used) VALUES (?, ?, ?)',
+                         (digest, len(data), now))
+        self.writer.submit(write)
+
+    def _evict(self):
+        """Drops the least recently used icons, and the hosts using them, until the files fit in max_bytes."""
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+            digest, (size, _) = self._blobs.popitem(last=False)
+            self.total_bytes -= size
+            self._icons.pop(digest, None)
+            evicted.append(digest)
+        if not evicted:
+            return
+        gone = set(evicted)
+        self._hosts = {host: digest for host, digest in self._hosts.items() if digest not in gone}
+        self._icon_urls = {url: digest for url, digest in self._icon_urls.items() if digest not in gone}
+        self._remove_blobs(evicted)
+
+    def _remove_blobs(self, digests: list):
+        """Queues the removal of icon files and their rows; favicon_hosts rows go with them."""
+        paths = [self._path(digest) for digest in digests]
+        def remove(conn):
+            conn.executemany('DELETE FROM favicon_blobs WHERE hash = ?', [(digest,) for digest in digests])
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Favicon remove error: {e}")
+        self.writer.submit(remove)
+
+    def _trim_icons(self):
+        while len(self._icons) > FAVICON_ICON_CACHE_SIZE:
+            self._icons.popitem(last=False)
+
+    def icon(self, host: str) -> QIcon:
+        """Returns the stored icon for a host, or None when it has none."""
+        digest = self._hosts.get(host)
+        if digest is None:
+            return None
+        icon = self._icons.get(digest)
+        if icon is not None:
+            self._icons.move_to_end(digest)
+            return icon
+        pixmap = QPixmap()
+        if not pixmap.load(self._path(digest)):
+            return None # Evicted behind our back, or still queued for writing
+        icon = self._icons[digest] = QIcon(pixmap)
+        self._trim_icons()
+        return icon
+
+    def icon_for_url(self, url: str) -> QIcon:
+        """Returns the stored icon for a page's host, or None."""
+        return self.icon(self.host_of(url))
+
+    def has_icon(self, host: str) -> bool:
+        return host in self._hosts
+
+    def read(self, host: str) -> bytes:
+        """Returns a host's icon as PNG, or None."""
+        digest = self._hosts.get(host)
+        if digest is None:
+            return None
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def remove_hosts(self, hosts: list):
+        """Forgets the icons of hosts; icon files that no other host uses are removed."""
+        removed = [host for host in hosts if host in self._hosts]
+        if not removed:
+            return
+        digests = {self._hosts.pop(host) for host in removed}
+        unused = digests - set(self._hosts.values())
+        for digest in unused:
+            size, _ = self._blobs.pop(digest, (0, 0))
+            self.total_bytes -= size
+            self._icons.pop(digest, None)
+        if unused:
+            self._icon_urls = {url: digest for url, digest in self._icon_urls.items() if digest not in unused}
+        self.writer.submit(lambda conn: conn.executemany('DELETE FROM favicon_hosts WHERE host = ?',
+                                                         [(host,) for host in removed]))
+        self._remove_blobs(list(unused))
+
+    def clear(self):
+        """Forgets every stored icon and removes the files."""
+        digests = list(self._blobs)
+        self._hosts.clear()
+        self._icon_urls.clear()
+        self._blobs.clear()
+        self._icons.clear()
+        self.total_bytes = 0
+        self._remove_blobs(digests)
+
+# --- Site Thumbnails ---
+class ThumbnailCache(QObject):
+    """
+    Screenshots of top sites for the start page's cards, taken with grab() some time after a visible tab
+    finishes loading. Only pages among the THUMBNAIL_TOP_SITES highest-frecency sites are captured, no more
+    than once per THUMBNAIL_CAPTURE_INTERVAL_MS and not again until their thumbnail is THUMBNAIL_REFRESH_INTERVAL_S old.
+    Scaling and encoding run on a small thread pool. Files are named by the SHA-256 of their URL, and the
+    least recently used are removed once the directory passes max_bytes; file times carry the order across restarts.
+    """
+    thumbnail_stored = pyqtSignal(str) # url
+    _encoded = pyqtSignal(int, str, str, int) # generation, url, file name, size; emitted on a worker thread
+
+    CONTENT_TYPES = {'webp': b'image/webp', 'png': b'image/png'}
+
+    def __init__(self, history_manager: 'HistoryManager', directory: str,
+                 max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES, parent: QObject = None):
+        super().__init__(parent)
+        self.history_manager = history_manager
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.format = 'webp' if b'webp' in QImageWriter.supportedImageFormats() else 'png'
+        self._files = OrderedDict() # url hash -> [file name, size, last used, version], least recently used first
+        self._queue = OrderedDict() # url -> (view, due time), captures waiting for their turn
+        self._generation = 0 # Bumped by clear(), so encodes still running then are thrown away
+        self._pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="Thumbnail")
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._capture_next)
+        self._encoded.connect(self._on_encoded)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            files = []
+            for entry in os.scandir(directory):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                digest, _, extension = entry.name.partition('.')
+                if extension in self.CONTENT_TYPES:
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, digest, entry.name, stat.st_size))
+                else:
+                    try:
+                        os.remove(entry.path) # Left over from an interrupted write
+                    except OSError as e:
+                        print(f"Thumbnail remove error: {e}")
+            for mtime, digest, name, size in sorted(files):
+                self._files[digest] = [name, size, int(mtime), int(mtime)]
+                self.total_bytes += size
+        except OSError as e:
+            print(f"Thumbnail cache init error: {e}")
+
+    def __len__(self):
+        return len(self._files)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def path(self, url: str) -> str:
+        """The null://home path of a URL's thumbnail, or None; the version changes with every capture."""
+        entry = self._files.get(self.key(url))
+        return f"/thumbnail/{self.key(url)}?v={entry[3]}" if entry else None
+
+    def request(self, view: QWebEngineView):
+        """Queues a capture of the page a view has just loaded; cheap enough to call on every loadFinished."""
+        url = view.url().toString()
+        if not url.startswith(('http://', 'https://')):
+            return
+        entry = self._files.get(self.key(url))
+        if entry and time.time() - entry[3] < THUMBNAIL_REFRESH_INTERVAL_S:
+            return
+        self._queue.pop(url, None)
+        self._queue[url] = (view, time.monotonic() + THUMBNAIL_CAPTURE_DELAY_MS / 1000)
+        if not self._timer.isActive():
+            self._timer.start(THUMBNAIL_CAPTURE_DELAY_MS)
+
+    def _capture_next(self):
+        """Captures the first queued page that is due and still on screen, then waits for the next one."""
+        now = time.monotonic()
+        top_urls = None
+        for url, (view, due) in list(self._queue.items()):
+            if due > now:
+                break
+            del self._queue[url]
+            try:
+                if not view.isVisible() or view.url().toString() != url:
+                    continue # Hidden tabs grab blank, and navigated tabs show something else
+            except RuntimeError:
+                continue # The tab was closed
+            if top_urls is None:
+                top_urls = {site.url for site in self.history_manager.get_most_visited(THUMBNAIL_TOP_SITES)}
+            if url not in top_urls:
+                continue
+            width = view.width()
+            height = min(view.height(), width * THUMBNAIL_SIZE.height() // THUMBNAIL_SIZE.width())
+            image = view.grab(QRect(0, 0, width, height)).toImage()
+            if not image.isNull():
+                self._pool.submit(self._encode, self._generation, url, image)
+                break
+        if self._queue:
+            first_due = next(iter(self._queue.values()))[1]
+            delay_ms = max(THUMBNAIL_CAPTURE_INTERVAL_MS, int((first_due - time.monotonic()) * 1000))
+            self._timer.start(delay_ms)
+
+    def _encode(self, generation: int, url: str, image: QImage):
+        """Runs on the pool: scales and crops a capture to THUMBNAIL_SIZE and writes it."""
+        try:
+            scaled = image.scaled(THUMBNAIL_SIZE, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+            scaled = scaled.copy(0, 0, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+            name = f"{self.key(url)}.{self.format}"
+            path = os.path.join(self.directory, name)
+            if not scaled.save(path + '.tmp', self.format, THUMBNAIL_QUALITY if self.format == 'webp' else -1):
+                raise OSError(f"could not encode {self.format}")
+            os.replace(path + '.tmp', path)
+            self._encoded.emit(generation, url, name, os.path.getsize(path))
+        except OSError as e:
+            print(f"Thumbnail write error: {e}")
+
+    def _on_encoded(self, generation: int, url: str, name: str, size: int):
+        """Records a finished thumbnail on the GUI thread and evicts past max_bytes."""
+        if generation != self._generation:
+            self._remove_files([name])
+            return
+        digest = self.key(url)
+        old = self._files.pop(digest, None)
+        if old:
+            self.total_bytes -= old[1]
+            if old[0] != name:
+                self._remove_files([old[0]])
+        now = int(time.time())
+        self._files[digest] = [name, size, now, now]
+        self.total_bytes += size
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            _, (old_name, old_size, _, _) = self._files.popitem(last=False)
+            self.total_bytes -= old_size
+            evicted.append(old_name)
+        self._remove_files(evicted)
+        self.thumbnail_stored.emit(url)
+
+    def _remove_files(self, names: list):
+        if names:
+            self._pool.submit(self._remove_paths, [os.path.join(self.directory, name) for name in names])
+
+    @staticmethod
+    def _remove_paths(paths: list):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Thumbnail remove error: {e}")
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def read(self, digest: str):
+        """Returns (content type, data) for a thumbnail by URL hash, or None."""
+        entry = self._files.get(digest)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry[0])
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._files.move_to_end(digest)
+        now = int(time.time())
+        if now - entry[2] > THUMBNAIL_TOUCH_INTERVAL_S:
+            entry[2] = now
+            self._pool.submit(self._touch, path)
+        return self.CONTENT_TYPES[entry[0].rpartition('.')[2]], data
+
+    def remove(self, urls: list):
+        """Forgets the thumbnails of deleted history entries."""
+        names = []
+        for url in urls:
+            self._queue.pop(url, None)
+            entry = self._files.pop(self.key(url), None)
+            if entry:
+                self.total_bytes -= entry[1]
+                names.append(entry[0])
+        self._remove_files(names)
+
+    def clear(self):
+        """Forgets every thumbnail and removes the files, including those still being encoded."""
+        self._generation += 1
+        self._queue.clear()
+        names = [entry[0] for entry in self._files.values()]
+        self._files.clear()
+        self.total_bytes = 0
+        self._remove_files(names)
+
+    def close(self):
+        """Waits for running encodes; called when the history database closes."""
+        self._timer.stop()
+        self._pool.shutdown(wait=True)
+
 # --- History and Bookmark Management ---
-class HistoryManager:
-    """Manages browsing history and bookmarks using SQLite and JSON."""
+class HistoryManager(QObject):
+    """
+    Manages browsing history and bookmarks, both stored in SQLite.
+    Change signals are emitted on the GUI thread as soon as a change is made, before it reaches disk.
+    """
+    visit_added = pyqtSignal(str, str, int) # url, title, transition
+    history_removed = pyqtSignal(list) # urls
+    history_cleared = pyqtSignal()
+    history_clear_failed = pyqtSignal(str) # error; history_cleared follows with what was cleared
+    history_imported = pyqtSignal()
+    bookmarks_imported = pyqtSignal()
+    bookmark_added = pyqtSignal(str, str) # url, title
+    bookmark_removed = pyqtSignal(str) # url
+    bookmarks_cleared = pyqtSignal()
+    _purge_finished = pyqtSignal() # emitted on the writer thread, re-emitted as history_cleared
+    _purge_failed = pyqtSignal(str) # emitted on the writer thread, re-emitted as history_clear_failed
+
     def __init__(self):
+        super().__init__()
         os.makedirs(BROWSER_DATA_DIR, exist_ok=True)
         self.db_path = os.path.join(BROWSER_DATA_DIR, HISTORY_DB_NAME)
         self.bookmarks_path = os.path.join(BROWSER_DATA_DIR, BOOKMARKS_FILE_NAME)
+        self.db = HistoryDatabase(self.db_path)
+        self._query_cache = {} # (sql, limit) -> (db generation, [HistoryEntry])
+        self.fts_enabled = False
+        self._migration_pending = False
+        self._purge_finished.connect(self.history_cleared, Qt.QueuedConnection)
+        self._purge_failed.connect(self.history_clear_failed, Qt.QueuedConnection)
+        self._clear_errors = [] # Failed purge chunks, warned about once history_cleared arrives
+        self.history_clear_failed.connect(self._clear_errors.append)
+        self.history_cleared.connect(self._warn_clear_failed)
         self.init_database()
+        self.writer = HistoryWriter(self.db)
+        self.writer.add_periodic(self._decay_frecency, FRECENCY_DECAY_INTERVAL_S / 24)
+        self.writer.start()
+        if self._migration_pending:
+            self.writer.submit(self._migrate_visit_times)
+        self.bookmarks = BookmarkStore(self.db, self.writer, self.bookmarks_path, self)
+        self._link_checker = None
+        self.favicons = FaviconMatcher(os.path.join(BROWSER_DATA_DIR, FAVICON_MAP_FILE_NAME))
+        self.icons = FaviconCache(self.db, self.writer, os.path.join(BROWSER_DATA_DIR, FAVICON_CACHE_DIR_NAME), parent=self)
+        self.thumbnails = ThumbnailCache(self, os.path.join(BROWSER_DATA_DIR, THUMBNAIL_CACHE_DIR_NAME), parent=self)
+        self.history_removed.connect(self.thumbnails.remove)
         self.shortcuts = self._get_default_shortcuts()
-        self.bookmarks = self.load_bookmarks()
+        # One long-lived search thread, so its reader connection and statement cache are reused.
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_pool.setExpiryTimeout(-1)
+
+    def flush(self):
+        """Blocks until every queued history write has been committed."""
+        self.writer.flush()
+
+    def close(self):
+        """Commits queued writes and releases the database connections."""
+        if self._link_checker and self._link_checker.isRunning():
+            self._link_checker.stop()
+            self._link_checker.wait()
+        self.search_pool.waitForDone()
+        self.thumbnails.close()
+        self.writer.stop()
+        self.db.close()
 
     def init_database(self):
         """Initializes the SQLite database for history storage."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db.write() as conn:
+                is_new = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history'").fetchone()
                 conn.execute('''
                     CREATE TABLE IF NOT EXISTS history (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         url TEXT NOT NULL UNIQUE,
                         title TEXT,
-                        visit_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        visit_time INTEGER NOT NULL DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000000 AS INTEGER)),
                         visit_count INTEGER DEFAULT 1,
                         favicon TEXT,
-                        domain TEXT
+                        domain TEXT,
+                        frecency REAL NOT NULL DEFAULT 0
                     )
                 ''')
+                columns = {row[1] for row in conn.execute('PRAGMA table_info(history)')}
+                if 'frecency' not in columns:
+                    # Databases from before the visits log: seed frecency from the visit count.
+                    conn.execute('ALTER TABLE history ADD COLUMN frecency REAL NOT NULL DEFAULT 0')
+                    conn.execute('UPDATE history SET frecency = visit_count * ?',
+                                 (FRECENCY_TRANSITION_BONUS[TRANSITION_LINK],))
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS visits (
+                        id INTEGER PRIMARY KEY,
+                        url_id INTEGER NOT NULL REFERENCES history(id) ON DELETE CASCADE,
+                        visit_time INTEGER NOT NULL,
+                        transition INTEGER NOT NULL DEFAULT 0
+                    )
+                ''')
+                conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+                # Index entries carry the rowid, so this covers "ids in a time range" and newest-first scans.
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_visit_time ON history(visit_time DESC)')
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_domain ON history(domain)')
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_url_title ON history(url, title)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_frecency ON history(frecency DESC)')
+                # Covers the per-URL visit range deletes and "latest remaining visit" lookups of clear_history.
+                conn.execute('DROP INDEX IF EXISTS idx_visits_url')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_visits_url_time ON visits(url_id, visit_time)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_visits_time ON visits(visit_time)')
+                self.fts_enabled = self._init_fts(conn)
+                if is_new:
+                    conn.execute(f'PRAGMA user_version = {HISTORY_SCHEMA_VERSION}')
+                else:
+                    self._migration_pending = conn.execute('PRAGMA user_version').fetchone()[0] < HISTORY_SCHEMA_VERSION
         except sqlite3.Error as e:
             print(f"Database initialization error: {e}")
             QMessageBox.critical(None, "Database Error", f"Failed to initialize history database: {e}")
 
+    def _init_fts(self, conn: sqlite3.Connection) -> bool:
+        """
+        Creates the FTS5 index over history titles, URLs and domains, kept in sync by triggers.
+        Returns False when this SQLite build has no FTS5, in which case search falls back to LIKE.
+        """
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone()
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                    title, url, domain,
+                    content='history', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 unavailable, history search will use LIKE: {e}")
+            return False
+
+        conn.executescript('''
+            CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+                INSERT INTO history_fts(rowid, title, url, domain) VALUES (new.id, new.title, new.url, new.domain);
+            END;
+            CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, title, url, domain)
+                VALUES ('delete', old.id, old.title, old.url, old.domain);
+            END;
+            CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE OF title, url, domain ON history
+            WHEN old.title IS NOT new.title OR old.url IS NOT new.url OR old.domain IS NOT new.domain BEGIN
+                INSERT INTO history_fts(history_fts, rowid, title, url, domain)
+                VALUES ('delete', old.id, old.title, old.url, old.domain);
+                INSERT INTO history_fts(rowid, title, url, domain) VALUES (new.id, new.title, new.url, new.domain);
+            END;
+        ''')
+        if not exists:
+            # Index rows written before the FTS table existed.
+            conn.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
+        return True
+
+    def _migrate_visit_times(self, conn: sqlite3.Connection) -> bool:
+        """
+        Converts one chunk of text visit times ('YYYY-MM-DD HH:MM:SS', UTC) to epoch microseconds.
+        Runs on the writer thread in rowid order and queues the next chunk itself, so visits keep being
+        recorded while an old database is upgraded. Returns True once every row has been converted.
+        """
+        row = conn.execute("SELECT value FROM meta WHERE key = 'visit_time_migrated_id'").fetchone()
+        start = row[0] if row else 0
+        conn.execute('''
+            UPDATE history SET visit_time = COALESCE(CAST(strftime('%s', visit_time) AS INTEGER) * 1000000, 0)
+            WHERE id > ? AND id <= ? AND typeof(visit_time) = 'text'
+        ''', (start, start + HISTORY_MIGRATION_CHUNK))
+        if start + HISTORY_MIGRATION_CHUNK < (conn.execute('SELECT MAX(id) FROM history').fetchone()[0] or 0):
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('visit_time_migrated_id', ?)",
+                         (start + HISTORY_MIGRATION_CHUNK,))
+            self.writer.submit(self._migrate_visit_times)
+            return False
+        conn.execute("DELETE FROM meta WHERE key = 'visit_time_migrated_id'")
+        conn.execute(f'PRAGMA user_version = {HISTORY_SCHEMA_VERSION}')
+        self._migration_pending = False
+        return True
+
+    def _decay_frecency(self, conn: sqlite3.Connection):
+        """
+        Applies the scheduled frecency decay for every whole interval since the last run.
+        Runs hourly on the writer thread; the UPDATE only happens once an interval has passed.
+        """
+        now = time.time()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'frecency_decayed_at'").fetchone()
+        if row is None:
+            conn.execute("INSERT INTO meta (key, value) VALUES ('frecency_decayed_at', ?)", (now,))
+            return
+        periods = int((now - row[0]) // FRECENCY_DECAY_INTERVAL_S)
+        if periods > 0:
+            conn.execute('UPDATE history SET frecency = frecency * ? WHERE frecency > 0',
+                         (FRECENCY_DECAY_FACTOR ** periods,))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'frecency_decayed_at'",
+                         (row[0] + periods * FRECENCY_DECAY_INTERVAL_S,))
+
     def _get_default_shortcuts(self) -> list:
         """Returns a list of predefined shortcuts for quick access."""
         return [
@@ -400,199 +1993,1717 @@ class HistoryManager:
             {"name": "DuckDuckGo", "url": "https://duckduckgo.com", "icon": "🦆", "category": "Search"}
         ]
 
-    def add_visit(self, url: str, title: str):
+    def add_visit(self, url: str, title: str, transition: int = TRANSITION_LINK):
         """
-        Adds or updates a browsing visit in the history database.
-        Increments visit count if URL already exists.
+        Queues a browsing visit for the history database.
+        The visit is committed by the background writer; visit count is incremented if the URL already exists,
+        the visit is logged in the visits table, and the URL's frecency grows by the transition's bonus.
         """
-        if not url or url.startswith(('data:', 'about:', 'chrome:', 'devtools:', 'null:')):
+        if not url or url.startswith(HISTORY_IGNORED_SCHEMES):
             return
 
+        domain = urlparse(url).netloc.lower()
+        favicon = self.get_favicon_for_domain(domain)
+        # Captured now rather than at commit time.
+        visit_time = int(time.time() * 1_000_000)
+        self.writer.add_visit(url, title, domain, favicon, visit_time, transition,
+                              FRECENCY_TRANSITION_BONUS.get(transition, 0.0))
+        self.visit_added.emit(url, title or '', transition)
+
+    def get_recent_sites(self, limit: int = 15) -> list:
+        """Retrieves the most recently visited sites as HistoryEntry records."""
+        # CAST keeps rows that the visit_time upgrade hasn't reached yet from breaking the caller.
+        return self._cached_query('''
+            SELECT url, title, CAST(visit_time AS INTEGER), favicon, domain, visit_count
+            FROM history
+            ORDER BY visit_time DESC
+            LIMIT ?
+        ''', limit, "Recent sites")
+
+    def get_most_visited(self, limit: int = 10) -> list:
+        """Retrieves the sites with the highest frecency as HistoryEntry records, read in order from the frecency index."""
+        return self._cached_query('''
+            SELECT url, title, CAST(visit_time AS INTEGER), favicon, domain, visit_count
+            FROM history
+            WHERE visit_count > 1
+            ORDER BY frecency DESC
+            LIMIT ?
+        ''', limit, "Most visited")
+
+    def _cached_query(self, sql: str, limit: int, label: str) -> list:
+        """
+        Runs a LIMIT-ed history query, reusing the previous result while the database generation is unchanged.
+        Every committed write (visits, deletes, purges, imports) bumps the generation, so nothing stale is served.
+        """
+        key = (sql, limit)
+        generation = self.db.generation # Read before querying: a concurrent commit can only make the entry older
+        cached = self._query_cache.get(key)
+        if cached is not None and cached[0] == generation:
+            return list(cached[1])
         try:
-            domain = urlparse(url).netloc.lower()
-            favicon = self.get_favicon_for_domain(domain)
+            rows = [HistoryEntry(*row) for row in self.db.read().execute(sql, (limit,))]
+        except sqlite3.Error as e:
+            print(f"{label} error: {e}")
+            return []
+        self._query_cache[key] = (generation, rows)
+        return list(rows)
+
+    def start_search(self, query: str, limit: int = HISTORY_SEARCH_LIMIT) -> 'HistorySearch':
+        """Runs search_history on the search thread; results arrive in pages through the returned search's signals."""
+        search = HistorySearch(self, query, limit)
+        self.search_pool.start(search)
+        return search
 
-            with sqlite3.connect(self.db_path) as conn:
+    def search_history(self, query: str, limit: int = 20) -> list:
+        """
+        Searches the browsing history by title, URL, or domain, returning HistoryEntry records.
+        Uses the FTS5 index with prefix matching when available, otherwise a LIKE scan.
+        """
+        try:
+            return [HistoryEntry(*row) for row in self._search_cursor(self.db.read(), query, limit)]
+        except sqlite3.Error as e:
+            print(f"Search history error: {e}")
+            return []
+
+    def _search_cursor(self, conn: sqlite3.Connection, query: str, limit: int) -> sqlite3.Cursor:
+        """Runs the search_history query on conn; rows are read from the cursor as they are needed."""
+        terms = FTS_TOKEN_PATTERN.findall(query.lower())
+        if self.fts_enabled and terms:
+            # Every term must match as a prefix; quoting keeps FTS5 operators in the query literal.
+            # Candidates are the FTS_CANDIDATE_LIMIT matches highest in frecency, so an old entry visited
+            # often is never crowded out by newer rows. Their bm25 (negative, lower is better) is then
+            # scaled up by visit count and down by age.
+            match = ' '.join(f'"{term}"*' for term in terms)
+            params = (match, max(FTS_CANDIDATE_LIMIT, limit), int(time.time() * 1_000_000), limit)
+            common = conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM history_fts WHERE history_fts MATCH ? LIMIT ?)',
+                                  (match, FTS_COMMON_MATCHES + 1)).fetchone()[0] > FTS_COMMON_MATCHES
+            if common:
+                # Walk idx_frecency and stop at the candidate limit (forced, as the planner would otherwise
+                # sort every match); bm25 is computed for the candidates only.
+                cursor = conn.execute('''
+                    WITH candidates AS (
+                        SELECT id FROM history INDEXED BY idx_frecency
+                        WHERE id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?1)
+                        ORDER BY frecency DESC
+                        LIMIT ?2
+                    )
+                    SELECT h.url, h.title, CAST(h.visit_time AS INTEGER), h.favicon, h.domain, h.visit_count
+                    FROM history_fts CROSS JOIN candidates AS c ON c.id = history_fts.rowid
+                    JOIN history AS h ON h.id = c.id
+                    WHERE history_fts MATCH ?1
+                    ORDER BY bm25(history_fts, 4.0, 1.0, 2.0) * (1.0 + MIN(h.visit_count, 100) / 20.0)
+                             / (1.0 + MAX(?3 - h.visit_time, 0) / (30 * 86400 * 1000000.0))
+                    LIMIT ?4
+                ''', params)
+            else:
+                # Drive the query from the FTS side: each match is joined to its history row by
+                # primary key, and bm25 is taken in the same pass.
+                cursor = conn.execute('''
+                    SELECT url, title, visit_time, favicon, domain, visit_count FROM (
+                        SELECT h.url, h.title, CAST(h.visit_time AS INTEGER) AS visit_time, h.favicon, h.domain,
+                               h.visit_count, bm25(history_fts, 4.0, 1.0, 2.0) AS score
+                        FROM history_fts CROSS JOIN history AS h ON h.id = history_fts.rowid
+                        WHERE history_fts MATCH ?1
+                        ORDER BY h.frecency DESC
+                        LIMIT ?2
+                    )
+                    ORDER BY score * (1.0 + MIN(visit_count, 100) / 20.0)
+                             / (1.0 + MAX(?3 - visit_time, 0) / (30 * 86400 * 1000000.0))
+                    LIMIT ?4
+                ''', params)
+        else:
+            cursor = conn.execute('''
+                SELECT url, title, CAST(visit_time AS INTEGER), favicon, domain, visit_count
+                FROM history
+                WHERE title LIKE ? OR url LIKE ? OR domain LIKE ?
+                ORDER BY visit_count DESC, visit_time DESC
+                LIMIT ?
+            ''', (f'%{query}%', f'%{query}%', f'%{query}%', limit))
+        return cursor
+
+    def clear_history(self, since: timedelta = None):
+        """
+        Clears browsing history made up to now, in chunks on the writer thread; returns immediately.
+        If 'since' is specified, only visits within that period are removed: an entry keeps its row,
+        count and last-visit time from older visits, and is deleted when it has none left.
+        Otherwise, clears all history, deleting entries by id range. history_cleared is emitted once the
+        last chunk is committed; a chunk that fails is rolled back, reported through history_clear_failed
+        and skipped.
+        """
+        until = int(time.time() * 1_000_000)
+        cutoff = 0 if since is None else until - int(since.total_seconds() * 1_000_000)
+        if since is None:
+            self.icons.clear() # The stored icons would still tell which sites were visited
+        # Thumbnails show page content and can't be matched to a time range, so any clear drops them all.
+        self.thumbnails.clear()
+
+        def start(conn):
+            try:
+                if since is None:
+                    first, last = conn.execute('SELECT MIN(id), MAX(id) FROM history').fetchone()
+                else:
+                    # Range clears compare integer times, so finish an interrupted upgrade first.
+                    while self._migration_pending and not self._migrate_visit_times(conn):
+                        pass
+                    # Snapshot the affected entries up front (an index-only range scan) so that visits
+                    # recorded while the purge runs are left alone.
+                    ids = [row[0] for row in conn.execute('SELECT id FROM history WHERE visit_time >= ?', (cutoff,))]
+            except Exception:
+                self._finish_purge() # Nothing was cleared, but the views stop waiting for the purge
+                raise
+            if since is None:
+                self._purge_range(conn, first or 1, last or 0, until)
+            else:
+                self._purge_chunk(conn, ids, cutoff, until)
+
+        # Queued behind earlier visits, so none of them can resurrect cleared rows.
+        self.writer.submit(start, on_error=self._on_purge_error)
+
+    def _warn_clear_failed(self):
+        """Shows one warning for a finished clear, however many of its chunks failed."""
+        if self._clear_errors:
+            errors = list(self._clear_errors)
+            self._clear_errors.clear()
+            more = f" ({len(errors)} errors)" if len(errors) > 1 else ""
+            QMessageBox.warning(None, "Clear History", f"Some history could not be cleared: {errors[0]}{more}")
+
+    def _on_purge_error(self, error: Exception):
+        """A purge chunk failed and was rolled back; the chunks after it still run."""
+        print(f"Clear history error: {error}")
+        self._purge_failed.emit(str(error))
+
+    def _finish_purge(self):
+        """Queues history_cleared behind the last chunk, so it follows that chunk's commit and any failure report."""
+        self.writer.submit(lambda conn: self._purge_finished.emit())
+
+    def _purge_range(self, conn: sqlite3.Connection, first: int, last: int, until: int):
+        """
+        Deletes the history entries with ids first..last, HISTORY_PURGE_CHUNK ids per writer task; their visits
+        cascade. Entries visited after 'until', while the purge runs, keep those visits and their row.
+        """
+        end = min(first + HISTORY_PURGE_CHUNK - 1, last)
+        try:
+            conn.execute('DELETE FROM history WHERE id BETWEEN ? AND ? AND visit_time <= ?', (first, end, until))
+            if conn.execute('DELETE FROM visits WHERE url_id BETWEEN ? AND ? AND visit_time <= ?',
+                            (first, end, until)).rowcount:
                 conn.execute('''
-                    INSERT INTO history (url, title, domain, favicon, visit_count)
-                    VALUES (?, ?, ?, ?, 1)
-                    ON CONFLICT(url) DO UPDATE SET
-                        title = ?,
-                        visit_time = CURRENT_TIMESTAMP,
-                        visit_count = visit_count + 1
-                ''', (url, title, domain, favicon, title))
+                    UPDATE history SET visit_count = (SELECT COUNT(*) FROM visits WHERE url_id = history.id)
+                    WHERE id BETWEEN ? AND ?
+                ''', (first, end))
+        finally:
+            # Queued even when this chunk failed, so one bad chunk doesn't keep the rest of history.
+            if end < last:
+                self.writer.submit(lambda conn: self._purge_range(conn, end + 1, last, until),
+                                   on_error=self._on_purge_error)
+            else:
+                self._finish_purge()
+
+    def _purge_chunk(self, conn: sqlite3.Connection, ids: list, cutoff: int, until: int):
+        """
+        Removes the visits between cutoff and until (epoch microseconds) for the first HISTORY_PURGE_CHUNK
+        history ids, then queues the rest on the writer so visits can be committed in between.
+        """
+        chunk, rest = ids[:HISTORY_PURGE_CHUNK], ids[HISTORY_PURGE_CHUNK:]
+        deleted = []
+        updated = []
+        try:
+            for url_id in chunk:
+                removed = conn.execute('DELETE FROM visits WHERE url_id = ? AND visit_time BETWEEN ? AND ?',
+                                       (url_id, cutoff, until)).rowcount
+                last_visit = conn.execute('SELECT MAX(visit_time) FROM visits WHERE url_id = ?', (url_id,)).fetchone()[0]
+                if last_visit is None:
+                    # Also drops entries recorded before the visits log, whose visit dates are unknown.
+                    deleted.append((url_id,))
+                else:
+                    updated.append((last_visit, removed, removed, url_id))
+            conn.executemany('DELETE FROM history WHERE id = ?', deleted)
+            conn.executemany('''
+                UPDATE history SET
+                    visit_time = ?,
+                    frecency = frecency * MAX(visit_count - ?, 1) / visit_count,
+                    visit_count = MAX(visit_count - ?, 1)
+                WHERE id = ?
+            ''', updated)
+        finally:
+            # Queued even when this chunk failed, so one bad chunk doesn't keep the rest of the range.
+            if rest:
+                self.writer.submit(lambda conn: self._purge_chunk(conn, rest, cutoff, until),
+                                   on_error=self._on_purge_error)
+            else:
+                self._finish_purge()
+
+    def import_history(self, path: str, source: str = None) -> 'HistoryImporter':
+        """
+        Starts importing history from 'path' on a worker thread and returns the running importer.
+        The source format is detected when not given; history_imported is emitted once rows were written.
+        """
+        importer = HistoryImporter(self, path, source)
+
+        def on_finished(success: bool, message: str):
+            if importer.rows_done: # Partial imports that were cancelled still changed history
+                self.history_imported.emit()
+
+        importer.transfer_finished.connect(on_finished)
+        importer.start()
+        return importer
+
+    def import_bookmarks(self, path: str) -> 'BookmarkImporter':
+        """
+        Starts importing a Netscape bookmark HTML file into a new top-level folder on a worker thread
+        and returns the running importer; bookmarks_imported is emitted once rows were written.
+        """
+        folder = self.bookmarks.new_folder(f"Imported {datetime.now():%Y-%m-%d %H:%M}")
+        self.flush() # The importer writes directly, next to rows still queued for the writer
+        importer = BookmarkImporter(self, path, folder)
+
+        def on_finished(success: bool, message: str):
+            self.bookmarks.refresh(folder if importer.folder_written else None)
+            if importer.rows_done:
+                self.bookmarks_imported.emit()
+
+        importer.transfer_finished.connect(on_finished)
+        importer.start()
+        return importer
+
+    def check_bookmark_links(self, proxy_manager: ProxyManager, force: bool = False) -> 'BookmarkLinkChecker':
+        """
+        Starts checking bookmarked links on a worker thread and returns the running checker,
+        or None if a check is already running. Links checked within LINK_CHECK_TTL_S are skipped unless forced.
+        """
+        if self._link_checker and self._link_checker.isRunning():
+            return None
+        self.flush() # Include bookmarks still queued for the writer
+        checker = BookmarkLinkChecker(self, proxy_manager, force)
+        checker.check_finished.connect(lambda success, message: self.bookmarks.refresh_link_health())
+        self._link_checker = checker
+        checker.start()
+        return checker
+
+    def export_history(self, path: str) -> 'HistoryExporter':
+        """Starts exporting history to an NDJSON file on a worker thread and returns the running exporter."""
+        self.flush() # Include visits still queued for the writer
+        exporter = HistoryExporter(self, path)
+        exporter.start()
+        return exporter
+
+    def delete_history_entry(self, url: str):
+        """Deletes a specific history entry by URL."""
+        self.delete_history_entries([url])
+
+    def delete_history_entries(self, urls: list) -> int:
+        """
+        Deletes the history entries for urls in one transaction, HISTORY_DELETE_BATCH at a time through the
+        url index; their visits and full-text rows go with them. Returns how many entries were deleted.
+        """
+        urls = list(dict.fromkeys(urls))
+        deleted = 0
+        def delete(conn):
+            nonlocal deleted
+            for start in range(0, len(urls), HISTORY_DELETE_BATCH):
+                batch = urls[start:start + HISTORY_DELETE_BATCH]
+                deleted += conn.execute(f'DELETE FROM history WHERE url IN ({", ".join("?" * len(batch))})',
+                                        batch).rowcount
+        try:
+            self.writer.submit(delete, wait=True)
         except sqlite3.Error as e:
-            print(f"History add error: {e}")
+            print(f"Delete history error: {e}")
+            return 0
+        if urls:
+            self.history_removed.emit(urls)
+        return deleted
 
-    def get_recent_sites(self, limit: int = 15) -> list:
-        """Retrieves a list of recently visited sites from the history."""
+    def delete_domain_history(self, domains: list) -> list:
+        """
+        Deletes every history entry whose domain is one of domains in one transaction, looked up through
+        idx_domain, along with their visits and full-text rows. Returns the deleted URLs.
+        """
+        domains = list(dict.fromkeys(domains))
+        urls = []
+        def delete(conn):
+            deleted = []
+            for start in range(0, len(domains), HISTORY_DELETE_BATCH):
+                batch = domains[start:start + HISTORY_DELETE_BATCH]
+                marks = ", ".join("?" * len(batch))
+                deleted.extend(row[0] for row in conn.execute(f'SELECT url FROM history WHERE domain IN ({marks})', batch))
+                conn.execute(f'DELETE FROM history WHERE domain IN ({marks})', batch)
+            urls.extend(deleted)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT url, title, visit_time, favicon, domain, visit_count
-                    FROM history
-                    ORDER BY visit_time DESC
-                    LIMIT ?
-                ''', (limit,))
-                return [{
-                    'url': row[0],
-                    'title': row[1] or urlparse(row[0]).netloc,
-                    'visitTime': row[2],
-                    'favicon': row[3],
-                    'domain': row[4],
-                    'visitCount': row[5]
-                } for row in cursor.fetchall()]
+            self.writer.submit(delete, wait=True)
         except sqlite3.Error as e:
-            print(f"Recent sites error: {e}")
+            print(f"Delete history error: {e}")
             return []
+        if urls:
+            self.history_removed.emit(urls)
+        return urls
+
+    @staticmethod
+    def site_of(domain: str) -> str:
+        """The site a history domain belongs to: its host without port and leading 'www.'."""
+        host = domain.rpartition('@')[2].lower()
+        if not host.startswith('['):
+            host = host.partition(':')[0]
+        return host[4:] if host.startswith('www.') else host
+
+    def forget_site(self, domain: str) -> list:
+        """
+        Deletes the history of domain's site and all its subdomains, and forgets their stored favicons;
+        thumbnails go with the deleted entries. Returns the deleted URLs.
+        """
+        site = self.site_of(domain)
+        self.writer.flush() # Domains only seen in queued visits count too
+        domains = [domain]
+        for (other,) in self.db.read().execute('SELECT DISTINCT domain FROM history WHERE domain IS NOT NULL'):
+            host = self.site_of(other)
+            if host == site or host.endswith('.' + site):
+                domains.append(other)
+        urls = self.delete_domain_history(domains)
+        self.icons.remove_hosts(domains)
+        return urls
+
+    def is_bookmarked(self, url: str) -> bool:
+        """Returns True if url is bookmarked; cheap enough to call on every navigation."""
+        return url in self.bookmarks
+
+    def add_bookmark(self, url: str, title: str, folder: str = BOOKMARK_DEFAULT_FOLDER, tags=()) -> bool:
+        """Adds a new bookmark to a top-level folder, creating the folder if needed; written in the background."""
+        if url in self.bookmarks:
+            QMessageBox.information(None, "Bookmark Exists", "This page is already bookmarked.")
+            return False
 
-    def get_most_visited(self, limit: int = 10) -> list:
-        """Retrieves a list of most frequently visited sites."""
+        self.bookmarks.add(url, title, self.bookmarks.folder_id(folder),
+                           self.get_favicon_for_domain(urlparse(url).netloc), tags)
+        self.bookmark_added.emit(url, title or '')
+        return True
+
+    def remove_bookmark(self, url: str) -> bool:
+        """Removes a bookmark by its URL."""
+        if self.bookmarks.remove_url(url):
+            self.bookmark_removed.emit(url)
+            return True
+        return False
+
+    def remove_bookmark_folder(self, folder_id: int):
+        """Removes a bookmark folder and everything in it."""
+        for url in self.bookmarks.remove_folder(folder_id):
+            self.bookmark_removed.emit(url)
+
+    def clear_bookmarks(self):
+        """Removes every bookmark."""
+        self.bookmarks.clear()
+        self.bookmarks_cleared.emit()
+
+    def get_favicon_for_domain(self, domain: str) -> str:
+        """Returns a suitable emoji favicon for a given domain."""
+        return self.favicons.lookup(domain)
+
+class HistorySearchSignals(QObject):
+    """Signals of a HistorySearch (a QRunnable can't have its own); delivered on the GUI thread."""
+    results_ready = pyqtSignal(list) # HistoryEntry page
+    finished = pyqtSignal()
+
+
+class HistorySearch(QRunnable):
+    """
+    One search_history query run on HistoryManager.search_pool. Rows are read from the cursor and sent
+    HISTORY_SEARCH_PAGE at a time, so the first matches show while the rest are read. cancel() stops it
+    between pages or, through an SQLite progress handler, in the middle of a long scan.
+    """
+    def __init__(self, manager: 'HistoryManager', query: str, limit: int):
+        super().__init__()
+        # The pool owns it and deletes it after run(); cancel() only touches Python state, so a
+        # reference kept to cancel it stays usable after that.
+        self.setAutoDelete(True)
+        self.manager = manager
+        self.query = query
+        self.limit = limit
+        self.signals = HistorySearchSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self):
+        if self.cancelled:
+            return
+        conn = self.manager.db.read()
+        conn.set_progress_handler(self._cancelled.is_set, HISTORY_SEARCH_PROGRESS_OPS)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT url, title, visit_count, favicon, domain
-                    FROM history
-                    WHERE visit_count > 1
-                    ORDER BY visit_count DESC, visit_time DESC
-                    LIMIT ?
-                ''', (limit,))
-                return [{
-                    'url': row[0],
-                    'title': row[1] or urlparse(row[0]).netloc,
-                    'visitCount': row[2],
-                    'favicon': row[3],
-                    'domain': row[4]
-                } for row in cursor.fetchall()]
+            cursor = self.manager._search_cursor(conn, self.query, self.limit)
+            while not self.cancelled:
+                rows = cursor.fetchmany(HISTORY_SEARCH_PAGE)
+                if not rows:
+                    break
+                self.signals.results_ready.emit([HistoryEntry(*row) for row in rows])
         except sqlite3.Error as e:
-            print(f"Most visited error: {e}")
-            return []
+            if not self.cancelled: # An interrupted query is how cancelling works
+                print(f"Search history error: {e}")
+        finally:
+            conn.set_progress_handler(None, 0)
+            self.signals.finished.emit()
 
-    def search_history(self, query: str, limit: int = 20) -> list:
-        """Searches the browsing history by title, URL, or domain."""
+
+class HistoryListModel(QAbstractListModel):
+    """Rows of the history dialog, appended a page at a time so the view can show results while more arrive."""
+    def __init__(self, icons: 'FaviconCache', parent: QObject = None):
+        super().__init__(parent)
+        self.icons = icons
+        self._entries = []
+
+    def clear(self):
+        self.beginResetModel()
+        self._entries = []
+        self.endResetModel()
+
+    def append(self, entries: list):
+        if entries:
+            first = len(self._entries)
+            self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+            self._entries.extend(entries)
+            self.endInsertRows()
+
+    def remove(self, urls: list):
+        """Removes the rows of deleted entries in place."""
+        removed = set(urls)
+        for first, last in reversed(self._runs(row for row, site in enumerate(self._entries) if site.url in removed)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._entries[first:last + 1]
+            self.endRemoveRows()
+
+    @staticmethod
+    def _runs(rows) -> list:
+        """Groups ascending row numbers into (first, last) runs of adjacent rows."""
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        return runs
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self._entry_data(self._entries[index.row()], role)
+
+    def _entry_data(self, site: HistoryEntry, role: int, prefix: str = ''):
+        if role == Qt.DisplayRole:
+            if self.icons.has_icon(site.domain):
+                return f"{prefix}{site.title} - {site.url}"
+            return f"{prefix}{site.favicon} {site.title} - {site.url}"
+        if role == Qt.DecorationRole:
+            return self.icons.icon(site.domain)
+        if role == Qt.UserRole:
+            return site.url
+        if role == Qt.UserRole + 1:
+            return site.title
+        return None
+
+
+class HistoryBrowserPage:
+    """
+    One keyset page of a HistoryBrowserModel: its rows (None once evicted) and what it takes to read them
+    again: the key of its first entry, its entry count and the day of the entry before it.
+    """
+    __slots__ = ('first_key', 'last_key', 'entry_count', 'previous_day', 'last_day', 'row_count', 'rows')
+
+    def __init__(self, previous_day):
+        self.previous_day = previous_day
+        self.first_key = self.last_key = self.last_day = None
+        self.entry_count = self.row_count = 0
+        self.rows = None
+
+
+class HistoryBrowserModel(HistoryListModel):
+    """
+    All of history for the history dialog, newest first, with a header row starting each day.
+    Entries are read HISTORY_BROWSER_PAGE at a time by keyset pagination on (visit_time, id), an index range
+    scan however deep the page, and appended through canFetchMore/fetchMore as the view scrolls to the end.
+    Only the HISTORY_BROWSER_CACHED_PAGES most recently used pages keep their rows; the others keep their keys
+    and are read again when scrolled back to, so memory stays flat however far history is scrolled.
+    Deleted entries are removed in place from the pages that are loaded, and from the others once read again.
+    """
+    def __init__(self, manager: 'HistoryManager', parent: QObject = None):
+        super().__init__(manager.icons, parent)
+        self.manager = manager
+        self._pages = []
+        self._first_rows = [] # Row number of each page's first row, for bisect
+        self._cached = OrderedDict() # page number -> None, least recently used first
+        self._complete = False
+
+    def clear(self):
+        self.beginResetModel()
+        self._pages, self._first_rows, self._complete = [], [], False
+        self._cached.clear()
+        self.endResetModel()
+
+    def reload(self):
+        """Starts over from the newest entry; the first page is read right away."""
+        self.clear()
+        self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or not self._pages:
+            return 0
+        return self._first_rows[-1] + self._pages[-1].row_count
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self._complete
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        """Appends the page after the last one read."""
+        if parent.isValid() or self._complete:
+            return
+        last = self._pages[-1] if self._pages else None
+        entries = self._read(last.last_key if last else None, HISTORY_BROWSER_PAGE, inclusive=False)
+        self._complete = len(entries) < HISTORY_BROWSER_PAGE
+        if not entries:
+            return
+        first_row = self.rowCount()
+        page = HistoryBrowserPage(last.last_day if last else None)
+        page.first_key, page.last_key, page.entry_count = entries[0][0], entries[-1][0], len(entries)
+        page.last_day = self._day(entries[-1][1])
+        page.rows = self._layout(entries, page.previous_day)
+        page.row_count = len(page.rows)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + page.row_count - 1)
+        self._pages.append(page)
+        self._first_rows.append(first_row)
+        self._touch(len(self._pages) - 1)
+        self.endInsertRows()
+
+    def _read(self, key: tuple, limit: int, inclusive: bool) -> list:
+        """Reads up to limit (key, HistoryEntry) pairs older than key, or from key on when inclusive."""
+        columns = 'id, url, title, CAST(visit_time AS INTEGER), favicon, domain, visit_count'
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    SELECT url, title, visit_time, favicon, domain
-                    FROM history
-                    WHERE title LIKE ? OR url LIKE ? OR domain LIKE ?
-                    ORDER BY visit_count DESC, visit_time DESC
+            conn = self.manager.db.read()
+            if key is None:
+                cursor = conn.execute(f'SELECT {columns} FROM history ORDER BY visit_time DESC, id DESC LIMIT ?',
+                                      (limit,))
+            else:
+                cursor = conn.execute(f'''
+                    SELECT {columns} FROM history
+                    WHERE (visit_time, id) {'<=' if inclusive else '<'} (?, ?)
+                    ORDER BY visit_time DESC, id DESC
                     LIMIT ?
-                ''', (f'%{query}%', f'%{query}%', f'%{query}%', limit))
-                return [{
-                    'url': row[0],
-                    'title': row[1] or urlparse(row[0]).netloc,
-                    'visitTime': row[2],
-                    'favicon': row[3],
-                    'domain': row[4]
-                } for row in cursor.fetchall()]
+                ''', (*key, limit))
+            return [((row[3], row[0]), HistoryEntry(*row[1:])) for row in cursor]
         except sqlite3.Error as e:
-            print(f"Search history error: {e}")
+            print(f"History page error: {e}")
             return []
 
-    def clear_history(self, days: int = None):
+    @staticmethod
+    def _day(entry: HistoryEntry):
+        return datetime.fromtimestamp(entry.visit_time / 1_000_000).date()
+
+    def _layout(self, entries: list, previous_day) -> list:
+        """Rows for a page's entries: the entries, with a date row wherever a new day starts."""
+        rows = []
+        for _, entry in entries:
+            day = self._day(entry)
+            if day != previous_day:
+                rows.append(day)
+                previous_day = day
+            rows.append(entry)
+        return rows
+
+    def _touch(self, number: int):
+        self._cached.pop(number, None)
+        self._cached[number] = None
+        while len(self._cached) > HISTORY_BROWSER_CACHED_PAGES:
+            evicted, _ = self._cached.popitem(last=False)
+            self._pages[evicted].rows = None
+
+    def _rows(self, number: int) -> list:
+        """A page's rows, read again from its first key if they were evicted."""
+        page = self._pages[number]
+        if page.rows is None:
+            entries = self._read(page.first_key, page.entry_count, inclusive=True)
+            rows = self._layout([e for e in entries if e[0] >= page.last_key], page.previous_day)
+            page.rows = (rows + [None] * page.row_count)[:page.row_count]
+            if len(rows) < page.row_count:
+                # Entries were deleted since the page was first read: blank the gap now, and remove it
+                # once the view is done asking for rows.
+                QTimer.singleShot(0, lambda: self._compact(page))
+        if next(reversed(self._cached)) != number:
+            self._touch(number)
+        return page.rows
+
+    def _row(self, row: int):
+        number = bisect.bisect_right(self._first_rows, row) - 1
+        return self._rows(number)[row - self._first_rows[number]]
+
+    def remove(self, urls: list):
+        """Removes the rows of deleted entries from the loaded pages; evicted pages notice when read again."""
+        removed = set(urls)
+        for number in reversed(range(len(self._pages))):
+            rows = self._pages[number].rows
+            if rows is not None:
+                self._drop(number, {offset for offset, row in enumerate(rows)
+                                    if isinstance(row, HistoryEntry) and row.url in removed})
+
+    def _compact(self, page: HistoryBrowserPage):
+        if page in self._pages: # Not reset since
+            number = self._pages.index(page)
+            self._rows(number)
+            self._drop(number, set())
+
+    def _drop(self, number: int, offsets: set):
+        """
+        Removes the rows at offsets of a loaded page, along with blank rows and date rows that no longer
+        have an entry under them; later pages move up.
+        """
+        page = self._pages[number]
+        rows = page.rows
+        offsets |= {offset for offset, row in enumerate(rows) if row is None}
+        # Whether the row after the one looked at is an entry, which keeps a date row above it.
+        if number + 1 < len(self._pages):
+            later = self._pages[number + 1].rows
+            entry_follows = not later or not isinstance(later[0], date)
+        else:
+            entry_follows = not self._complete
+        for offset in reversed(range(len(rows))):
+            if offset in offsets:
+                continue
+            if isinstance(rows[offset], HistoryEntry):
+                entry_follows = True
+            elif entry_follows:
+                entry_follows = False
+            else:
+                offsets.add(offset)
+        first_row = self._first_rows[number]
+        for first, last in reversed(self._runs(sorted(offsets))):
+            count = last - first + 1
+            self.beginRemoveRows(QModelIndex(), first_row + first, first_row + last)
+            del rows[first:last + 1]
+            page.row_count -= count
+            self._first_rows[number + 1:] = [row - count for row in self._first_rows[number + 1:]]
+            self.endRemoveRows()
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if index.isValid() and not isinstance(self._row(index.row()), HistoryEntry):
+            return Qt.ItemIsEnabled # Date rows can't be selected, opened or deleted
+        return super().flags(index)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._row(index.row())
+        if isinstance(row, HistoryEntry):
+            time_of_day = datetime.fromtimestamp(row.visit_time / 1_000_000).strftime('%H:%M')
+            return self._entry_data(row, role, f"{time_of_day}  ")
+        if row is None:
+            return None
+        if role == Qt.DisplayRole:
+            today = datetime.now().date()
+            if row == today:
+                return "📅 Today"
+            if row == today - timedelta(days=1):
+                return "📅 Yesterday"
+            return f"📅 {row.strftime('%A, %d %B %Y')}"
+        if role == Qt.FontRole:
+            font = QFont()
+            font.setBold(True)
+            return font
+        return None
+
+
+class RecentHistoryModel(QAbstractListModel):
+    """
+    The sidebar's recent history, newest first. Visits, deletions and new favicons from the HistoryManager
+    are applied as single row moves, inserts, removals and repaints rather than by querying again.
+    The model is only connected to those signals while active, so a hidden sidebar does no work;
+    it catches up with one (usually cached) query when it is activated again.
+    """
+    def __init__(self, manager: 'HistoryManager', limit: int = SIDEBAR_HISTORY_ROWS, parent: QObject = None):
+        super().__init__(parent)
+        self.manager = manager
+        self.limit = limit
+        self._entries = []
+        self._active = False
+        self._connections = (
+            (manager.visit_added, self._on_visit_added),
+            (manager.history_removed, self._on_history_removed),
+            (manager.history_cleared, self.reload),
+            (manager.history_imported, self.reload),
+            (manager.icons.icon_stored, self._on_icon_stored),
+        )
+
+    def set_active(self, active: bool):
+        """Follows history changes while active; activating reloads the rows."""
+        if active == self._active:
+            return
+        self._active = active
+        for signal, slot in self._connections:
+            if active:
+                signal.connect(slot)
+            else:
+                signal.disconnect(slot)
+        if active:
+            self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self._entries = list(self.manager.get_recent_sites(self.limit))
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        site = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            return site.title if self.manager.icons.has_icon(site.domain) else f"{site.favicon} {site.title}"
+        if role == Qt.DecorationRole:
+            return self.manager.icons.icon(site.domain)
+        if role == Qt.ToolTipRole:
+            return site.url
+        if role == Qt.UserRole:
+            return site.url
+        if role == Qt.UserRole + 1:
+            return site.domain
+        return None
+
+    def _row_of(self, url: str) -> int:
+        return next((row for row, site in enumerate(self._entries) if site.url == url), None)
+
+    def _on_visit_added(self, url: str, title: str, transition: int):
+        """Moves a revisited site to the top, or inserts a new one there and drops the oldest row."""
+        row = self._row_of(url)
+        old = self._entries[row] if row is not None else None
+        domain = urlsplit(url).netloc.lower()
+        site = HistoryEntry(url, title or (old.title if old else None), int(time.time() * 1_000_000),
+                            self.manager.get_favicon_for_domain(domain), domain, old.visit_count + 1 if old else 1)
+        if row is None:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._entries.insert(0, site)
+            self.endInsertRows()
+            if len(self._entries) > self.limit:
+                self.beginRemoveRows(QModelIndex(), self.limit, len(self._entries) - 1)
+                del self._entries[self.limit:]
+                self.endRemoveRows()
+            return
+        if row > 0:
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+            del self._entries[row]
+            self._entries.insert(0, old)
+            self.endMoveRows()
+        self._entries[0] = site
+        self.dataChanged.emit(self.index(0), self.index(0))
+
+    def _on_history_removed(self, urls: list):
+        """Removes deleted rows, then fills the list back up with the next most recent sites."""
+        removed = set(urls)
+        for row in reversed(range(len(self._entries))):
+            if self._entries[row].url in removed:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._entries[row]
+                self.endRemoveRows()
+        if len(self._entries) < self.limit:
+            shown = {site.url for site in self._entries}
+            extra = [site for site in self.manager.get_recent_sites(self.limit) if site.url not in shown]
+            extra = extra[:self.limit - len(self._entries)]
+            if extra:
+                first = len(self._entries)
+                self.beginInsertRows(QModelIndex(), first, first + len(extra) - 1)
+                self._entries.extend(extra)
+                self.endInsertRows()
+
+    def _on_icon_stored(self, host: str):
+        for row, site in enumerate(self._entries):
+            if site.domain == host:
+                self.dataChanged.emit(self.index(row), self.index(row), [Qt.DisplayRole, Qt.DecorationRole])
+
+# --- History and Bookmark Import / Export ---
+class HistoryTransfer(QThread):
+    """
+    Base class for streaming history and bookmark imports and exports on a worker thread.
+    Subclasses implement _transfer(), which returns a summary message and reports progress
+    as (rows done, total rows) through progress_updated.
+    """
+    progress_updated = pyqtSignal(int, int) # rows done, total rows (0 when unknown)
+    transfer_finished = pyqtSignal(bool, str) # success, message
+
+    def __init__(self, history_manager: 'HistoryManager', path: str):
+        super().__init__()
+        self.history_manager = history_manager
+        self.path = path
+        self.should_stop = False
+        self.rows_done = 0
+
+    def stop(self):
+        """Asks the transfer to stop after the current batch."""
+        self.should_stop = True
+
+    def run(self):
+        """Runs the transfer and reports how it ended."""
+        try:
+            message = self._transfer()
+            if self.should_stop:
+                self.transfer_finished.emit(False, f"Cancelled after {self.rows_done:,} entries.")
+            else:
+                self.transfer_finished.emit(True, message)
+        except Exception as e:
+            print(f"History transfer error: {e}")
+            self.transfer_finished.emit(False, str(e))
+
+    def _transfer(self) -> str:
+        raise NotImplementedError
+
+class HistoryImporter(HistoryTransfer):
+    """
+    Streams history from another browser into history.db.
+    Sources: Chrome's "History" and Firefox's "places.sqlite" databases, the legacy browser.py
+    history journal (or its older JSON list) and NDJSON written by HistoryExporter. Rows are read with a cursor and written in
+    HISTORY_IMPORT_BATCH-row executemany transactions, so memory stays flat whatever the source size.
+    Existing entries keep the higher visit count and the newer visit time and title.
+    """
+    SOURCES = ('chrome', 'firefox', 'legacy', 'ndjson')
+    # Same netloc urlparse() finds for scheme://host/... URLs, at a fraction of the cost per row.
+    NETLOC_PATTERN = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*://([^/?#]*)')
+
+    def __init__(self, history_manager: 'HistoryManager', path: str, source: str = None):
+        super().__init__(history_manager, path)
+        self.source = source or self.detect_source(path)
+        self._favicon_for = history_manager.favicons.lookup
+        self.rows_skipped = 0 # Source entries that were not JSON objects
+
+    @staticmethod
+    def detect_source(path: str) -> str:
+        """Guesses the source format from the file's contents."""
+        with open(path, 'rb') as f:
+            header = f.read(16)
+        if header.startswith(b'SQLite format 3'):
+            conn = HistoryImporter._open_source(path)
+            try:
+                tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            finally:
+                conn.close()
+            if 'moz_places' in tables:
+                return 'firefox'
+            if 'urls' in tables:
+                return 'chrome'
+            raise ValueError("Unrecognised SQLite database: expected Chrome 'urls' or Firefox 'moz_places'.")
+        if header.lstrip().startswith(b'['):
+            return 'legacy'
+        # browser.py's journal and our NDJSON export are both JSON lines; the journal uses browser.py's field names.
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                first = json.loads(f.readline() or '{}')
+            except ValueError:
+                first = None
+        if not isinstance(first, dict):
+            raise ValueError("Unrecognised history file: expected a SQLite database, a JSON list or JSON lines.")
+        return 'legacy' if 'visitTime' in first or 'event' in first else 'ndjson'
+
+    @staticmethod
+    def _open_source(path: str) -> sqlite3.Connection:
+        # immutable=1 reads the file without taking locks, so a browser that is still running can't block us.
+        return sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+
+    def _transfer(self) -> str:
+        if self.source not in self.SOURCES:
+            raise ValueError(f"Unknown history source '{self.source}'.")
+        read = getattr(self, f"_read_{self.source}")
+        if self.source in ('chrome', 'firefox'):
+            conn = self._open_source(self.path)
+            try:
+                self._write(*read(conn))
+            finally:
+                conn.close()
+        else:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._write(*read(f))
+        message = f"Imported {self.rows_done:,} history entries from {self.source}."
+        if self.rows_skipped:
+            message += f" Skipped {self.rows_skipped:,} unreadable entries."
+        return message
+
+    def _read_chrome(self, conn: sqlite3.Connection):
+        """
+        Chrome stores microseconds since 1601-01-01.
+        Rows are read in URL order, as from Firefox: consecutive batches then touch neighbouring pages of
+        history's url indexes instead of random ones, which makes large imports about a third faster.
+        """
+        total = conn.execute('SELECT COUNT(*) FROM urls WHERE hidden = 0').fetchone()[0]
+        return conn.execute('''
+            SELECT url, title, MAX(last_visit_time - ?, 0), visit_count, typed_count, NULL
+            FROM urls WHERE hidden = 0 ORDER BY url
+        ''', (CHROME_EPOCH_OFFSET_US,)), total
+
+    def _read_firefox(self, conn: sqlite3.Connection):
+        """Firefox stores microseconds since the Unix epoch; 'typed' is a flag rather than a count."""
+        total = conn.execute('SELECT COUNT(*) FROM moz_places WHERE hidden = 0 AND visit_count > 0').fetchone()[0]
+        return conn.execute('''
+            SELECT url, title, COALESCE(last_visit_date, 0), visit_count, typed, NULL
+            FROM moz_places WHERE hidden = 0 AND visit_count > 0 ORDER BY url
+        '''), total
+
+    def _read_legacy(self, f):
+        """
+        browser.py history: its journal (one visit or {"event": "clear"} per line, replayed here) or the
+        older JSON list. Both hold a bounded number of entries with local-time ISO timestamps.
+        """
+        first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            listed = json.load(f)
+            entries = [entry for entry in listed if isinstance(entry, dict)]
+            self.rows_skipped += len(listed) - len(entries)
+        else:
+            replayed = {}
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue # Torn last line
+                if not isinstance(event, dict):
+                    self.rows_skipped += 1
+                elif event.get('event') == 'clear':
+                    replayed.clear()
+                elif event.get('url'):
+                    replayed[event['url']] = event
+            entries = list(replayed.values())
+
+        def rows():
+            for entry in entries:
+                try:
+                    visit_time = int(datetime.fromisoformat(entry['visitTime']).timestamp() * 1_000_000)
+                except (KeyError, TypeError, ValueError):
+                    visit_time = 0
+                yield entry.get('url'), entry.get('title'), visit_time, 1, 0, None
+        return rows(), len(entries)
+
+    def _read_ndjson(self, f):
+        """
+        One JSON object per line, as written by HistoryExporter; the total is unknown up front.
+        Lines that are not JSON objects are skipped and counted in rows_skipped.
         """
-        Clears browsing history.
-        If 'days' is specified, clears history older than that many days.
-        Otherwise, clears all history.
+        def rows():
+            for line in f:
+                if line.strip():
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        entry = None
+                    if not isinstance(entry, dict):
+                        self.rows_skipped += 1
+                        continue
+                    yield (entry.get('url'), entry.get('title'), entry.get('visit_time', 0),
+                           entry.get('visit_count', 1), 0, entry.get('frecency'))
+        return rows(), 0
+
+    def _convert(self, rows):
         """
+        Turns (url, title, visit_time, visit_count, typed, frecency) source rows into history table rows.
+        A missing frecency is estimated from the counts, as if every visit had been made at the last visit time.
+        """
+        now = time.time() * 1_000_000
+        link_bonus = FRECENCY_TRANSITION_BONUS[TRANSITION_LINK]
+        typed_extra = FRECENCY_TRANSITION_BONUS[TRANSITION_TYPED] - link_bonus
+        decay_per_us = FRECENCY_DECAY_FACTOR ** (1 / (FRECENCY_DECAY_INTERVAL_S * 1_000_000))
+        for url, title, visit_time, visit_count, typed, frecency in rows:
+            if not url or url.startswith(HISTORY_IGNORED_SCHEMES):
+                continue
+            match = self.NETLOC_PATTERN.match(url)
+            domain = match.group(1).lower() if match else ''
+            favicon = self._favicon_for(domain)
+            visit_count = max(visit_count or 1, 1)
+            if frecency is None:
+                frecency = (visit_count * link_bonus + min(typed or 0, visit_count) * typed_extra) \
+                    * decay_per_us ** max(now - visit_time, 0)
+            yield url, title or None, domain, favicon, visit_time, visit_count, frecency
+
+    def _write(self, rows, total: int):
+        """Writes rows in batches, one transaction each, reporting progress after every batch."""
+        converted = self._convert(rows)
+        while not self.should_stop:
+            batch = list(islice(converted, HISTORY_IMPORT_BATCH))
+            if not batch:
+                break
+            with self.history_manager.db.write() as conn:
+                fts_trigger = None
+                if self.history_manager.fts_enabled:
+                    # Index the batch's new rows with one INSERT ... SELECT rather than a trigger per row,
+                    # which is several times faster. The trigger is restored before the transaction commits.
+                    fts_trigger = conn.execute(
+                        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'history_fts_insert'").fetchone()[0]
+                    conn.execute('DROP TRIGGER history_fts_insert')
+                    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM history').fetchone()[0]
+                # Rows merged into existing entries are reindexed by history_fts_update, which DO UPDATE fires.
+                conn.executemany('''
+                    INSERT INTO history (url, title, domain, favicon, visit_time, visit_count, frecency)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        title = CASE WHEN excluded.visit_time > visit_time
+                                     THEN COALESCE(excluded.title, title) ELSE title END,
+                        visit_time = MAX(visit_time, excluded.visit_time),
+                        visit_count = MAX(visit_count, excluded.visit_count),
+                        frecency = MAX(frecency, excluded.frecency)
+                ''', batch)
+                if fts_trigger:
+                    conn.execute('''
+                        INSERT INTO history_fts(rowid, title, url, domain)
+                        SELECT id, title, url, domain FROM history WHERE id > ?
+                    ''', (last_id,))
+                    conn.execute(fts_trigger)
+            self.rows_done += len(batch)
+            self.progress_updated.emit(self.rows_done, total)
+
+class HistoryExporter(HistoryTransfer):
+    """
+    Streams history.db to an NDJSON file, one JSON object per history entry, oldest entry first.
+    The file is written next to the target and moved into place once complete.
+    """
+    def _transfer(self) -> str:
+        db = self.history_manager.db
+        temp_path = self.path + '.tmp'
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                if days is not None:
-                    cutoff_date = datetime.now() - timedelta(days=days)
-                    conn.execute('DELETE FROM history WHERE visit_time < ?', (cutoff_date.isoformat(),))
-                else:
-                    conn.execute('DELETE FROM history')
-        except sqlite3.Error as e:
-            print(f"Clear history error: {e}")
+            conn = db.read()
+            total = conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+            cursor = conn.execute('SELECT url, title, domain, visit_time, visit_count, frecency FROM history ORDER BY id')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                while not self.should_stop:
+                    batch = cursor.fetchmany(HISTORY_IMPORT_BATCH)
+                    if not batch:
+                        break
+                    f.writelines(json.dumps({
+                        'url': row[0], 'title': row[1], 'domain': row[2],
+                        'visit_time': row[3], 'visit_count': row[4], 'frecency': row[5]
+                    }, ensure_ascii=False) + '\n' for row in batch)
+                    self.rows_done += len(batch)
+                    self.progress_updated.emit(self.rows_done, total)
+            if self.should_stop:
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, self.path)
+        finally:
+            db.release_reader()
+        return f"Exported {self.rows_done:,} history entries."
 
-    def delete_history_entry(self, url: str):
-        """Deletes a specific history entry by URL."""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute('DELETE FROM history WHERE url = ?', (url,))
-        except sqlite3.Error as e:
-            print(f"Delete history entry error: {e}")
+class NetscapeBookmarkParser:
+    """
+    Incremental parser for the Netscape bookmark file every browser exports: <DT><H3>name</H3><DL>...</DL>
+    is a folder, and <DT><A HREF="..." ADD_DATE="..." TAGS="...">title</A> a bookmark.
+    It is fed the file in chunks and tokenizes only those tags, never building a document tree; an incomplete
+    tag at the end of a chunk waits for the next one. Finished rows collect in nodes (parents before children)
+    and tags until the caller takes them, and only the open folders are remembered.
+    """
+    IMPORTED_SCHEMES = ('http:', 'https:', 'ftp:', 'file:')
+    # A list start or end, or a whole folder heading or link with its text. Titles in these files are escaped.
+    TOKEN_PATTERN = re.compile(r'<(/?)dl\b[^>]*>|<(h3|a)\b([^>]*)>([^<]*)</\2\s*>', re.IGNORECASE)
+    ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)\s*=\s*"([^"]*)"')
+
+    def __init__(self, root_id: int, allocate_id, row_for_bookmark):
+        self.nodes = [] # bookmarks rows, in BookmarkStore column order
+        self.tags = [] # (bookmark id, tag)
+        self.bookmarks = 0
+        self._allocate_id = allocate_id
+        self._row_for_bookmark = row_for_bookmark # (id, parent id, position, url, title, attrs) -> row or None
+        self._root_id = root_id
+        self._open_folders = [] # ids of folders whose <DL> is open
+        self._positions = {root_id: 0}
+        self._next_list = root_id # folder the next <DL> belongs to; the outermost list is the root's
+        self._buffer = ''
+
+    def feed(self, data: str):
+        """Parses every complete token in the text received so far."""
+        self._buffer += data
+        end = 0
+        for match in self.TOKEN_PATTERN.finditer(self._buffer):
+            end = match.end()
+            tag = match.group(2)
+            if tag is None and match.group(1):
+                self._end_list()
+            elif tag is None:
+                self._start_list()
+            elif tag in ('a', 'A'):
+                attrs = {name.lower(): unescape(value) for name, value in self.ATTRIBUTE_PATTERN.findall(match.group(3))}
+                self._link(attrs, unescape(match.group(4)).strip())
+            else:
+                self._folder(unescape(match.group(4)).strip())
+        self._buffer = self._buffer[end:]
+
+    def close(self):
+        """Drops whatever incomplete markup is left at the end of the file."""
+        self._buffer = ''
+
+    def _parent(self) -> int:
+        return self._open_folders[-1] if self._open_folders else self._root_id
+
+    def _take_position(self, parent_id: int) -> int:
+        position = self._positions[parent_id]
+        self._positions[parent_id] = position + 1
+        return position
+
+    def _start_list(self):
+        self._open_folders.append(self._next_list if self._next_list is not None else self._parent())
+        self._next_list = None
+
+    def _end_list(self):
+        if self._open_folders:
+            folder_id = self._open_folders.pop()
+            if folder_id != self._root_id:
+                self._positions.pop(folder_id, None)
+
+    def _folder(self, title: str):
+        folder_id = self._allocate_id()
+        parent_id = self._parent()
+        self.nodes.append((folder_id, parent_id, 1, title, None, self._take_position(parent_id), None,
+                           int(time.time() * 1_000_000)))
+        self._positions[folder_id] = 0
+        self._next_list = folder_id
+
+    def _link(self, attrs: dict, title: str):
+        url = attrs.get('href', '').strip()
+        if not url.lower().startswith(self.IMPORTED_SCHEMES):
+            return
+        node_id = self._allocate_id()
+        parent_id = self._parent()
+        row = self._row_for_bookmark(node_id, parent_id, self._positions[parent_id], url, title, attrs)
+        if row is None:
+            return
+        self._take_position(parent_id)
+        self.nodes.append(row)
+        self.tags.extend((node_id, tag.strip()) for tag in attrs.get('tags', '').split(',') if tag.strip())
+        self.bookmarks += 1
 
-    def load_bookmarks(self) -> list:
-        """Loads bookmarks from the JSON file."""
-        try:
-            if os.path.exists(self.bookmarks_path):
-                with open(self.bookmarks_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Bookmarks load error: {e}")
-        return []
 
-    def save_bookmarks(self):
-        """Saves current bookmarks to the JSON file."""
+class BookmarkImporter(HistoryTransfer):
+    """
+    Streams a Netscape bookmark HTML file into a new top-level bookmark folder.
+    The file is parsed in BOOKMARK_IMPORT_CHUNK-character pieces and written in BOOKMARK_IMPORT_BATCH-row
+    transactions, so memory stays flat whatever the file size. URLs that are already bookmarked are skipped.
+    Progress totals are estimated from the share of the file read so far.
+    """
+    def __init__(self, history_manager: 'HistoryManager', path: str, folder: BookmarkNode):
+        super().__init__(history_manager, path)
+        self.folder = folder
+        self.skipped = 0
+        self.folder_written = False
+        self._store = history_manager.bookmarks
+        self._favicon_for = history_manager.favicons.lookup
+        self._next_id = self._end_id = 0
+
+    def _allocate_id(self) -> int:
+        """Hands out ids from blocks reserved in the store, so they never collide with bookmarks added meanwhile."""
+        if self._next_id == self._end_id:
+            self._next_id = self._store.reserve_ids(BOOKMARK_IMPORT_BATCH)
+            self._end_id = self._next_id + BOOKMARK_IMPORT_BATCH
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _row_for_bookmark(self, node_id: int, parent_id: int, position: int, url: str, title: str, attrs: dict):
+        """Builds a bookmarks row, or returns None for a URL that is already bookmarked."""
+        if url in self._store:
+            self.skipped += 1
+            return None
         try:
-            os.makedirs(os.path.dirname(self.bookmarks_path), exist_ok=True)
-            with open(self.bookmarks_path, 'w', encoding='utf-8') as f:
-                json.dump(self.bookmarks, f, indent=2, ensure_ascii=False)
-        except IOError as e:
-            print(f"Bookmarks save error: {e}")
-
-    def add_bookmark(self, url: str, title: str, folder: str = "General"):
-        """Adds a new bookmark."""
-        # Check if bookmark already exists to prevent duplicates
-        for bookmark in self.bookmarks:
-            if bookmark['url'] == url:
-                QMessageBox.information(None, "Bookmark Exists", "This page is already bookmarked.")
-                return
+            added = int(attrs.get('add_date')) * 1_000_000
+        except (TypeError, ValueError):
+            added = int(time.time() * 1_000_000)
+        match = HistoryImporter.NETLOC_PATTERN.match(url)
+        domain = match.group(1).lower() if match else ''
+        favicon = self._favicon_for(domain)
+        return (node_id, parent_id, 0, title, url, position, favicon, added)
+
+    def _transfer(self) -> str:
+        folder = self.folder
+        size = max(os.path.getsize(self.path), 1)
+        parser = NetscapeBookmarkParser(folder.id, self._allocate_id, self._row_for_bookmark)
+        parser.nodes.append((folder.id, None, 1, folder.title, None, folder.position, None, folder.added_time))
+        read = 0
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            while not self.should_stop:
+                chunk = f.read(BOOKMARK_IMPORT_CHUNK)
+                if chunk:
+                    parser.feed(chunk)
+                    read += len(chunk)
+                else:
+                    parser.close()
+                if len(parser.nodes) >= BOOKMARK_IMPORT_BATCH or not chunk:
+                    self._write(parser)
+                    self.progress_updated.emit(self.rows_done, self.rows_done * size // max(read, 1))
+                if not chunk:
+                    break
+        message = f"Imported {self.rows_done:,} bookmarks into '{folder.title}'."
+        if self.skipped:
+            message += f" {self.skipped:,} already bookmarked pages were skipped."
+        return message
+
+    def _write(self, parser: NetscapeBookmarkParser):
+        """Inserts the rows parsed so far in one transaction."""
+        if not parser.nodes:
+            return
+        with self.history_manager.db.write() as conn:
+            conn.executemany(f'INSERT INTO bookmarks ({BookmarkStore._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             parser.nodes)
+            conn.executemany('INSERT OR IGNORE INTO bookmark_tags (bookmark_id, tag) VALUES (?, ?)', parser.tags)
+        self.folder_written = True
+        self.rows_done = parser.bookmarks
+        parser.nodes.clear()
+        parser.tags.clear()
+
+# --- Bookmark Link Health ---
+class LinkCheckConnection(http.client.HTTPConnection):
+    """HTTP(S) connection that can tunnel through a SOCKS5 proxy, resolving host names on the proxy as Tor expects."""
+    ssl_context = ssl.create_default_context()
+
+    def __init__(self, host: str, port: int, tls: bool, proxy: dict, timeout: float):
+        super().__init__(host, port, timeout=timeout)
+        self.tls = tls
+        self.proxy = proxy
+
+    def connect(self):
+        if self.proxy.get("type") == "socks5":
+            sock = self._open_socks5(self.proxy["host"], self.proxy["port"])
+        else:
+            sock = socket.create_connection((self.host, self.port), self.timeout)
+        if self.tls:
+            sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+        self.sock = sock
+
+    def _open_socks5(self, proxy_host: str, proxy_port: int) -> socket.socket:
+        """Opens a tunnel with a SOCKS5 CONNECT (RFC 1928, no authentication) to self.host:self.port."""
+        sock = socket.create_connection((proxy_host, proxy_port), self.timeout)
+        try:
+            sock.sendall(b'\x05\x01\x00')
+            if self._receive(sock, 2) != b'\x05\x00':
+                raise OSError("SOCKS5 proxy refused the connection")
+            name = self.host.encode('idna')
+            sock.sendall(b'\x05\x01\x00\x03' + bytes([len(name)]) + name + self.port.to_bytes(2, 'big'))
+            reply = self._receive(sock, 4)
+            if reply[1] != 0:
+                raise OSError(f"SOCKS5 proxy could not connect (reply {reply[1]})")
+            address_length = {1: 4, 4: 16}.get(reply[3]) or self._receive(sock, 1)[0]
+            self._receive(sock, address_length + 2) # Bound address and port, unused
+            return sock
+        except Exception:
+            sock.close()
+            raise
+
+    @staticmethod
+    def _receive(sock: socket.socket, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise OSError("SOCKS5 proxy closed the connection")
+            data += chunk
+        return data
+
+
+class BookmarkLinkChecker(QThread):
+    """
+    Checks bookmarked http(s) links for dead pages, redirects and slow responses on a worker thread.
+    Requests run on a pool of LINK_CHECK_WORKERS threads with at most LINK_CHECK_PER_HOST at a time per host,
+    and go through the Tor SOCKS port when ProxyManager finds one. Each link gets a HEAD request, retried
+    as GET when a server refuses HEAD; redirects are followed to the final page. Results are stored in
+    link_checks and reused for LINK_CHECK_TTL_S unless the check is forced.
+    """
+    progress_updated = pyqtSignal(int, int) # links checked, links to check
+    check_finished = pyqtSignal(bool, str) # success, message
+    REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+    HEAD_REFUSED_STATUSES = (403, 405, 501)
 
-        bookmark = {
-            'url': url,
-            'title': title,
-            'folder': folder,
-            'added_time': datetime.now().isoformat(),
-            'favicon': self.get_favicon_for_domain(urlparse(url).netloc)
-        }
-        self.bookmarks.append(bookmark)
-        self.save_bookmarks()
+    def __init__(self, history_manager: 'HistoryManager', proxy_manager: ProxyManager, force: bool = False):
+        super().__init__()
+        self.history_manager = history_manager
+        self.proxy_manager = proxy_manager
+        self.force = force
+        self.should_stop = False
+        self.rows_done = 0
+        self.counts = dict.fromkeys(LINK_STATES, 0)
+        self._proxy = {"type": "direct"}
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
 
-    def remove_bookmark(self, url: str):
-        """Removes a bookmark by its URL."""
-        initial_count = len(self.bookmarks)
-        self.bookmarks = [b for b in self.bookmarks if b['url'] != url]
-        if len(self.bookmarks) < initial_count:
-            self.save_bookmarks()
-            return True
-        return False
+    def stop(self):
+        """Asks the check to stop; requests already in flight finish or time out."""
+        self.should_stop = True
 
-    def get_favicon_for_domain(self, domain: str) -> str:
+    def run(self):
+        """Checks every link that has no fresh result and reports how it ended."""
+        try:
+            urls = self._urls_to_check()
+            self._proxy = self.proxy_manager.get_proxy_config()
+            with ThreadPoolExecutor(max_workers=LINK_CHECK_WORKERS, thread_name_prefix="LinkCheck") as pool:
+                results = []
+                for result in pool.map(self._check, urls):
+                    if result is None:
+                        continue
+                    results.append(result)
+                    self.counts[result[1]] += 1
+                    self.rows_done += 1
+                    if len(results) >= LINK_CHECK_BATCH:
+                        self._store(results)
+                        self.progress_updated.emit(self.rows_done, len(urls))
+                self._store(results)
+            self.progress_updated.emit(self.rows_done, len(urls))
+            summary = (f"Checked {self.rows_done:,} bookmark links: {self.counts[LINK_BROKEN]:,} broken, "
+                       f"{self.counts[LINK_UNREACHABLE]:,} unreachable, {self.counts[LINK_REDIRECTED]:,} redirected, "
+                       f"{self.counts[LINK_SLOW]:,} slow.")
+            self.check_finished.emit(not self.should_stop, summary)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Link check error: {e}")
+            self.check_finished.emit(False, str(e))
+        finally:
+            self.history_manager.db.release_reader()
+
+    def _urls_to_check(self) -> list:
         """
-        Returns a suitable emoji favicon for a given domain.
-        Prioritizes specific domain mappings, then TLD mappings.
-        """
-        favicon_map = {
-            'github.com': '🐙', 'gitlab.com': '🦊', 'stackoverflow.com': '📚',
-            'developer.mozilla.org': '🦎', 'docs.python.org': '🐍', 'pypi.org': '🐍',
-            'youtube.com': '📺', 'youtu.be': '📺', 'netflix.com': '🎬', 'twitch.tv': '🎮',
-            'vimeo.com': '📹', 'tiktok.com': '🎵', 'spotify.com': '🎵', 'soundcloud.com': '🎵',
-            'reddit.com': '🤖', 'twitter.com': '🐦', 'x.com': '🐦', 'facebook.com': '📘',
-            'instagram.com': '📷', 'linkedin.com': '💼', 'discord.com': '💬',
-            'gmail.com': '📧', 'mail.proton.me': '🛡️', 'outlook.com': '📧',
-            'google.com': '🔍', 'duckduckgo.com': '🦆', 'wikipedia.org': '📖',
-            'archive.org': '📚', 'scholar.google.com': '🎓',
-            'amazon.com': '📦', 'ebay.com': '🏪', 'etsy.com': '🎨',
-            'bbc.com': '📰', 'cnn.com': '📰', 'reuters.com': '📰',
-            'protonmail.com': '🛡️', 'signal.org': '🔒', 'torproject.org': '🧅'
-        }
+        Returns the bookmarked http(s) URLs without a result younger than LINK_CHECK_TTL_S, interleaved
+        by host so the pool spreads over many hosts instead of queueing behind one.
+        """
+        with self.history_manager.db.write() as conn:
+            conn.execute('DELETE FROM link_checks WHERE url NOT IN (SELECT url FROM bookmarks WHERE url IS NOT NULL)')
+        cutoff = int(time.time() * 1_000_000) - (0 if self.force else LINK_CHECK_TTL_S * 1_000_000)
+        by_host = {}
+        for (url,) in self.history_manager.db.read().execute('''
+            SELECT DISTINCT b.url FROM bookmarks b LEFT JOIN link_checks c ON c.url = b.url
+            WHERE (b.url LIKE 'http://%' OR b.url LIKE 'https://%') AND (c.checked_at IS NULL OR c.checked_at < ?)
+        ''', (cutoff,)):
+            match = HistoryImporter.NETLOC_PATTERN.match(url)
+            by_host.setdefault(match.group(1).lower() if match else '', []).append(url)
+        return [url for group in zip_longest(*by_host.values()) for url in group if url is not None]
+
+    def _host_slot(self, host: str) -> threading.Semaphore:
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.Semaphore(LINK_CHECK_PER_HOST)
+            return slot
+
+    def _request(self, url: str) -> tuple:
+        """Returns (status, Location header) for url: HEAD first, GET when the server refuses HEAD."""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Cannot check '{url}'")
+        tls = parts.scheme == 'https'
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        headers = {'User-Agent': f"Mozilla/5.0 ({APP_NAME} link check)", 'Accept': '*/*'}
+        with self._host_slot(parts.hostname.lower()):
+            for method in ('HEAD', 'GET'):
+                conn = LinkCheckConnection(parts.hostname, parts.port or (443 if tls else 80), tls, self._proxy,
+                                           LINK_CHECK_TIMEOUT_S)
+                try:
+                    conn.request(method, path, headers=headers)
+                    response = conn.getresponse() # The body of a GET is never read
+                    if method == 'GET' or response.status not in self.HEAD_REFUSED_STATUSES:
+                        return response.status, response.getheader('Location')
+                finally:
+                    conn.close()
+
+    def _check(self, url: str):
+        """Runs on a pool thread: classifies one link, or returns None when the check was stopped."""
+        if self.should_stop:
+            return None
+        start = time.monotonic()
+        final_url, status, error = url, None, None
+        try:
+            for _ in range(LINK_CHECK_MAX_REDIRECTS + 1):
+                status, location = self._request(final_url)
+                if status not in self.REDIRECT_STATUSES or not location:
+                    break
+                final_url = urljoin(final_url, location)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            error = str(e) or e.__class__.__name__
+        elapsed_ms = int((time.monotonic() - start) * 1000)
+        if error is not None:
+            state = LINK_UNREACHABLE
+        elif status >= 400 or status in self.REDIRECT_STATUSES: # Error page, or too many redirects
+            state = LINK_BROKEN
+        elif final_url != url:
+            state = LINK_REDIRECTED
+        elif elapsed_ms >= LINK_CHECK_SLOW_MS:
+            state = LINK_SLOW
+        else:
+            state = LINK_OK
+        return (url, state, status, final_url if final_url != url else None, elapsed_ms, error,
+                int(time.time() * 1_000_000))
+
+    def _store(self, results: list):
+        """Writes a batch of results and empties the list."""
+        if results:
+            with self.history_manager.db.write() as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO link_checks (url, state, status, final_url, elapsed_ms, error, checked_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', results)
+            results.clear()
+
+# --- URL Bar Autocomplete ---
+class CompletionEntry:
+    """One autocomplete candidate: a history URL, a bookmark, or both."""
+    __slots__ = ('id', 'url', 'title', 'frecency', 'in_history', 'bookmarked', 'tokens', 'haystack')
+
+    def __init__(self, entry_id: int, url: str, title: str, frecency: float):
+        self.id = entry_id
+        self.url = url
+        self.title = title
+        self.frecency = frecency
+        self.in_history = False
+        self.bookmarked = False
+        self.tokens = ()
+        self.haystack = ''
+
+class AutocompleteIndex:
+    """
+    In-memory prefix index over history URLs, titles and bookmarks, ranked by frecency.
+    Every URL and title word is a token. A sorted (token, entry id) list answers prefix
+    lookups with bisect, and a list kept sorted by frecency serves broad queries by scanning
+    from the top and stopping after k matches. All updates are incremental.
+    Not thread-safe: build it on one thread, then use it only from the GUI thread.
+    """
+    def __init__(self):
+        self._entries = {} # url -> CompletionEntry
+        self._by_id = []
+        self._postings = [] # sorted (token, entry id)
+        self._by_frecency = [] # sorted (-frecency, entry id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def tokenize(text: str) -> list:
+        """Splits a URL, title or query into lowercase word tokens, ignoring the scheme and 'www'."""
+        return [t for t in AUTOCOMPLETE_TOKEN_PATTERN.findall(text.lower()) if t not in AUTOCOMPLETE_IGNORED_TOKENS]
+
+    def add_visit(self, url: str, title: str, frecency_bonus: float):
+        """Records a visit: creates the entry or raises its frecency, and picks up a new title."""
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = self._create(url, title, frecency_bonus)
+        else:
+            if title and title != entry.title:
+                self._retokenize(entry, title)
+            self._set_frecency(entry, entry.frecency + frecency_bonus)
+        entry.in_history = True
+
+    def add_bookmark(self, url: str, title: str):
+        """Marks a URL as bookmarked, adding it if it has never been visited."""
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = self._create(url, title, FRECENCY_TRANSITION_BONUS[TRANSITION_BOOKMARK])
+        entry.bookmarked = True
 
-        for key, icon in favicon_map.items():
-            if key in domain.lower():
-                return icon
+    def remove_bookmark(self, url: str):
+        """Clears the bookmark flag, dropping the entry if it has no history either."""
+        entry = self._entries.get(url)
+        if entry is not None:
+            entry.bookmarked = False
+            if not entry.in_history:
+                self._remove(entry)
+
+    def remove_history(self, url: str):
+        """Forgets a URL's history, keeping the entry only if it is bookmarked."""
+        entry = self._entries.get(url)
+        if entry is not None:
+            entry.in_history = False
+            if not entry.bookmarked:
+                self._remove(entry)
+
+    def query(self, text: str, k: int = AUTOCOMPLETE_MAX_RESULTS) -> list:
+        """Returns up to k entries whose tokens start with every query term, highest frecency first."""
+        terms = self.tokenize(text)
+        if not terms:
+            return []
+        needles = [' ' + term for term in terms]
+        longest = max(terms, key=len)
+        lo = bisect.bisect_left(self._postings, (longest,))
+        hi = bisect.bisect_left(self._postings, (longest + '\uffff',))
+
+        if hi - lo <= AUTOCOMPLETE_SPARSE_LIMIT:
+            # Selective term: rank just the entries it points at.
+            candidates = {self._postings[i][1] for i in range(lo, hi)}
+            matches = [entry for entry in (self._by_id[i] for i in candidates)
+                       if all(needle in entry.haystack for needle in needles)]
+            return heapq.nlargest(k, matches, key=lambda entry: entry.frecency)
+
+        # Broad term (e.g. one letter): matches are dense, so the top-frecency entries match quickly.
+        results = []
+        for _, entry_id in self._by_frecency:
+            entry = self._by_id[entry_id]
+            if all(needle in entry.haystack for needle in needles):
+                results.append(entry)
+                if len(results) == k:
+                    break
+        return results
+
+    def _create(self, url: str, title: str, frecency: float) -> CompletionEntry:
+        entry = CompletionEntry(len(self._by_id), url, title or '', frecency)
+        self._by_id.append(entry)
+        self._entries[url] = entry
+        self._index_tokens(entry)
+        bisect.insort(self._by_frecency, (-frecency, entry.id))
+        return entry
+
+    def _remove(self, entry: CompletionEntry):
+        self._unindex_tokens(entry)
+        self._remove_sorted(self._by_frecency, (-entry.frecency, entry.id))
+        del self._entries[entry.url]
+        self._by_id[entry.id] = None
+
+    def _set_frecency(self, entry: CompletionEntry, frecency: float):
+        self._remove_sorted(self._by_frecency, (-entry.frecency, entry.id))
+        entry.frecency = frecency
+        bisect.insort(self._by_frecency, (-frecency, entry.id))
+
+    def _retokenize(self, entry: CompletionEntry, title: str):
+        self._unindex_tokens(entry)
+        entry.title = title
+        self._index_tokens(entry)
+
+    def _index_tokens(self, entry: CompletionEntry):
+        entry.tokens = tuple(dict.fromkeys(self.tokenize(entry.url) + self.tokenize(entry.title)))
+        entry.haystack = ' ' + ' '.join(entry.tokens)
+        for token in entry.tokens:
+            bisect.insort(self._postings, (token, entry.id))
+
+    def _unindex_tokens(self, entry: CompletionEntry):
+        for token in entry.tokens:
+            self._remove_sorted(self._postings, (token, entry.id))
+
+    @staticmethod
+    def _remove_sorted(items: list, key: tuple):
+        index = bisect.bisect_left(items, key)
+        if index < len(items) and items[index] == key:
+            del items[index]
+
+    @classmethod
+    def build(cls, history_rows, bookmark_rows) -> 'AutocompleteIndex':
+        """
+        Builds an index in bulk from (url, title, frecency) history rows and (url, title) bookmark rows.
+        Sorting once at the end is much faster than inserting row by row.
+        """
+        index = cls()
+        for url, title, frecency in history_rows:
+            entry = CompletionEntry(len(index._by_id), url, title or '', frecency or 0.0)
+            entry.in_history = True
+            entry.tokens = tuple(dict.fromkeys(cls.tokenize(url) + cls.tokenize(entry.title)))
+            entry.haystack = ' ' + ' '.join(entry.tokens)
+            index._by_id.append(entry)
+            index._entries[url] = entry
+        for url, title in bookmark_rows:
+            entry = index._entries.get(url)
+            if entry is None:
+                entry = CompletionEntry(len(index._by_id), url, title or '',
+                                        FRECENCY_TRANSITION_BONUS[TRANSITION_BOOKMARK])
+                entry.tokens = tuple(dict.fromkeys(cls.tokenize(url) + cls.tokenize(entry.title)))
+                entry.haystack = ' ' + ' '.join(entry.tokens)
+                index._by_id.append(entry)
+                index._entries[url] = entry
+            entry.bookmarked = True
+        index._postings = sorted((token, entry.id) for entry in index._by_id for token in entry.tokens)
+        index._by_frecency = sorted((-entry.frecency, entry.id) for entry in index._by_id)
+        return index
+
+class AutocompleteLoader(QThread):
+    """Reads history and bookmarks off the GUI thread and builds an AutocompleteIndex from them."""
+    index_ready = pyqtSignal(object)
+
+    def __init__(self, history_manager: 'HistoryManager'):
+        super().__init__()
+        self.history_manager = history_manager
 
-        tld_map = {
-            '.edu': '🎓', '.gov': '🏛️', '.org': '🌐', '.mil': '⚔️',
-            '.news': '📰', '.blog': '📝', '.shop': '🛍️'
-        }
-        for tld, icon in tld_map.items():
-            if domain.endswith(tld):
-                return icon
+    def run(self):
+        """Loads every history row and bookmark and hands the finished index to the GUI thread."""
+        db = self.history_manager.db
+        try:
+            conn = db.read()
+            rows = conn.execute('SELECT url, title, frecency FROM history')
+            bookmarks = conn.execute('SELECT url, title FROM bookmarks WHERE url IS NOT NULL').fetchall()
+            self.index_ready.emit(AutocompleteIndex.build(rows, bookmarks))
+        except sqlite3.Error as e:
+            print(f"Autocomplete load error: {e}")
+            self.index_ready.emit(AutocompleteIndex.build([], []))
+        finally:
+            db.release_reader()
 
-        return '🌐'
+class CompletionModel(QAbstractListModel):
+    """List model behind the URL bar's QCompleter; shows 'title — url' and completes to the URL."""
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self._entries = []
+
+    def set_entries(self, entries: list):
+        self.beginResetModel()
+        self._entries = entries
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._entries[index.row()]
+        if role == Qt.DisplayRole:
+            star = '⭐ ' if entry.bookmarked else ''
+            return f"{star}{entry.title} — {entry.url}" if entry.title else f"{star}{entry.url}"
+        if role == Qt.EditRole:
+            return entry.url
+        return None
+
+class UrlAutocompleter(QObject):
+    """
+    Keeps an AutocompleteIndex current from HistoryManager signals and answers URL bar queries from it.
+    The index is loaded lazily on a worker thread; changes that arrive while it loads are replayed afterwards.
+    Queries never touch SQLite.
+    """
+    def __init__(self, history_manager: 'HistoryManager', parent: QObject = None):
+        super().__init__(parent)
+        self.history_manager = history_manager
+        self.index = None
+        self._loader = None
+        self._loading = False # From reload() until its index is handled; the loader thread may finish first
+        self._pending = []
+        history_manager.visit_added.connect(
+            lambda url, title, transition: self._apply('add_visit', url, title, FRECENCY_TRANSITION_BONUS.get(transition, 0.0)))
+        history_manager.history_removed.connect(lambda urls: [self._apply('remove_history', url) for url in urls])
+        history_manager.history_cleared.connect(self.reload)
+        history_manager.history_imported.connect(self.reload)
+        history_manager.bookmark_added.connect(lambda url, title: self._apply('add_bookmark', url, title))
+        history_manager.bookmark_removed.connect(lambda url: self._apply('remove_bookmark', url))
+        history_manager.bookmarks_cleared.connect(self.reload)
+        history_manager.bookmarks_imported.connect(self.reload)
+
+    def reload(self):
+        """(Re)builds the index on a worker thread."""
+        if self._loader and self._loader.isRunning():
+            self._loader.index_ready.disconnect()
+            self._loader.finished.connect(self._loader.deleteLater)
+        self.history_manager.flush() # Include visits and bookmarks still queued for the writer
+        self._pending = []
+        self._loading = True
+        self._loader = AutocompleteLoader(self.history_manager)
+        self._loader.index_ready.connect(self._on_index_ready)
+        self._loader.start()
+
+    def query(self, text: str, k: int = AUTOCOMPLETE_MAX_RESULTS) -> list:
+        """Returns the top-k completions, or nothing while the index is still loading."""
+        return self.index.query(text, k) if self.index is not None else []
+
+    def _apply(self, method: str, *args):
+        if self._loading:
+            self._pending.append((method, args))
+        elif self.index is not None:
+            getattr(self.index, method)(*args)
+
+    def _on_index_ready(self, index: AutocompleteIndex):
+        for method, args in self._pending:
+            getattr(index, method)(*args)
+        self._pending = []
+        self._loading = False
+        self.index = index
+        print(f"🔎 Autocomplete index ready ({len(index)} entries).")
 
 # --- Video Downloader ---
 class EnhancedVideoDownloader(QThread):
@@ -882,8 +3993,16 @@ class HistoryDialog(QDialog):
         self.setWindowTitle("📜 Browser History")
         self.setModal(True)
         self.resize(800, 600)
+        self._search = None # The HistorySearch whose results are shown
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(HISTORY_SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._search_history)
         self._setup_ui()
+        self._clear_pending = False # _clear_all_history is waiting for history_cleared
         self._load_history()
+        self.history_manager.history_cleared.connect(self._on_history_cleared)
+        self.history_manager.history_clear_failed.connect(self._on_clear_failed)
 
     def _setup_ui(self):
         """Sets up the user interface for the history dialog."""
@@ -893,14 +4012,23 @@ class HistoryDialog(QDialog):
         search_layout.addWidget(QLabel("Search:"))
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search history...")
-        self.search_input.textChanged.connect(self._search_history)
+        self.search_input.textChanged.connect(self._search_timer.start) # Searches once typing pauses
         search_layout.addWidget(self.search_input)
         layout.addLayout(search_layout)
 
-        self.history_list = QListWidget()
-        self.history_list.itemDoubleClicked.connect(self._open_history_item)
+        # Browsing all of history and search results use separate models on the same view.
+        self.browser_model = HistoryBrowserModel(self.history_manager, self)
+        self.history_model = HistoryListModel(self.history_manager.icons, self)
+        self.history_manager.history_removed.connect(self.browser_model.remove)
+        self.history_manager.history_removed.connect(self.history_model.remove)
+        self.history_list = QListView()
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.setSelectionMode(QListView.ExtendedSelection)
+        self.history_list.setModel(self.browser_model)
+        self.history_list.doubleClicked.connect(self._open_history_item)
         self.history_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.history_list.customContextMenuRequested.connect(self._show_context_menu)
+        QShortcut(QKeySequence.Delete, self.history_list, self._delete_selected_entries)
         layout.addWidget(self.history_list)
 
         button_layout = QHBoxLayout()
@@ -914,64 +4042,121 @@ class HistoryDialog(QDialog):
         layout.addLayout(button_layout)
 
     def _load_history(self):
-        """Loads recent history items into the list widget."""
-        self.history_list.clear()
-        recent_sites = self.history_manager.get_recent_sites(200) # Increased limit for history view
-
-        for site in recent_sites:
-            item_text = f"{site['favicon']} {site['title']} - {site['url']}"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, site['url']) # Store URL
-            item.setData(Qt.UserRole + 1, site['title']) # Store title
-            self.history_list.addItem(item)
-
-    def _search_history(self, query: str):
-        """Performs a search on the history and updates the list."""
-        self.history_list.clear()
-        results = self.history_manager.search_history(query, 100) if query else self.history_manager.get_recent_sites(200)
-
-        for site in results:
-            item_text = f"{site['favicon']} {site['title']} - {site['url']}"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, site['url'])
-            item.setData(Qt.UserRole + 1, site['title'])
-            self.history_list.addItem(item)
-
-    def _open_history_item(self, item: QListWidgetItem):
+        """Shows all of history from the newest entry; older pages are read as the list is scrolled."""
+        self._cancel_search()
+        self.browser_model.reload()
+        self._show_model(self.browser_model)
+
+    def _show_model(self, model: QAbstractListModel):
+        if self.history_list.model() is not model:
+            self.history_list.setModel(model)
+
+    def _search_history(self):
+        """
+        Searches for the text in the search box on the search thread, replacing a search still running.
+        Results are appended as they arrive; an empty box shows all of history again.
+        """
+        query = self.search_input.text().strip()
+        if not query:
+            self._load_history()
+            return
+        self._cancel_search()
+        self.history_model.clear()
+        self._show_model(self.history_model)
+        self._search = self.history_manager.start_search(query)
+        self._search.signals.results_ready.connect(self._on_search_results)
+
+    def _on_search_results(self, entries: list):
+        if self._search is not None and self.sender() is self._search.signals:
+            self.history_model.append(entries)
+
+    def _cancel_search(self):
+        self._search_timer.stop()
+        if self._search is not None:
+            self._search.cancel()
+            self._search = None
+
+    def done(self, result: int):
+        """Stops a running search when the dialog closes."""
+        self._cancel_search()
+        super().done(result)
+
+    def _open_history_item(self, index: QModelIndex):
         """Opens the selected history item in a new tab."""
-        url = item.data(Qt.UserRole)
+        url = index.data(Qt.UserRole)
         if url and isinstance(self.parent(), QMainWindow): # Check if parent is QMainWindow
             self.parent().add_new_tab(url)
             self.close()
 
     def _show_context_menu(self, pos):
         """Displays a context menu for history list items."""
-        item = self.history_list.itemAt(pos)
-        if item:
+        index = self.history_list.indexAt(pos)
+        url = index.data(Qt.UserRole) if index.isValid() else None
+        if url: # Not on a date row
+            if not self.history_list.selectionModel().isSelected(index):
+                self.history_list.setCurrentIndex(index)
+            selected = len(self._selected_entries())
+            domain = urlsplit(url).netloc.lower()
             menu = QMenu(self)
             open_action = menu.addAction("Open in New Tab")
-            delete_action = menu.addAction("Delete Entry")
+            delete_action = menu.addAction("Delete Entry" if selected == 1 else f"Delete {selected} Entries")
+            menu.addSeparator()
+            domain_action = menu.addAction(f"Delete All from {domain}")
+            forget_action = menu.addAction("Forget This Site")
 
-            action = menu.exec_(self.history_list.mapToGlobal(pos))
+            action = menu.exec_(self.history_list.viewport().mapToGlobal(pos))
 
             if action == open_action:
-                self._open_history_item(item)
+                self._open_history_item(index)
             elif action == delete_action:
-                self._delete_history_entry(item)
-
-    def _delete_history_entry(self, item: QListWidgetItem):
-        """Deletes a selected history entry."""
-        url_to_delete = item.data(Qt.UserRole)
-        title_to_delete = item.data(Qt.UserRole + 1)
+                self._delete_selected_entries()
+            elif action == domain_action:
+                self._delete_domain_history(domain)
+            elif action == forget_action:
+                self._forget_site(domain)
+
+    def _selected_entries(self) -> list:
+        return [index for index in self.history_list.selectionModel().selectedIndexes() if index.data(Qt.UserRole)]
+
+    def _delete_selected_entries(self):
+        """Deletes the selected history entries in one go; the list updates in place."""
+        indexes = self._selected_entries()
+        if not indexes:
+            return
+        urls = [index.data(Qt.UserRole) for index in indexes]
+        if len(urls) == 1:
+            question = f"Are you sure you want to delete '{indexes[0].data(Qt.UserRole + 1)}' from history?"
+        else:
+            question = f"Are you sure you want to delete {len(urls)} entries from history?"
+        reply = QMessageBox.question(self, "Delete History Entry", question, QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.history_manager.delete_history_entries(urls)
 
-        reply = QMessageBox.question(self, "Delete History Entry",
-                                   f"Are you sure you want to delete '{title_to_delete}' from history?",
+    def _delete_domain_history(self, domain: str):
+        """Deletes every history entry from domain."""
+        reply = QMessageBox.question(self, "Delete History",
+                                   f"Are you sure you want to delete all history from {domain}?",
+                                   QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.history_manager.delete_domain_history([domain])
+            finally:
+                QApplication.restoreOverrideCursor()
+
+    def _forget_site(self, domain: str):
+        """Deletes the history of domain's site, subdomains included, along with its favicon and thumbnails."""
+        site = self.history_manager.site_of(domain)
+        reply = QMessageBox.question(self, "Forget This Site",
+                                   f"Are you sure you want to forget {site}? Its history from every subdomain, "
+                                   "its icon and its page previews will be removed.",
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.history_manager.delete_history_entry(url_to_delete)
-            self._load_history() # Reload history after deletion
-            if isinstance(self.parent(), QMainWindow):
-                self.parent().refresh_sidebar() # Refresh sidebar as well
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.history_manager.forget_site(domain)
+            finally:
+                QApplication.restoreOverrideCursor()
 
     def _clear_all_history(self):
         """Prompts for confirmation and clears all browsing history."""
@@ -979,20 +4164,37 @@ class HistoryDialog(QDialog):
                                    "Are you sure you want to clear ALL browsing history? This cannot be undone.",
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
+            # Confirmed once the purge has finished, unless it reported a failure (the manager warns about that).
+            self._clear_pending = True
             self.history_manager.clear_history()
-            self._load_history()
+
+    def _on_clear_failed(self, error: str):
+        self._clear_pending = False
+
+    def _on_history_cleared(self):
+        """Reloads the list once the writer has cleared history, and confirms a clear started here."""
+        self._load_history()
+        if self._clear_pending:
+            self._clear_pending = False
             QMessageBox.information(self, "History Cleared", "All browsing history has been cleared.")
-            if isinstance(self.parent(), QMainWindow):
-                self.parent().refresh_sidebar() # Refresh sidebar after clearing history
 
 class ClearDataDialog(QDialog):
     """Dialog for clearing various types of browsing data."""
+    TIME_RANGES = {
+        "All time": None,
+        "Last hour": timedelta(hours=1),
+        "Last 24 hours": timedelta(days=1),
+        "Last 7 days": timedelta(days=7),
+        "Last 30 days": timedelta(days=30),
+    }
+
     def __init__(self, parent: QWidget, history_manager: HistoryManager):
         super().__init__(parent)
         self.history_manager = history_manager
         self.setWindowTitle("🗑️ Clear Browsing Data")
         self.setModal(True)
         self.resize(400, 350)
+        self._clear_pending = False # _clear_data is waiting for history_cleared
         self._setup_ui()
 
     def _setup_ui(self):
@@ -1016,13 +4218,13 @@ class ClearDataDialog(QDialog):
 
         layout.addWidget(QLabel("Time range:"))
         self.time_combo = QComboBox()
-        self.time_combo.addItems(["All time", "Last hour", "Last 24 hours", "Last 7 days", "Last 30 days"])
+        self.time_combo.addItems(list(self.TIME_RANGES))
         layout.addWidget(self.time_combo)
 
-        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        button_box.accepted.connect(self._clear_data)
-        button_box.rejected.connect(self.reject)
-        layout.addWidget(button_box)
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self._clear_data)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
 
     def _clear_data(self):
         """Clears selected browsing data based on user choices."""
@@ -1032,60 +4234,78 @@ class ClearDataDialog(QDialog):
             self.reject()
             return
 
-        # Determine cutoff time for history
-        days_to_clear = None
-        time_range = self.time_combo.currentText()
-        if time_range == "Last hour":
-            # For history, this would require more granular timestamp filtering
-            # For now, we'll treat it as "last 24 hours" or skip if not supported by HistoryManager
-            days_to_clear = 1 # Treat as last 24 hours for simplicity
-        elif time_range == "Last 24 hours":
-            days_to_clear = 1
-        elif time_range == "Last 7 days":
-            days_to_clear = 7
-        elif time_range == "Last 30 days":
-            days_to_clear = 30
-        # "All time" means days_to_clear remains None
-
-        cleared_items = []
-
-        if self.history_cb.isChecked():
-            self.history_manager.clear_history(days_to_clear)
-            cleared_items.append("Browsing History")
+        # None means "All time"
+        since = self.TIME_RANGES[self.time_combo.currentText()]
 
+        # Asked before anything is cleared, so cancelling here leaves all data as it was
         if self.bookmarks_cb.isChecked():
             reply = QMessageBox.question(self, "Clear Bookmarks",
                                        "Are you sure you want to clear ALL bookmarks? This cannot be undone.",
                                        QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                self.history_manager.bookmarks.clear()
-                self.history_manager.save_bookmarks()
-                cleared_items.append("Bookmarks")
-            else:
-                # If user cancels bookmark clear, don't proceed with other clears
+            if reply != QMessageBox.Yes:
                 QMessageBox.information(self, "Cancelled", "Operation cancelled.")
                 self.reject()
                 return
 
+        self._cleared_items = []
+
+        if self.bookmarks_cb.isChecked():
+            self.history_manager.clear_bookmarks()
+            self._cleared_items.append("Bookmarks")
+
         # Clear cache and cookies (requires QWebEngineProfile access)
         profile = parent_browser.profile # Access the profile from the main browser
         if self.cache_cb.isChecked():
             profile.clearHttpCache()
-            cleared_items.append("Cached images and files")
+            self._cleared_items.append("Cached images and files")
 
         if self.cookies_cb.isChecked():
             # QWebEngineProfile.cookieStore() provides access to cookies
             # Clearing all cookies might be done via cookieStore().deleteAllCookies()
             profile.cookieStore().deleteAllCookies()
-            cleared_items.append("Cookies and site data")
+            self._cleared_items.append("Cookies and site data")
 
-        if cleared_items:
-            QMessageBox.information(self, "Cleared", f"Successfully cleared: {', '.join(cleared_items)}.")
+        if self.history_cb.isChecked():
+            # The dialog stays open until the purge has finished; history is only listed as cleared if
+            # no part of it failed (the manager warns about that).
+            self._clear_pending = True
+            self._history_failed = False
+            self.button_box.setEnabled(False)
+            self.history_manager.history_clear_failed.connect(self._on_clear_failed)
+            self.history_manager.history_cleared.connect(self._on_history_cleared)
+            self.history_manager.clear_history(since)
+        else:
+            self._finish()
+
+    def _on_clear_failed(self, error: str):
+        self._history_failed = True
+
+    def _on_history_cleared(self):
+        """Stops waiting for the history purge and reports what was cleared."""
+        self.history_manager.history_clear_failed.disconnect(self._on_clear_failed)
+        self.history_manager.history_cleared.disconnect(self._on_history_cleared)
+        self._clear_pending = False
+        self.button_box.setEnabled(True)
+        if not self._history_failed:
+            self._cleared_items.insert(0, "Browsing History")
+        self._finish()
+
+    def _finish(self):
+        """Confirms the cleared items and closes the dialog."""
+        if self._cleared_items:
+            QMessageBox.information(self, "Cleared", f"Successfully cleared: {', '.join(self._cleared_items)}.")
             self.accept()
+        elif self.history_cb.isChecked():
+            self.reject() # Only history was selected, and the manager has warned that clearing it failed
         else:
             QMessageBox.information(self, "No Selection", "No data selected to clear.")
             self.reject()
 
+    def reject(self):
+        """Keeps the dialog open while a history purge it started is still running."""
+        if not self._clear_pending:
+            super().reject()
+
 class SettingsDialog(QDialog):
     """Dialog for managing browser settings."""
     def __init__(self, parent: QWidget):
@@ -1118,6 +4338,21 @@ class SettingsDialog(QDialog):
         self.search_combo.addItems(["DuckDuckGo", "Google", "Bing", "StartPage"])
         search_layout.addWidget(self.search_combo)
         general_layout.addLayout(search_layout)
+
+        pool_layout = QHBoxLayout()
+        pool_layout.addWidget(QLabel("Preloaded New Tabs:"))
+        self.pool_size_spin = QSpinBox()
+        self.pool_size_spin.setRange(0, 8)
+        self.pool_size_spin.setToolTip("Start pages kept loaded in the background so new tabs open instantly (0 turns this off)")
+        pool_layout.addWidget(self.pool_size_spin)
+        pool_layout.addWidget(QLabel("Up to:"))
+        self.pool_memory_spin = QSpinBox()
+        self.pool_memory_spin.setRange(256, 65536)
+        self.pool_memory_spin.setSingleStep(256)
+        self.pool_memory_spin.setSuffix(" MB")
+        self.pool_memory_spin.setToolTip("No more tabs are preloaded while the browser uses more memory than this")
+        pool_layout.addWidget(self.pool_memory_spin)
+        general_layout.addLayout(pool_layout)
         layout.addWidget(general_group)
 
         # Privacy settings
@@ -1148,81 +4383,856 @@ class SettingsDialog(QDialog):
         self.clear_cache_btn = QPushButton("Clear Browser Cache")
         self.clear_cache_btn.clicked.connect(self._clear_browser_cache)
         maintenance_layout.addWidget(self.clear_cache_btn)
+        history_transfer_layout = QHBoxLayout()
+        self.import_history_btn = QPushButton("Import History...")
+        self.import_history_btn.clicked.connect(self._import_history)
+        history_transfer_layout.addWidget(self.import_history_btn)
+        self.export_history_btn = QPushButton("Export History...")
+        self.export_history_btn.clicked.connect(self._export_history)
+        history_transfer_layout.addWidget(self.export_history_btn)
+        maintenance_layout.addLayout(history_transfer_layout)
+        self.import_bookmarks_btn = QPushButton("Import Bookmarks...")
+        self.import_bookmarks_btn.clicked.connect(self._import_bookmarks)
+        maintenance_layout.addWidget(self.import_bookmarks_btn)
         layout.addWidget(maintenance_group)
 
-        # Buttons
-        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel | QDialogButtonBox.RestoreDefaults)
-        button_box.accepted.connect(self._save_settings)
-        button_box.rejected.connect(self.reject)
-        button_box.button(QDialogButtonBox.RestoreDefaults).clicked.connect(self._reset_to_defaults)
-        layout.addWidget(button_box)
+        # Buttons
+        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel | QDialogButtonBox.RestoreDefaults)
+        button_box.accepted.connect(self._save_settings)
+        button_box.rejected.connect(self.reject)
+        button_box.button(QDialogButtonBox.RestoreDefaults).clicked.connect(self._reset_to_defaults)
+        layout.addWidget(button_box)
+
+    def _load_settings(self):
+        """Loads settings into the dialog fields."""
+        if isinstance(self.parent_browser, EnhancedNullBrowser):
+            # Load TOR status
+            self.tor_cb.setChecked(self.parent_browser.proxy_manager.tor_enabled)
+            # Load JavaScript status (from QWebEngineSettings, if implemented)
+            # For now, assume it's always enabled as per EnhancedWebPage
+            # To make this truly functional, you'd need to get the current JS setting from the profile
+            # For example: self.javascript_cb.setChecked(self.parent_browser.profile.settings().testAttribute(QWebEngineSettings.JavascriptEnabled))
+            self.javascript_cb.setChecked(True) # Placeholder
+
+            # Load default search engine (if saved)
+            saved_search_engine = self.parent_browser.app_settings.value("default_search_engine", "DuckDuckGo")
+            self.search_combo.setCurrentText(saved_search_engine)
+
+            pool = self.parent_browser.services.new_tab_pool
+            self.pool_size_spin.setValue(pool.size)
+            self.pool_memory_spin.setValue(pool.max_memory_mb)
+
+    def _save_settings(self):
+        """Saves settings from the dialog fields."""
+        if isinstance(self.parent_browser, EnhancedNullBrowser):
+            # Save default search engine
+            self.parent_browser.app_settings.setValue("default_search_engine", self.search_combo.currentText())
+            self.parent_browser.app_settings.setValue("new_tab_pool_size", self.pool_size_spin.value())
+            self.parent_browser.app_settings.setValue("new_tab_pool_max_memory_mb", self.pool_memory_spin.value())
+            self.parent_browser.services.new_tab_pool.schedule(0) # Grows or trims the pool to the new size
+
+            # Apply JavaScript setting
+            # This requires getting the current page's settings and updating them.
+            # For simplicity, we'll apply it to the profile's default settings.
+            # Note: Existing pages might not update immediately.
+            self.parent_browser.profile.settings().setAttribute(QWebEngineSettings.JavascriptEnabled, self.javascript_cb.isChecked())
+            print(f"JavaScript enabled: {self.javascript_cb.isChecked()}")
+
+            # TOR setting is read-only based on detection, not user-settable here.
+            # If it were user-settable, it would involve restarting the browser or profile.
+
+        QMessageBox.information(self, "Settings", "Settings saved successfully! (Some settings require browser restart or are placeholders.)")
+        self.accept()
+
+    def _reset_to_defaults(self):
+        """Resets settings to their default values."""
+        reply = QMessageBox.question(self, "Reset Settings",
+                                   "Are you sure you want to reset all settings to their default values?",
+                                   QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.search_combo.setCurrentText("DuckDuckGo")
+            self.tor_cb.setChecked(False) # Default to no TOR
+            self.javascript_cb.setChecked(True) # Default to JS enabled
+            self.pool_size_spin.setValue(NEW_TAB_POOL_SIZE)
+            self.pool_memory_spin.setValue(NEW_TAB_POOL_MAX_MEMORY_MB)
+            QMessageBox.information(self, "Settings Reset", "Settings have been reset to defaults.")
+            # In a real app, you'd also clear QSettings values here.
+            if isinstance(self.parent_browser, EnhancedNullBrowser):
+                self.parent_browser.app_settings.clear() # Clear all saved settings
+                self.parent_browser.services.new_tab_pool.schedule(0)
+
+    def _clear_browser_cache(self):
+        """Clears the browser's HTTP cache."""
+        if isinstance(self.parent_browser, EnhancedNullBrowser):
+            reply = QMessageBox.question(self, "Clear Cache",
+                                       "Are you sure you want to clear the browser's HTTP cache?",
+                                       QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.parent_browser.profile.clearHttpCache()
+                QMessageBox.information(self, "Cache Cleared", "Browser cache has been cleared.")
+        else:
+            QMessageBox.critical(self, "Error", "Could not access browser profile to clear cache.")
+
+    def _import_history(self):
+        """Imports Chrome, Firefox, legacy Null Browser or NDJSON history with a progress dialog."""
+        if not isinstance(self.parent_browser, EnhancedNullBrowser):
+            QMessageBox.critical(self, "Error", "Could not access browser history.")
+            return
+        start_path = LEGACY_HISTORY_FILE if os.path.exists(LEGACY_HISTORY_FILE) else os.path.expanduser("~")
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import History", start_path,
+            "History files (History places.sqlite *.sqlite *.json *.ndjson *.jsonl);;All files (*)")
+        if not path:
+            return
+        try:
+            transfer = self.parent_browser.history_manager.import_history(path)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            QMessageBox.critical(self, "Import Failed", f"Could not read '{path}': {e}")
+            return
+        self._show_transfer_progress(transfer, "Importing history")
+
+    def _import_bookmarks(self):
+        """Imports a bookmark HTML file exported by another browser, with a progress dialog."""
+        if not isinstance(self.parent_browser, EnhancedNullBrowser):
+            QMessageBox.critical(self, "Error", "Could not access bookmarks.")
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Bookmarks", os.path.expanduser("~"), "Bookmark files (*.html *.htm);;All files (*)")
+        if path:
+            self._show_transfer_progress(self.parent_browser.history_manager.import_bookmarks(path),
+                                         "Importing bookmarks", "Bookmarks")
+
+    def _export_history(self):
+        """Exports the browsing history as NDJSON with a progress dialog."""
+        if not isinstance(self.parent_browser, EnhancedNullBrowser):
+            QMessageBox.critical(self, "Error", "Could not access browser history.")
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export History", os.path.join(os.path.expanduser("~"), "null_browser_history.ndjson"),
+            "NDJSON (*.ndjson);;All files (*)")
+        if path:
+            self._show_transfer_progress(self.parent_browser.history_manager.export_history(path), "Exporting history")
+
+    def _show_transfer_progress(self, transfer: HistoryTransfer, label: str, title: str = "History"):
+        """Shows a cancellable progress dialog for a running import or export."""
+        self._transfer = transfer # Keep the thread alive while it runs
+        progress = QProgressDialog(f"{label}...", "Cancel", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setAutoReset(False)
+        progress.canceled.connect(transfer.stop)
+
+        def on_progress(done: int, total: int):
+            progress.setLabelText(f"{label}... {done:,} entries")
+            if total:
+                progress.setMaximum(total)
+                progress.setValue(min(done, total))
+
+        def on_finished(success: bool, message: str):
+            progress.close()
+            if success:
+                QMessageBox.information(self, title, message)
+            else:
+                QMessageBox.warning(self, title, message)
+
+        transfer.progress_updated.connect(on_progress)
+        transfer.transfer_finished.connect(on_finished)
+        progress.show()
+
+# --- Homepage ---
+# The new-tab page, served at HOMEPAGE_URL. Only the JSON block at HOMEPAGE_DATA_MARKER changes between
+# renders; the stylesheet and script are static assets.
+HOMEPAGE_DATA_MARKER = "/*HOMEPAGE_DATA*/"
+HOMEPAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Null Browser - Enhanced</title>
+    <meta charset="UTF-8">
+    <link rel="stylesheet" href="/assets/home.css">
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1 class="logo">🌑 Null Browser</h1>
+            <p class="tagline">Enhanced Edition - Privacy-focused browsing with advanced features</p>
+        </div>
+
+        <div class="features-banner">
+            <h3>🚀 Enhanced Features</h3>
+            <ul class="features-list">
+                <li>🎥 Advanced video downloader with multiple quality options</li>
+                <li>🔒 Enhanced privacy with TOR support</li>
+                <li>📚 Smart bookmarks and history management</li>
+                <li>⚡ Performance optimizations and smooth scrolling</li>
+                <li>🎨 Beautiful dark theme with modern design</li>
+                <li>⌨️ Comprehensive keyboard shortcuts</li>
+            </ul>
+        </div>
+
+        <div class="search-section">
+            <div class="search-container">
+                <input type="text" class="search-input" placeholder="Search the web or enter a URL..." autofocus>
+                <span class="loading-indicator">Loading...</span>
+                <div class="search-engines">
+                    <a href="#" class="search-engine" data-engine="duckduckgo">🦆 DuckDuckGo</a>
+                    <a href="#" class="search-engine" data-engine="google">🔍 Google</a>
+                    <a href="#" class="search-engine" data-engine="bing">🅱️ Bing</a>
+                    <a href="#" class="search-engine" data-engine="startpage">🔒 StartPage</a>
+                </div>
+            </div>
+        </div>
+
+        <div class="section">
+            <h2 class="section-title">🚀 Quick Access</h2>
+            <div class="shortcuts-grid" id="shortcutsGrid"></div>
+        </div>
+
+        <div class="section" id="mostVisitedSection">
+            <h2 class="section-title">⭐ Most Visited</h2>
+            <div class="cards-grid" id="mostVisitedGrid"></div>
+        </div>
+
+        <div class="section" id="recentSection">
+            <h2 class="section-title">📜 Recently Visited</h2>
+            <div class="cards-grid" id="recentGrid"></div>
+        </div>
+
+        <div class="actions">
+            <button class="action-btn" onclick="clearHistory()">
+                🗑️ Clear History
+            </button>
+            <button class="action-btn" onclick="showSettings()">
+                ⚙️ Settings
+            </button>
+            <button class="action-btn" onclick="showDownloads()">
+                📥 Downloads
+            </button>
+        </div>
+    </div>
+
+    <script id="homepageData" type="application/json">/*HOMEPAGE_DATA*/</script>
+    <script src="/assets/qwebchannel.js"></script>
+    <script src="/assets/home.js"></script>
+</body>
+</html>
+"""
+
+HOMEPAGE_CSS = """/* Basic reset and body styling */
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body {
+    background: linear-gradient(135deg, #0c0c0c 0%, #1a1a1a 100%);
+    color: #e0e0e0;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Oxygen', 'Ubuntu', 'Cantarell', sans-serif;
+    min-height: 100vh; overflow-x: hidden;
+    display: flex; flex-direction: column; align-items: center;
+    padding-top: 50px; /* Space for potential top bar */
+}
+
+/* Main container */
+.container {
+    max-width: 1400px;
+    width: 100%;
+    margin: 0 auto;
+    padding: 20px;
+    text-align: center;
+}
+
+/* Header and Logo */
+.header { margin-bottom: 50px; }
+.logo {
+    font-size: 3.5em; font-weight: 300; margin-bottom: 10px;
+    background: linear-gradient(45deg, #4285f4, #34a853, #fbbc05, #ea4335);
+    background-size: 400% 400%;
+    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
+    animation: gradientShift 8s ease infinite;
+}
+@keyframes gradientShift { 0% { background-position: 0% 50%; } 50% { background-position: 100% 50%; } 100% { background-position: 0% 50%; } }
+.tagline { font-size: 1.1em; color: #888; margin-bottom: 30px; }
+
+/* Search Section */
+.search-section { margin-bottom: 60px; position: relative; }
+.search-container { position: relative; max-width: 700px; margin: 0 auto; }
+.search-input {
+    width: 100%; padding: 20px 25px; font-size: 18px; border-radius: 50px;
+    border: 2px solid transparent; background: rgba(30, 30, 30, 0.8);
+    backdrop-filter: blur(10px); color: #e0e0e0; outline: none;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+}
+.search-input:focus {
+    border-color: #4285f4;
+    box-shadow: 0 0 0 3px rgba(66, 133, 244, 0.1), 0 12px 40px rgba(0, 0, 0, 0.4);
+    transform: translateY(-2px);
+}
+.search-input::placeholder { color: #888; }
+.search-engines { display: flex; justify-content: center; gap: 15px; margin-top: 20px; }
+.search-engine {
+    padding: 8px 16px; border-radius: 20px; background: rgba(40, 40, 40, 0.6);
+    border: 1px solid #333; color: #ccc; text-decoration: none; font-size: 0.9em;
+    transition: all 0.3s ease;
+}
+.search-engine:hover {
+    background: rgba(66, 133, 244, 0.2); border-color: #4285f4; color: #fff;
+    transform: translateY(-1px);
+}
+.loading-indicator {
+    position: absolute; right: 20px; top: 50%; transform: translateY(-50%);
+    color: #4285f4; font-size: 1.2em; display: none;
+}
+
+/* Sections */
+.section { margin-bottom: 50px; text-align: left; width: 100%; }
+.section-title {
+    font-size: 1.6em; margin-bottom: 25px; color: #fff; font-weight: 600;
+    display: flex; align-items: center; gap: 10px;
+}
+.section-title::after { content: ''; flex: 1; height: 1px; background: linear-gradient(90deg, #333, transparent); }
+
+/* Grids */
+.cards-grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 20px; }
+.shortcuts-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(140px, 1fr)); gap: 20px; max-width: 900px; margin: 0 auto; }
+
+/* Cards */
+.card, .shortcut-card {
+    background: rgba(30, 30, 30, 0.6); backdrop-filter: blur(10px);
+    border: 1px solid rgba(255, 255, 255, 0.1); border-radius: 16px;
+    padding: 24px; transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
+    cursor: pointer; text-decoration: none; color: inherit;
+    display: flex; flex-direction: column; align-items: flex-start; /* Align items to start for cards */
+    position: relative; overflow: hidden;
+}
+.shortcut-card { align-items: center; text-align: center; } /* Center for shortcuts */
+
+.card::before, .shortcut-card::before {
+    content: ''; position: absolute; top: 0; left: 0; right: 0; bottom: 0;
+    background: linear-gradient(45deg, transparent, rgba(66, 133, 244, 0.1), transparent);
+    opacity: 0; transition: opacity 0.3s ease;
+}
+.card:hover, .shortcut-card:hover {
+    transform: translateY(-4px) scale(1.02);
+    border-color: rgba(66, 133, 244, 0.3);
+    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.4);
+}
+.card:hover::before, .shortcut-card:hover::before { opacity: 1; }
+.card.bookmarked::after { content: '⭐'; position: absolute; top: 14px; right: 16px; font-size: 0.9em; }
+.card-thumbnail {
+    display: block; width: calc(100% + 48px); height: 160px; margin: -24px -24px 16px;
+    object-fit: cover; object-position: top; border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+    position: relative; z-index: 1;
+}
+
+.card-favicon, .shortcut-icon {
+    width: 48px; height: 48px; border-radius: 12px; margin-bottom: 15px;
+    background: rgba(255, 255, 255, 0.1); display: flex; align-items: center;
+    justify-content: center; font-size: 24px; position: relative; z-index: 1;
+}
+.shortcut-icon { font-size: 36px; margin-bottom: 12px; }
+
+.card-title, .shortcut-name {
+    font-weight: 600; margin-bottom: 8px; color: #fff; font-size: 1.1em;
+    position: relative; z-index: 1;
+}
+.shortcut-name { font-size: 0.95em; }
+
+.card-url {
+    font-size: 0.9em; color: #888; overflow: hidden; text-overflow: ellipsis;
+    white-space: nowrap; margin-bottom: 5px; position: relative; z-index: 1;
+    width: 100%; /* Ensure URL takes full width for ellipsis */
+}
+
+.card-meta {
+    font-size: 0.8em; color: #666; display: flex; justify-content: space-between;
+    align-items: center; position: relative; z-index: 1; width: 100%;
+}
+.visit-count {
+    background: rgba(66, 133, 244, 0.2); padding: 2px 8px; border-radius: 12px;
+    font-size: 0.75em;
+}
+.shortcut-category { font-size: 0.8em; color: #666; margin-top: 5px; position: relative; z-index: 1; }
+
+/* Actions */
+.actions {
+    display: flex; justify-content: center; gap: 20px; margin-top: 30px; flex-wrap: wrap;
+}
+.action-btn {
+    background: rgba(66, 133, 244, 0.2); border: 1px solid rgba(66, 133, 244, 0.3);
+    color: #e0e0e0; padding: 12px 24px; border-radius: 25px; cursor: pointer;
+    font-size: 0.9em; transition: all 0.3s ease; text-decoration: none;
+    display: inline-flex; align-items: center; gap: 8px;
+}
+.action-btn:hover {
+    background: rgba(66, 133, 244, 0.3); border-color: #4285f4;
+    transform: translateY(-2px); box-shadow: 0 8px 20px rgba(0, 0, 0, 0.4);
+}
+
+/* Empty State */
+.empty-state {
+    text-align: center; color: #666; grid-column: 1 / -1; padding: 60px 20px;
+    font-style: italic;
+}
+.empty-state .icon { font-size: 4em; margin-bottom: 20px; opacity: 0.5; }
+
+/* Features Banner */
+.features-banner {
+    background: linear-gradient(135deg, rgba(66, 133, 244, 0.1), rgba(52, 168, 83, 0.1));
+    border: 1px solid rgba(66, 133, 244, 0.2); border-radius: 16px;
+    padding: 25px; margin: 30px 0; text-align: left;
+}
+.features-banner h3 { color: #4285f4; margin-bottom: 15px; font-size: 1.3em; }
+.features-list {
+    list-style: none; display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 10px;
+}
+.features-list li { padding: 8px 0; display: flex; align-items: center; gap: 10px; }
+
+/* Dark scrollbars */
+* { scrollbar-width: thin; scrollbar-color: #555 #222; }
+::-webkit-scrollbar { width: 12px; height: 12px; }
+::-webkit-scrollbar-track { background: #222; border-radius: 6px; }
+::-webkit-scrollbar-thumb { background: #555; border-radius: 6px; }
+::-webkit-scrollbar-thumb:hover { background: #666; }
+
+/* Responsive adjustments */
+@media (max-width: 768px) {
+    .container { padding: 15px; }
+    .logo { font-size: 2.5em; }
+    .cards-grid { grid-template-columns: 1fr; }
+    .shortcuts-grid { grid-template-columns: repeat(auto-fit, minmax(120px, 1fr)); }
+    .search-engines { flex-wrap: wrap; }
+}
+"""
+
+HOMEPAGE_JS = """let {recentSites, mostVisited, shortcuts} = JSON.parse(document.getElementById('homepageData').textContent);
+const RECENT_LIMIT = 12; // HOMEPAGE_RECENT_SITES
+const searchInput = document.querySelector('.search-input');
+const loadingIndicator = document.querySelector('.loading-indicator');
+
+function formatTimeAgo(dateString) {
+    const date = new Date(dateString);
+    const now = new Date();
+    const diffInSeconds = Math.floor((now - date) / 1000);
+
+    if (diffInSeconds < 60) return 'Just now';
+    if (diffInSeconds < 3600) return `${Math.floor(diffInSeconds / 60)}m ago`;
+    if (diffInSeconds < 86400) return `${Math.floor(diffInSeconds / 3600)}h ago`;
+    if (diffInSeconds < 604800) return `${Math.floor(diffInSeconds / 86400)}d ago`;
+    return date.toLocaleDateString();
+}
+
+function renderShortcuts() {
+    const container = document.getElementById('shortcutsGrid');
+    container.innerHTML = '';
+    if (shortcuts.length === 0) {
+        container.innerHTML = '<div class="empty-state"><span class="icon">✨</span><p>No shortcuts yet. Add your favorites!</p></div>';
+        return;
+    }
+    shortcuts.forEach(shortcut => {
+        const card = document.createElement('a');
+        card.className = 'shortcut-card';
+        card.href = shortcut.url;
+        card.innerHTML = `
+            <div class="shortcut-icon">${shortcut.icon}</div>
+            <div class="shortcut-name">${shortcut.name}</div>
+            <div class="shortcut-category">${shortcut.category || ''}</div>
+        `;
+        container.appendChild(card);
+    });
+}
+
+function escapeHtml(text) {
+    const span = document.createElement('span');
+    span.textContent = text;
+    return span.innerHTML;
+}
+
+function siteIcon(site) {
+    return site.icon ? `<img src="${site.icon}" width="24" height="24" alt="">` : site.favicon;
+}
+
+function siteThumbnail(site) {
+    return site.thumbnail ? `<img class="card-thumbnail" src="${site.thumbnail}" alt="" loading="lazy">` : '';
+}
+
+function mostVisitedMeta(site) {
+    return `<span class="visit-count">${site.visitCount} visits</span>`;
+}
+
+function recentMeta(site) {
+    return `<span>${formatTimeAgo(site.visitTime)}</span>
+        ${site.visitCount > 1 ? `<span class="visit-count">${site.visitCount} visits</span>` : ''}`;
+}
+
+function siteCard(site, meta) {
+    const card = document.createElement('a');
+    card.className = site.bookmarked ? 'card bookmarked' : 'card';
+    card.href = site.url;
+    card.dataset.url = site.url;
+    card.dataset.domain = site.domain;
+    card.innerHTML = `
+        ${siteThumbnail(site)}
+        <div class="card-favicon">${siteIcon(site)}</div>
+        <div class="card-title">${escapeHtml(site.title || site.url)}</div>
+        <div class="card-url">${escapeHtml(site.url)}</div>
+        <div class="card-meta">${meta(site)}</div>
+    `;
+    return card;
+}
+
+function renderSites(sites, gridId, sectionId, meta) {
+    const container = document.getElementById(gridId);
+    document.getElementById(sectionId).style.display = sites.length ? 'block' : 'none';
+    container.innerHTML = '';
+    sites.forEach(site => container.appendChild(siteCard(site, meta)));
+}
+
+function renderMostVisited() {
+    renderSites(mostVisited, 'mostVisitedGrid', 'mostVisitedSection', mostVisitedMeta);
+}
+
+function renderRecent() {
+    renderSites(recentSites, 'recentGrid', 'recentSection', recentMeta);
+}
+
+// --- Live updates: each change touches only the cards it affects ---
+function cardsFor(url) {
+    return Array.from(document.querySelectorAll('.card')).filter(card => card.dataset.url === url);
+}
+
+function onVisitAdded(site) {
+    const known = recentSites.find(entry => entry.url === site.url) || mostVisited.find(entry => entry.url === site.url);
+    if (known) {
+        site.visitCount = known.visitCount + 1;
+        site.title = site.title || known.title;
+    }
+    const grid = document.getElementById('recentGrid');
+    grid.querySelectorAll('.card').forEach(card => { if (card.dataset.url === site.url) card.remove(); });
+    grid.prepend(siteCard(site, recentMeta));
+    while (grid.children.length > RECENT_LIMIT) grid.lastElementChild.remove();
+    recentSites = [site, ...recentSites.filter(entry => entry.url !== site.url)].slice(0, RECENT_LIMIT);
+    document.getElementById('recentSection').style.display = 'block';
+    const top = mostVisited.find(entry => entry.url === site.url);
+    if (top) {
+        top.visitCount += 1;
+        document.getElementById('mostVisitedGrid').querySelectorAll('.card').forEach(card => {
+            if (card.dataset.url === site.url) card.querySelector('.card-meta').innerHTML = mostVisitedMeta(top);
+        });
+    }
+}
+
+function onEntriesRemoved(urls) {
+    const removed = new Set(urls);
+    recentSites = recentSites.filter(site => !removed.has(site.url));
+    mostVisited = mostVisited.filter(site => !removed.has(site.url));
+    urls.forEach(url => cardsFor(url).forEach(card => card.remove()));
+    document.getElementById('recentSection').style.display = recentSites.length ? 'block' : 'none';
+    document.getElementById('mostVisitedSection').style.display = mostVisited.length ? 'block' : 'none';
+}
+
+function onBookmarkChanged(url, bookmarked) {
+    [...recentSites, ...mostVisited].forEach(site => { if (site.url === url) site.bookmarked = bookmarked; });
+    cardsFor(url).forEach(card => card.classList.toggle('bookmarked', bookmarked));
+}
 
-    def _load_settings(self):
-        """Loads settings into the dialog fields."""
-        if isinstance(self.parent_browser, EnhancedNullBrowser):
-            # Load TOR status
-            self.tor_cb.setChecked(self.parent_browser.proxy_manager.tor_enabled)
-            # Load JavaScript status (from QWebEngineSettings, if implemented)
-            # For now, assume it's always enabled as per EnhancedWebPage
-            # To make this truly functional, you'd need to get the current JS setting from the profile
-            # For example: self.javascript_cb.setChecked(self.parent_browser.profile.settings().testAttribute(QWebEngineSettings.JavascriptEnabled))
-            self.javascript_cb.setChecked(True) # Placeholder
+function onIconStored(host, icon) {
+    [...recentSites, ...mostVisited].forEach(site => { if (site.domain === host) site.icon = icon; });
+    document.querySelectorAll('.card').forEach(card => {
+        if (card.dataset.domain === host) card.querySelector('.card-favicon').innerHTML = siteIcon({icon: icon});
+    });
+}
 
-            # Load default search engine (if saved)
-            saved_search_engine = self.parent_browser.app_settings.value("default_search_engine", "DuckDuckGo")
-            self.search_combo.setCurrentText(saved_search_engine)
+function onThumbnailStored(url, thumbnail) {
+    [...recentSites, ...mostVisited].forEach(site => { if (site.url === url) site.thumbnail = thumbnail; });
+    cardsFor(url).forEach(card => {
+        const image = card.querySelector('.card-thumbnail');
+        if (image) image.src = thumbnail;
+        else card.insertAdjacentHTML('afterbegin', siteThumbnail({thumbnail: thumbnail}));
+    });
+}
 
-    def _save_settings(self):
-        """Saves settings from the dialog fields."""
-        if isinstance(self.parent_browser, EnhancedNullBrowser):
-            # Save default search engine
-            self.parent_browser.app_settings.setValue("default_search_engine", self.search_combo.currentText())
+function onReset(data) {
+    ({recentSites, mostVisited, shortcuts} = data);
+    renderShortcuts();
+    renderMostVisited();
+    renderRecent();
+}
 
-            # Apply JavaScript setting
-            # This requires getting the current page's settings and updating them.
-            # For simplicity, we'll apply it to the profile's default settings.
-            # Note: Existing pages might not update immediately.
-            self.parent_browser.profile.settings().setAttribute(QWebEngineSettings.JavascriptEnabled, self.javascript_cb.isChecked())
-            print(f"JavaScript enabled: {self.javascript_cb.isChecked()}")
+function handleSearch(query, engine = 'duckduckgo') {
+    loadingIndicator.style.display = 'inline'; // Show loading indicator
+    const engines = {
+        'duckduckgo': 'https://duckduckgo.com/?q=',
+        'google': 'https://www.google.com/search?q=',
+        'bing': 'https://www.bing.com/search?q=',
+        'startpage': 'https://www.startpage.com/sp/search?query='
+    };
+    if (query.includes('.') && !query.includes(' ')) {
+        const url = query.startsWith('http') ? query : `https://${query}`;
+        window.location.href = url;
+    } else {
+        const searchUrl = engines[engine] + encodeURIComponent(query);
+        window.location.href = searchUrl;
+    }
+}
 
-            # TOR setting is read-only based on detection, not user-settable here.
-            # If it were user-settable, it would involve restarting the browser or profile.
+function clearHistory() { window.location.href = 'null://clear-history'; }
+function showSettings() { window.location.href = 'null://settings'; }
+function showDownloads() { window.location.href = 'null://downloads'; }
+
+searchInput.addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') { handleSearch(e.target.value); }
+});
+document.querySelectorAll('.search-engine').forEach(engine => {
+    engine.addEventListener('click', (e) => {
+        e.preventDefault();
+        const query = searchInput.value;
+        if (query) { handleSearch(query, e.target.dataset.engine); }
+    });
+});
+
+// Hide loading indicator if page loads without search
+window.addEventListener('load', () => {
+    loadingIndicator.style.display = 'none';
+});
+
+if (window.qt && qt.webChannelTransport) {
+    new QWebChannel(qt.webChannelTransport, channel => {
+        const bridge = channel.objects.startPage;
+        bridge.visitAdded.connect(onVisitAdded);
+        bridge.entriesRemoved.connect(onEntriesRemoved);
+        bridge.bookmarkChanged.connect(onBookmarkChanged);
+        bridge.iconStored.connect(onIconStored);
+        bridge.thumbnailStored.connect(onThumbnailStored);
+        bridge.reset.connect(onReset);
+    });
+} else {
+    // Without the channel, catch up with history whenever the page is shown again.
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState !== 'visible') return;
+        fetch('/api/homepage.json').then(response => response.json()).then(onReset);
+    });
+}
 
-        QMessageBox.information(self, "Settings", "Settings saved successfully! (Some settings require browser restart or are placeholders.)")
-        self.accept()
+renderShortcuts();
+renderMostVisited();
+renderRecent();
+"""
 
-    def _reset_to_defaults(self):
-        """Resets settings to their default values."""
-        reply = QMessageBox.question(self, "Reset Settings",
-                                   "Are you sure you want to reset all settings to their default values?",
-                                   QMessageBox.Yes | QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            self.search_combo.setCurrentText("DuckDuckGo")
-            self.tor_cb.setChecked(False) # Default to no TOR
-            self.javascript_cb.setChecked(True) # Default to JS enabled
-            QMessageBox.information(self, "Settings Reset", "Settings have been reset to defaults.")
-            # In a real app, you'd also clear QSettings values here.
-            if isinstance(self.parent_browser, EnhancedNullBrowser):
-                self.parent_browser.app_settings.clear() # Clear all saved settings
+class HomepageTemplate:
+    """
+    A page template compiled once: comments and indentation are stripped and it is split at the data
+    marker, so rendering is two concatenations around a JSON payload.
+    Text assets are compacted and encoded once too (bytes are served as they are). Each is renamed after a hash of its content, so a new
+    version of an asset is never mistaken for an old one, and references in the template follow the new name.
+    """
+    COMMENT_PATTERN = re.compile(r'/\*.*?\*/|^\s*//[^\n]*', re.S | re.M)
+
+    def __init__(self, template: str, assets: dict = None):
+        self.assets = {} # path -> (content type, QByteArray)
+        for path, (content_type, text) in (assets or {}).items():
+            data = text if isinstance(text, bytes) else self._compact(text).encode('utf-8')
+            stem, ext = os.path.splitext(path)
+            hashed_path = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            self.assets[hashed_path] = (content_type, QByteArray(data))
+            template = template.replace(f'"{path}"', f'"{hashed_path}"')
+        head, tail = template.split(HOMEPAGE_DATA_MARKER)
+        self.head = self._compact(head)
+        self.tail = self._compact(tail)
+
+    @classmethod
+    def _compact(cls, text: str) -> str:
+        """Drops comments, indentation and blank lines; line breaks stay, so no statement runs into the next."""
+        lines = (line.strip() for line in cls.COMMENT_PATTERN.sub('', text).splitlines())
+        return '\n'.join(line for line in lines if line)
+
+    def render(self, data: dict) -> str:
+        """Fills in the data block; '<' is escaped so no string in the JSON can end its script element."""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('<', '\\u003c')
+        return self.head + payload + self.tail
+
+def read_qt_resource(path: str) -> bytes:
+    """Returns a file compiled into Qt's resources, or b'' when it is missing."""
+    resource = QFile(path)
+    if not resource.open(QIODevice.ReadOnly):
+        print(f"Qt resource not found: {path}")
+        return b''
+    return bytes(resource.readAll())
+
+HOMEPAGE = HomepageTemplate(HOMEPAGE_TEMPLATE, {
+    '/assets/home.css': (b'text/css;charset=utf-8', HOMEPAGE_CSS),
+    '/assets/qwebchannel.js': (b'application/javascript;charset=utf-8', read_qt_resource(':/qtwebchannel/qwebchannel.js')),
+    '/assets/home.js': (b'application/javascript;charset=utf-8', HOMEPAGE_JS)
+})
+
+
+# --- null:// Scheme ---
+class NullSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves null://home: the start page at /, its static assets under /assets/, JSON under /api/,
+    stored site favicons under /favicon/<host> and site thumbnails under /thumbnail/<url hash>. Responses are streamed from in-memory QBuffers owned
+    by their request jobs. History data is only handed to null:// pages (and / to top-level navigations); other requesters are refused.
+    """
+    def __init__(self, services: 'BrowserServices', parent: QObject = None):
+        super().__init__(parent)
+        self.services = services
+        self._endpoints = {
+            '/api/homepage.json': lambda query: services.homepage_data(),
+            '/api/recent.json': lambda query: services.homepage_sites(
+                services.history_manager.get_recent_sites(self._int_param(query, 'limit', HOMEPAGE_RECENT_SITES))),
+            '/api/most-visited.json': lambda query: services.homepage_sites(
+                services.history_manager.get_most_visited(self._int_param(query, 'limit', HOMEPAGE_MOST_VISITED))),
+            '/api/shortcuts.json': lambda query: services.history_manager.shortcuts,
+            '/api/bookmarks.json': self._bookmarks,
+        }
 
-    def _clear_browser_cache(self):
-        """Clears the browser's HTTP cache."""
-        if isinstance(self.parent_browser, EnhancedNullBrowser):
-            reply = QMessageBox.question(self, "Clear Cache",
-                                       "Are you sure you want to clear the browser's HTTP cache?",
-                                       QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                self.parent_browser.profile.clearHttpCache()
-                QMessageBox.information(self, "Cache Cleared", "Browser cache has been cleared.")
-        else:
-            QMessageBox.critical(self, "Error", "Could not access browser profile to clear cache.")
+    def requestStarted(self, job: QWebEngineUrlRequestJob):
+        """Answers one null:// request."""
+        url = job.requestUrl()
+        path = url.path() or '/'
+        if url.host() != 'home':
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        initiator = job.initiator()
+        if path == '/':
+            # The page embeds history data, so it is only served to a top-level navigation (no initiator)
+            # or to a null:// page; web security is disabled, and any other page could read it back.
+            if not initiator.isEmpty() and initiator.scheme() != NULL_SCHEME.decode():
+                job.fail(QWebEngineUrlRequestJob.RequestDenied)
+                return
+            self._reply(job, b'text/html;charset=utf-8', self.services.homepage_html().encode('utf-8'))
+            return
+        asset = HOMEPAGE.assets.get(path)
+        if asset:
+            self._reply(job, *asset)
+            return
+        if initiator.scheme() != NULL_SCHEME.decode():
+            job.fail(QWebEngineUrlRequestJob.RequestDenied)
+            return
+        try:
+            if path.startswith('/favicon/'):
+                data = self.services.history_manager.icons.read(path[len('/favicon/'):])
+                if data is None:
+                    job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+                else:
+                    self._reply(job, b'image/png', data)
+                return
+            if path.startswith('/thumbnail/'):
+                thumbnail = self.services.history_manager.thumbnails.read(path[len('/thumbnail/'):])
+                if thumbnail is None:
+                    job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+                else:
+                    self._reply(job, *thumbnail)
+                return
+            endpoint = self._endpoints.get(path)
+            if endpoint is None:
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+                return
+            body = json.dumps(endpoint(parse_qs(url.query())), ensure_ascii=False, separators=(',', ':'))
+            self._reply(job, b'application/json;charset=utf-8', body.encode('utf-8'))
+        except ValueError:
+            job.fail(QWebEngineUrlRequestJob.UrlInvalid)
+
+    @staticmethod
+    def _reply(job: QWebEngineUrlRequestJob, content_type: bytes, data):
+        """Streams data to the job from a buffer that is deleted with the job."""
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type, buffer)
+
+    @staticmethod
+    def _int_param(query: dict, name: str, default: int) -> int:
+        """Reads a non-negative integer query parameter, capped at NULL_API_MAX_ROWS; raises ValueError."""
+        value = int(query.get(name, [default])[0])
+        if value < 0:
+            raise ValueError(f"negative {name}")
+        return min(value, NULL_API_MAX_ROWS)
+
+    def _bookmarks(self, query: dict) -> list:
+        """Children of ?folder= (the top level without it), paged with ?after= (a position) and ?limit=."""
+        folder = query.get('folder', [None])[0]
+        nodes = self.services.history_manager.bookmarks.children(
+            None if folder is None else int(folder), int(query.get('after', [-1])[0]),
+            self._int_param(query, 'limit', BOOKMARK_FETCH_BATCH))
+        return [{'id': node.id, 'title': node.title, 'url': node.url, 'isFolder': node.is_folder,
+                 'position': node.position, 'favicon': node.favicon} for node in nodes]
+
+
+class StartPageBridge(QObject):
+    """
+    Live updates for open start pages, published to their JavaScript over QWebChannel as 'startPage'.
+    History and bookmark changes are pushed as small diffs that the page applies to the affected cards;
+    changes that can't be described that way (range purges, imports, clearing bookmarks) send a fresh snapshot.
+    """
+    visitAdded = pyqtSignal('QVariantMap') # site card
+    entriesRemoved = pyqtSignal('QVariantList') # urls
+    bookmarkChanged = pyqtSignal(str, bool) # url, bookmarked
+    iconStored = pyqtSignal(str, str) # host, icon path
+    thumbnailStored = pyqtSignal(str, str) # url, thumbnail path
+    reset = pyqtSignal('QVariantMap') # homepage data
+
+    def __init__(self, services: 'BrowserServices', parent: QObject = None):
+        super().__init__(parent)
+        self.services = services
+        manager = services.history_manager
+        manager.visit_added.connect(self._on_visit_added)
+        manager.history_removed.connect(self._on_history_removed)
+        manager.history_cleared.connect(self._send_snapshot)
+        manager.history_imported.connect(self._send_snapshot)
+        manager.bookmark_added.connect(self._on_bookmark_added)
+        manager.bookmark_removed.connect(self._on_bookmark_removed)
+        manager.bookmarks_cleared.connect(self._send_snapshot)
+        manager.bookmarks_imported.connect(self._send_snapshot)
+        manager.icons.icon_stored.connect(self._on_icon_stored)
+        manager.thumbnails.thumbnail_stored.connect(self._on_thumbnail_stored)
+
+    @pyqtSlot(result='QVariantMap')
+    def snapshot(self) -> dict:
+        """The data a freshly loaded start page would get."""
+        return self.services.homepage_data()
+
+    def _on_visit_added(self, url: str, title: str, transition: int):
+        domain = urlsplit(url).netloc.lower()
+        entry = HistoryEntry(url, title, int(time.time() * 1_000_000),
+                             self.services.history_manager.get_favicon_for_domain(domain), domain, 1)
+        self.visitAdded.emit(self.services.homepage_sites([entry])[0])
+
+    def _on_history_removed(self, urls: list):
+        self.entriesRemoved.emit(urls)
+
+    def _on_bookmark_added(self, url: str, title: str):
+        self.bookmarkChanged.emit(url, True)
+
+    def _on_bookmark_removed(self, url: str):
+        self.bookmarkChanged.emit(url, False)
+
+    def _on_icon_stored(self, host: str):
+        self.iconStored.emit(host, f"/favicon/{host}")
+
+    def _on_thumbnail_stored(self, url: str):
+        self.thumbnailStored.emit(url, self.services.history_manager.thumbnails.path(url))
+
+    def _send_snapshot(self):
+        self.reset.emit(self.snapshot())
 
 # --- WebEngine Page ---
+# How each kind of main-frame navigation is recorded in the visits log. Server redirects are not listed:
+# they keep the transition of the navigation they continue, so a typed URL that redirects still counts as typed.
+NAVIGATION_TRANSITIONS = {
+    QWebEnginePage.NavigationTypeLinkClicked: TRANSITION_LINK,
+    QWebEnginePage.NavigationTypeTyped: TRANSITION_TYPED,
+    QWebEnginePage.NavigationTypeFormSubmitted: TRANSITION_LINK,
+    QWebEnginePage.NavigationTypeBackForward: TRANSITION_LINK,
+    QWebEnginePage.NavigationTypeReload: TRANSITION_RELOAD,
+}
+
 class EnhancedWebPage(QWebEnginePage):
     """Custom QWebEnginePage with enhanced settings and custom URL handling."""
     def __init__(self, profile: QWebEngineProfile, browser_instance: 'EnhancedNullBrowser'):
         super().__init__(profile)
         self.browser_instance = browser_instance
+        self.last_transition = TRANSITION_LINK # Transition of the latest main-frame navigation
+        self._next_transition = None
+        self._navigation_pending = False # A main-frame navigation was accepted and has not changed the URL yet
+        self._document_url = QUrl()
         self._setup_enhanced_settings()
         self.featurePermissionRequested.connect(self._handle_feature_permission)
         # The javaScriptConsoleMessage method is overridden directly below, no .connect() needed.
@@ -1252,10 +5262,38 @@ class EnhancedWebPage(QWebEnginePage):
         url_str = url.toString()
         print(f"Attempting to navigate to: {url_str}")  # Log the URL being navigated to
 
-        if url_str.startswith('null://'):
+        if url.scheme() == NULL_SCHEME.decode() and url.host() in NULL_ACTIONS:
             self._handle_custom_url(url_str)
             return False # Navigation handled
-        return super().acceptNavigationRequest(url, navigation_type, is_main_frame)
+        if is_main_frame:
+            # Only the start page gets the live-update channel; other sites never see the bridge.
+            channel = BrowserServices.instance().web_channel if url_str == HOMEPAGE_URL else None
+            if self.webChannel() is not channel:
+                self.setWebChannel(channel)
+            if self._next_transition is not None:
+                self.last_transition, self._next_transition = self._next_transition, None
+            elif navigation_type != QWebEnginePage.NavigationTypeRedirect:
+                self.last_transition = NAVIGATION_TRANSITIONS.get(navigation_type, TRANSITION_LINK)
+        accepted = super().acceptNavigationRequest(url, navigation_type, is_main_frame)
+        if is_main_frame and accepted:
+            self._navigation_pending = True
+        return accepted
+
+    def take_new_document(self, url: QUrl) -> bool:
+        """
+        Called on each urlChanged: True when the page got to 'url' by loading a new document, which history
+        records as a visit. Same-document changes (history.pushState, fragment links) change the URL without
+        a navigation request; a change of fragment alone is skipped even when it was requested.
+        """
+        pending, self._navigation_pending = self._navigation_pending, False
+        previous, self._document_url = self._document_url, QUrl(url)
+        if not pending:
+            return False
+        return url == previous or url.adjusted(QUrl.RemoveFragment) != previous.adjusted(QUrl.RemoveFragment)
+
+    def set_next_transition(self, transition: int):
+        """Overrides the transition recorded for the next main-frame navigation (e.g. opening a bookmark)."""
+        self._next_transition = transition
 
     def _handle_custom_url(self, url: str):
         """Dispatches custom 'null://' URLs to appropriate browser actions."""
@@ -1272,16 +5310,23 @@ class EnhancedWebPage(QWebEnginePage):
     def createWindow(self, type: QWebEnginePage.WebWindowType):
         """Handles requests to open new windows/tabs."""
         if type == QWebEnginePage.WebBrowserTab:
-            return self.browser_instance.add_new_tab().page()
+            # The opener's navigation replaces whatever the tab shows, so a preloaded start page would be wasted.
+            return self.browser_instance.add_new_tab(preloaded=False).page()
         elif type == QWebEnginePage.WebBrowserWindow:
-            # For new windows, you might create a new QMainWindow instance
+            # The new window attaches to the shared services, which also keep it alive
             new_browser_window = EnhancedNullBrowser()
             new_browser_window.show()
             return new_browser_window.tabs.currentWidget().page()
         return super().createWindow(type)
 
     def setHtml(self, html: str, baseUrl: QUrl = QUrl()):
-        """Overrides setHtml to inject dark mode stylesheet for local content."""
+        """
+        Overrides setHtml to inject dark mode stylesheet for local content.
+        Complete documents, such as the homepage, bring their own styles and are loaded as they are.
+        """
+        if html.startswith('<!DOCTYPE'):
+            super().setHtml(html, baseUrl)
+            return
         # Inject custom CSS for scrollbars and general dark mode consistency
         injected_html = f"""
         <!DOCTYPE html>
@@ -1333,33 +5378,45 @@ class EnhancedWebPage(QWebEnginePage):
         print(f"JS Console [{level_str}]: {message} (Line: {line_number}, Source: {source_id})")
 
 
-# --- Main Browser Window ---
-class EnhancedNullBrowser(QMainWindow):
-    """The main browser application window."""
+# --- Application Services ---
+class BrowserServices(QObject):
+    """
+    Process-wide state shared by every browser window: one web profile, one history and bookmark store
+    (with its single writer thread), one autocomplete index, the proxy state and the settings.
+    Created by the first window; shut down when the last window closes.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> 'BrowserServices':
+        """Returns the shared services, creating them on first use."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
     def __init__(self):
         super().__init__()
-        self.setWindowTitle(f"{APP_NAME} - {APP_VERSION}")
-        self.setGeometry(100, 100, 1400, 900)
-        # self.setWindowIcon(QIcon(":/icons/browser_icon.png")) # Placeholder for a custom icon. Requires resource file.
-
+        self.windows = []
+        self._closing = []
         self.proxy_manager = ProxyManager()
         self.history_manager = HistoryManager()
+        self.autocompleter = UrlAutocompleter(self.history_manager, self)
         self.app_settings = QSettings("NullBrowser", "Enhanced")
-        self.closed_tabs = []
-        self.find_text_input = None # For find in page functionality
-
+        self._homepage = (None, None) # (database generation, rendered homepage)
+        # Thumbnails are files only and leave the database generation alone, so they invalidate the page themselves.
+        self.history_manager.thumbnails.thumbnail_stored.connect(self._forget_homepage)
         self._setup_profile()
-        self._setup_ui()
-        self._setup_shortcuts()
-        self._restore_settings()
-
-        print("🚀 Enhanced Null Browser initialized.")
+        self.new_tab_pool = NewTabPool(self, self)
+        # Build the autocomplete index once the first window has had a chance to paint, and preload new tabs later still.
+        QTimer.singleShot(AUTOCOMPLETE_LOAD_DELAY_MS, self.autocompleter.reload)
+        self.new_tab_pool.schedule(NEW_TAB_POOL_START_DELAY_MS)
 
     def _setup_profile(self):
         """Sets up the QWebEngineProfile with cache paths and proxy configuration."""
-        self.profile = QWebEngineProfile("EnhancedNullProfile", self)
+        # Owned by the application rather than a window, so it outlives every page that uses it.
+        self.profile = QWebEngineProfile("EnhancedNullProfile", QApplication.instance())
 
-        proxy_config = self.proxy_manager.get_proxy_config()
+        proxy_config = self.proxy_manager.get_proxy_config() # Probes the Tor ports once per process
         if proxy_config["type"] == "socks5":
             print(f"🛡️ Using TOR proxy: {proxy_config['host']}:{proxy_config['port']}")
             # Note: Setting proxy via QWebEngineProfile requires a QWebEngineUrlRequestInterceptor
@@ -1374,6 +5431,213 @@ class EnhancedNullBrowser(QMainWindow):
         os.makedirs(cache_path, exist_ok=True)
         self.profile.setCachePath(cache_path)
         self.profile.setPersistentStoragePath(cache_path)
+        self.scheme_handler = NullSchemeHandler(self, self)
+        self.profile.installUrlSchemeHandler(NULL_SCHEME, self.scheme_handler)
+        # One channel for every open start page; EnhancedWebPage attaches it to start pages only.
+        self.web_channel = QWebChannel(self)
+        self.web_channel.registerObject('startPage', StartPageBridge(self, self))
+
+    def homepage_data(self) -> dict:
+        """The start page's data: recent and most visited sites, and the shortcuts."""
+        return {
+            'recentSites': self.homepage_sites(self.history_manager.get_recent_sites(HOMEPAGE_RECENT_SITES)),
+            'mostVisited': self.homepage_sites(self.history_manager.get_most_visited(HOMEPAGE_MOST_VISITED)),
+            'shortcuts': self.history_manager.shortcuts
+        }
+
+    def homepage_html(self) -> str:
+        """
+        Returns the start page filled in with homepage_data().
+        The result is reused until the history database changes, so new tabs normally cost no queries.
+        """
+        generation = self.history_manager.db.generation
+        if self._homepage[0] != generation:
+            self._homepage = (generation, HOMEPAGE.render(self.homepage_data()))
+        return self._homepage[1]
+
+    def _forget_homepage(self):
+        self._homepage = (None, None)
+
+    def homepage_sites(self, sites: list) -> list:
+        """
+        Site cards for the start page; 'icon' and 'thumbnail' are the null://home paths of the site's stored
+        favicon and screenshot, if any, and 'bookmarked' tells whether the URL is bookmarked.
+        """
+        icons = self.history_manager.icons
+        thumbnails = self.history_manager.thumbnails
+        return [dict(site.to_dict(), icon=f"/favicon/{site.domain}" if icons.has_icon(site.domain) else None,
+                     thumbnail=thumbnails.path(site.url), bookmarked=self.history_manager.is_bookmarked(site.url))
+                for site in sites]
+
+    def attach(self, window: 'EnhancedNullBrowser'):
+        """Registers a window; the list also keeps windows opened by pages alive."""
+        self.windows.append(window)
+
+    def detach(self, window: 'EnhancedNullBrowser'):
+        """Unregisters a closing window and shuts the services down after the last one."""
+        if window in self.windows:
+            self.windows.remove(window)
+            # Dropping the last reference inside closeEvent would delete the window mid-event; let go next turn.
+            self._closing.append(window)
+            QTimer.singleShot(0, self._closing.clear)
+        if not self.windows:
+            self.shutdown()
+
+    def shutdown(self):
+        """Commits queued history writes and closes the database; the next window starts fresh services."""
+        self.new_tab_pool.clear()
+        self.history_manager.close()
+        if BrowserServices._instance is self:
+            BrowserServices._instance = None
+
+# --- New Tab Pool ---
+def process_memory_mb() -> float:
+    """
+    Resident memory of the browser and every process it started (the web engine's renderers included), in MiB.
+    Returns None where /proc is not available.
+    """
+    if not os.path.exists("/proc/self/statm"):
+        return None
+    try:
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        pids, seen, pages = [str(os.getpid())], set(), 0
+        while pids:
+            pid = pids.pop()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    pages += int(f.read().split()[1])
+                for task in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{task}/children") as f:
+                        pids.extend(f.read().split())
+            except OSError:
+                continue # The process exited while it was being read
+        return pages * page_size / (1024 * 1024)
+    except (ValueError, AttributeError):
+        return None
+
+class NewTabPool(QObject):
+    """
+    Hidden views with the start page already loaded, so a new tab only has to be handed one.
+    The pool fills one view at a time on the event loop, starting a while after startup and again after each take(),
+    and does not grow while process_memory_mb() is above the configured ceiling.
+    The size and the ceiling are read from the settings on every fill, so changes apply without a restart.
+    """
+    def __init__(self, services: 'BrowserServices', parent: QObject = None):
+        super().__init__(parent)
+        self.services = services
+        self.views = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fill)
+
+    @property
+    def size(self) -> int:
+        """Number of views the pool keeps ready."""
+        return max(0, self.services.app_settings.value("new_tab_pool_size", NEW_TAB_POOL_SIZE, type=int))
+
+    @property
+    def max_memory_mb(self) -> int:
+        """Memory use above which no more views are made."""
+        return self.services.app_settings.value("new_tab_pool_max_memory_mb", NEW_TAB_POOL_MAX_MEMORY_MB, type=int)
+
+    @staticmethod
+    def create_view(profile: QWebEngineProfile, browser_instance: 'EnhancedNullBrowser') -> QWebEngineView:
+        """Creates a tab's view and page; the page belongs to the view and is deleted with it."""
+        browser_view = QWebEngineView()
+        web_page = EnhancedWebPage(profile, browser_instance)
+        web_page.setParent(browser_view)
+        browser_view.setPage(web_page)
+        return browser_view
+
+    def schedule(self, delay_ms: int = NEW_TAB_POOL_REFILL_DELAY_MS):
+        """Tops the pool up (or trims it to a smaller size) after delay_ms, or sooner if a fill is already due."""
+        if not self._timer.isActive() or self._timer.remainingTime() > delay_ms:
+            self._timer.start(delay_ms)
+
+    def take(self, browser_instance: 'EnhancedNullBrowser') -> QWebEngineView:
+        """
+        Hands the oldest pooled view over to browser_instance, or returns None when the pool is empty.
+        Either way a replacement is made once the new tab has had time to paint.
+        """
+        self.schedule()
+        if not self.views:
+            return None
+        browser_view = self.views.pop(0)
+        browser_view.page().renderProcessTerminated.disconnect()
+        browser_view.hide()
+        browser_view.setAttribute(Qt.WA_DontShowOnScreen, False)
+        browser_view.page().browser_instance = browser_instance
+        return browser_view
+
+    def _fill(self):
+        """Makes one pooled view and schedules the next, until the pool is full or over its memory ceiling."""
+        while len(self.views) > self.size:
+            self.views.pop().deleteLater()
+        if len(self.views) >= self.size:
+            return
+        memory_mb = process_memory_mb()
+        if memory_mb is not None and memory_mb > self.max_memory_mb:
+            print(f"New tab pool paused: {memory_mb:.0f} MiB in use, limit {self.max_memory_mb} MiB")
+            return
+        browser_view = self.create_view(self.services.profile, None)
+        browser_view.page().renderProcessTerminated.connect(
+            lambda status, code, b=browser_view: self._discard(b))
+        window = self.services.windows[-1] if self.services.windows else None
+        if window is not None:
+            browser_view.resize(window.tabs.size())
+        # Shown off screen, so layout and the first paint are done before the view reaches a tab.
+        browser_view.setAttribute(Qt.WA_DontShowOnScreen)
+        browser_view.show()
+        browser_view.setUrl(QUrl(HOMEPAGE_URL))
+        self.views.append(browser_view)
+        if len(self.views) < self.size:
+            self._timer.start(NEW_TAB_POOL_REFILL_DELAY_MS)
+
+    def _discard(self, browser_view: QWebEngineView):
+        """Drops a pooled view whose renderer died; a fresh one replaces it."""
+        if browser_view in self.views:
+            self.views.remove(browser_view)
+            browser_view.deleteLater()
+            self.schedule()
+
+    def clear(self):
+        """Deletes every pooled view and stops refilling."""
+        self._timer.stop()
+        while self.views:
+            self.views.pop().deleteLater()
+
+# --- Main Browser Window ---
+class EnhancedNullBrowser(QMainWindow):
+    """The main browser application window."""
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle(f"{APP_NAME} - {APP_VERSION}")
+        self.setGeometry(100, 100, 1400, 900)
+        # self.setWindowIcon(QIcon(":/icons/browser_icon.png")) # Placeholder for a custom icon. Requires resource file.
+
+        # Every window shares one set of services; only the first window pays for creating them.
+        self.services = BrowserServices.instance()
+        self.services.attach(self)
+        self.proxy_manager = self.services.proxy_manager
+        self.history_manager = self.services.history_manager
+        self.autocompleter = self.services.autocompleter
+        self.app_settings = self.services.app_settings
+        self.profile = self.services.profile
+        self.history_manager.bookmark_added.connect(self._on_bookmarks_changed)
+        self.history_manager.bookmark_removed.connect(self._on_bookmarks_changed)
+        self.history_manager.bookmarks_cleared.connect(self._on_bookmarks_changed)
+        self.history_manager.bookmarks_imported.connect(self._on_bookmarks_changed)
+        self.closed_tabs = []
+        self.find_text_input = None # For find in page functionality
+
+        self._setup_ui()
+        self._setup_shortcuts()
+        self._restore_settings()
+
+        print("🚀 Enhanced Null Browser initialized.")
 
     def _setup_ui(self):
         """Sets up the main user interface components."""
@@ -1413,80 +5677,111 @@ class EnhancedNullBrowser(QMainWindow):
         bookmarks_label.setStyleSheet("font-weight: bold; padding: 5px; border-bottom: 1px solid #333; color: #e0e0e0;")
         sidebar_layout.addWidget(bookmarks_label)
 
-        self.bookmarks_list = QListWidget()
-        self.bookmarks_list.itemDoubleClicked.connect(self._open_bookmark)
-        # Enable custom context menu for bookmarks list
-        self.bookmarks_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.bookmarks_list.customContextMenuRequested.connect(self._show_bookmark_context_menu)
-        sidebar_layout.addWidget(self.bookmarks_list)
+        # Folders load their children from the database only when expanded.
+        self.bookmarks_tree = QTreeView()
+        self.bookmarks_tree.setHeaderHidden(True)
+        self.bookmarks_tree.setUniformRowHeights(True)
+        self.bookmarks_model = BookmarkTreeModel(self.history_manager.bookmarks, self.history_manager.icons, self)
+        self.bookmarks_tree.setModel(self.bookmarks_model)
+        self.bookmarks_tree.doubleClicked.connect(self._open_bookmark)
+        # Enable custom context menu for the bookmarks tree
+        self.bookmarks_tree.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.bookmarks_tree.customContextMenuRequested.connect(self._show_bookmark_context_menu)
+        sidebar_layout.addWidget(self.bookmarks_tree)
 
         history_label = QLabel("📜 Recent History")
         history_label.setStyleSheet("font-weight: bold; padding: 5px; border-bottom: 1px solid #333; color: #e0e0e0;")
         sidebar_layout.addWidget(history_label)
 
-        self.history_list = QListWidget()
-        self.history_list.itemDoubleClicked.connect(self._open_history_item)
+        # Filled and kept current by the model only while the sidebar is shown.
+        self.history_model = RecentHistoryModel(self.history_manager, parent=self)
+        self.history_list = QListView()
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.setModel(self.history_model)
+        self.history_list.doubleClicked.connect(self._open_history_item)
         sidebar_layout.addWidget(self.history_list)
-
-        self.refresh_sidebar()
         return sidebar
 
-    def refresh_sidebar(self):
-        """Refreshes the content of the bookmarks and history lists in the sidebar."""
-        self.bookmarks_list.clear()
-        for bookmark in self.history_manager.bookmarks:
-            item = QListWidgetItem(f"{bookmark.get('favicon', '🌐')} {bookmark['title']}")
-            item.setData(Qt.UserRole, bookmark['url']) # Store URL
-            item.setData(Qt.UserRole + 1, bookmark['title']) # Store Title for context menu
-            self.bookmarks_list.addItem(item)
-
-        self.history_list.clear()
-        recent = self.history_manager.get_recent_sites(10)
-        for site in recent:
-            item = QListWidgetItem(f"{site['favicon']} {site['title']}")
-            item.setData(Qt.UserRole, site['url'])
-            self.history_list.addItem(item)
-
-    def _open_bookmark(self, item: QListWidgetItem):
-        """Opens the URL of the selected bookmark in the current tab."""
-        url = item.data(Qt.UserRole)
+    def _set_sidebar_visible(self, visible: bool):
+        """Shows or hides the sidebar; its models only follow history and favicon changes while it is shown."""
+        self.sidebar.setVisible(visible)
+        self.history_model.set_active(visible)
+        self.bookmarks_model.set_active(visible)
+
+    def _on_bookmarks_changed(self, *args):
+        """Updates the star after a bookmark is added or removed in any window."""
+        self._update_bookmark_star()
+
+    def _open_bookmark(self, index: QModelIndex):
+        """Opens the URL of the selected bookmark in the current tab; folders just expand."""
+        url = index.data(Qt.UserRole)
         if url:
-            self._load_url_in_current_tab(url)
+            self._load_url_in_current_tab(url, TRANSITION_BOOKMARK)
 
     def _show_bookmark_context_menu(self, pos):
-        """Displays a context menu for bookmark list items."""
-        item = self.bookmarks_list.itemAt(pos)
-        if item:
-            menu = QMenu(self)
+        """Displays a context menu for bookmarks and bookmark folders."""
+        index = self.bookmarks_tree.indexAt(pos)
+        menu = QMenu(self)
+        open_action = remove_action = None
+        if index.isValid() and index.data(Qt.UserRole):
             open_action = menu.addAction("Open")
             remove_action = menu.addAction("Remove")
+        elif index.isValid():
+            remove_action = menu.addAction("Remove Folder")
+        if index.isValid():
+            menu.addSeparator()
+        check_action = menu.addAction("Check Links")
 
-            action = menu.exec_(self.bookmarks_list.mapToGlobal(pos))
+        action = menu.exec_(self.bookmarks_tree.viewport().mapToGlobal(pos))
 
-            if action == open_action:
-                self._open_bookmark(item)
-            elif action == remove_action:
-                self._remove_bookmark_from_list(item)
+        if action is None:
+            return
+        if action == open_action:
+            self._open_bookmark(index)
+        elif action == remove_action:
+            self._remove_bookmark_from_tree(index)
+        elif action == check_action:
+            self.check_bookmark_links()
+
+    def check_bookmark_links(self):
+        """Checks the bookmarks for dead links in the background; progress is shown in the status bar."""
+        checker = self.history_manager.check_bookmark_links(self.proxy_manager)
+        if checker is None:
+            self.statusBar().showMessage("A bookmark link check is already running.")
+            return
+        self.statusBar().showMessage("Checking bookmark links...")
+        checker.progress_updated.connect(self._on_link_check_progress)
+        checker.check_finished.connect(self._on_link_check_finished)
 
-    def _remove_bookmark_from_list(self, item: QListWidgetItem):
-        """Removes the selected bookmark from the list and data."""
-        url_to_remove = item.data(Qt.UserRole)
-        title_to_remove = item.data(Qt.UserRole + 1)
+    def _on_link_check_progress(self, done: int, total: int):
+        self.statusBar().showMessage(f"Checking bookmark links... {done:,} of {total:,}")
 
-        reply = QMessageBox.question(self, "Remove Bookmark",
-                                   f"Are you sure you want to remove '{title_to_remove}' from your bookmarks?",
-                                   QMessageBox.Yes | QMessageBox.No)
+    def _on_link_check_finished(self, success: bool, message: str):
+        self.statusBar().showMessage(message)
+
+    def _remove_bookmark_from_tree(self, index: QModelIndex):
+        """Removes the selected bookmark, or folder with everything in it, after asking."""
+        url_to_remove = index.data(Qt.UserRole)
+        title_to_remove = index.data(Qt.UserRole + 1)
+
+        if url_to_remove:
+            question = f"Are you sure you want to remove '{title_to_remove}' from your bookmarks?"
+        else:
+            question = f"Are you sure you want to remove the folder '{title_to_remove}' and every bookmark in it?"
+        reply = QMessageBox.question(self, "Remove Bookmark", question, QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            if self.history_manager.remove_bookmark(url_to_remove):
+            if not url_to_remove:
+                self.history_manager.remove_bookmark_folder(index.data(Qt.UserRole + 2))
+                self.statusBar().showMessage(f"Bookmark folder removed: {title_to_remove}")
+            elif self.history_manager.remove_bookmark(url_to_remove):
                 QMessageBox.information(self, "Bookmark Removed", f"'{title_to_remove}' has been removed from bookmarks.")
-                self.refresh_sidebar() # Refresh the list
             else:
                 QMessageBox.warning(self, "Error", "Could not remove bookmark.")
 
 
-    def _open_history_item(self, item: QListWidgetItem):
+    def _open_history_item(self, index: QModelIndex):
         """Opens the URL of the selected history item in the current tab."""
-        url = item.data(Qt.UserRole)
+        url = index.data(Qt.UserRole)
         if url:
             self._load_url_in_current_tab(url)
 
@@ -1507,7 +5802,16 @@ class EnhancedNullBrowser(QMainWindow):
         self.url_bar = QLineEdit()
         self.url_bar.setPlaceholderText("Enter URL or search...")
         self.url_bar.returnPressed.connect(self._load_url_from_bar)
-        self.url_bar.textChanged.connect(self._on_url_text_changed) # For future suggestions
+        self.url_bar.textEdited.connect(self._on_url_text_changed) # User typing only, not setText()
+        self.completion_model = CompletionModel(self)
+        self.url_completer = QCompleter(self.completion_model, self)
+        # The model is already filtered and ranked by the index; the completer just shows it.
+        self.url_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.url_completer.setMaxVisibleItems(AUTOCOMPLETE_MAX_RESULTS)
+        # Enter on a suggestion reaches returnPressed with the URL filled in; clicks need loading here.
+        self.url_completer.popup().clicked.connect(
+            lambda index: self._load_url_in_current_tab(index.data(Qt.EditRole)))
+        self.url_bar.setCompleter(self.url_completer)
         nav_bar.addWidget(self.url_bar)
 
         self.security_indicator = QLabel("🌐")
@@ -1516,7 +5820,7 @@ class EnhancedNullBrowser(QMainWindow):
         nav_bar.addSeparator()
 
         # Feature buttons
-        self._add_action_to_toolbar(nav_bar, "⭐", "Bookmark this page (Ctrl+D)", self.bookmark_page)
+        self.bookmark_action = self._add_action_to_toolbar(nav_bar, "☆", "Bookmark this page (Ctrl+D)", self.bookmark_page)
         self._add_action_to_toolbar(nav_bar, "📥", "Download video (Ctrl+Shift+D)", self.download_current_video)
         self._add_action_to_toolbar(nav_bar, "➕", "New Tab (Ctrl+T)", self.add_new_tab)
         nav_bar.addSeparator()
@@ -1532,6 +5836,7 @@ class EnhancedNullBrowser(QMainWindow):
         action.setToolTip(tooltip)
         action.triggered.connect(callback)
         toolbar.addAction(action)
+        return action
 
     def _setup_shortcuts(self):
         """Sets up global keyboard shortcuts for common browser actions."""
@@ -1564,7 +5869,7 @@ class EnhancedNullBrowser(QMainWindow):
             self.restoreGeometry(geometry)
 
         sidebar_visible = self.app_settings.value("sidebar_visible", False, type=bool)
-        self.sidebar.setVisible(sidebar_visible)
+        self._set_sidebar_visible(sidebar_visible)
 
     def _save_settings(self):
         """Saves current application settings to QSettings."""
@@ -1572,9 +5877,13 @@ class EnhancedNullBrowser(QMainWindow):
         self.app_settings.setValue("sidebar_visible", self.sidebar.isVisible())
 
     def _on_url_text_changed(self, text: str):
-        """Handles URL bar text changes (placeholder for suggestions)."""
-        # Future: Implement history-based or search suggestions here.
-        pass
+        """Shows history and bookmark suggestions for the text typed into the URL bar."""
+        entries = self.autocompleter.query(text.strip())
+        self.completion_model.set_entries(entries)
+        if entries:
+            self.url_completer.complete()
+        else:
+            self.url_completer.popup().hide()
 
     def _update_security_indicator(self, url: str):
         """Updates the security indicator based on the current URL's scheme."""
@@ -1588,387 +5897,6 @@ class EnhancedNullBrowser(QMainWindow):
             self.security_indicator.setText("ℹ️")
             self.security_indicator.setToolTip("Local or special page")
 
-    def _get_enhanced_homepage_html(self) -> str:
-        """Generates the HTML content for the enhanced homepage."""
-        recent_sites_js = json.dumps(self.history_manager.get_recent_sites(12), ensure_ascii=False)
-        most_visited_js = json.dumps(self.history_manager.get_most_visited(8), ensure_ascii=False)
-        shortcuts_js = json.dumps(self.history_manager.shortcuts, ensure_ascii=False)
-
-        # The HTML content is kept largely the same as it's already well-structured.
-        # Minor adjustments for consistency with Python variable names.
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Null Browser - Enhanced</title>
-            <meta charset="UTF-8">
-            <style>
-                /* Basic reset and body styling */
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                body {{
-                    background: linear-gradient(135deg, #0c0c0c 0%, #1a1a1a 100%);
-                    color: #e0e0e0;
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Oxygen', 'Ubuntu', 'Cantarell', sans-serif;
-                    min-height: 100vh; overflow-x: hidden;
-                    display: flex; flex-direction: column; align-items: center;
-                    padding-top: 50px; /* Space for potential top bar */
-                }}
-
-                /* Main container */
-                .container {{
-                    max-width: 1400px;
-                    width: 100%;
-                    margin: 0 auto;
-                    padding: 20px;
-                    text-align: center;
-                }}
-
-                /* Header and Logo */
-                .header {{ margin-bottom: 50px; }}
-                .logo {{
-                    font-size: 3.5em; font-weight: 300; margin-bottom: 10px;
-                    background: linear-gradient(45deg, #4285f4, #34a853, #fbbc05, #ea4335);
-                    background-size: 400% 400%;
-                    -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-                    animation: gradientShift 8s ease infinite;
-                }}
-                @keyframes gradientShift {{ 0% {{ background-position: 0% 50%; }} 50% {{ background-position: 100% 50%; }} 100% {{ background-position: 0% 50%; }} }}
-                .tagline {{ font-size: 1.1em; color: #888; margin-bottom: 30px; }}
-
-                /* Search Section */
-                .search-section {{ margin-bottom: 60px; position: relative; }}
-                .search-container {{ position: relative; max-width: 700px; margin: 0 auto; }}
-                .search-input {{
-                    width: 100%; padding: 20px 25px; font-size: 18px; border-radius: 50px;
-                    border: 2px solid transparent; background: rgba(30, 30, 30, 0.8);
-                    backdrop-filter: blur(10px); color: #e0e0e0; outline: none;
-                    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-                    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-                }}
-                .search-input:focus {{
-                    border-color: #4285f4;
-                    box-shadow: 0 0 0 3px rgba(66, 133, 244, 0.1), 0 12px 40px rgba(0, 0, 0, 0.4);
-                    transform: translateY(-2px);
-                }}
-                .search-input::placeholder {{ color: #888; }}
-                .search-engines {{ display: flex; justify-content: center; gap: 15px; margin-top: 20px; }}
-                .search-engine {{
-                    padding: 8px 16px; border-radius: 20px; background: rgba(40, 40, 40, 0.6);
-                    border: 1px solid #333; color: #ccc; text-decoration: none; font-size: 0.9em;
-                    transition: all 0.3s ease;
-                }}
-                .search-engine:hover {{
-                    background: rgba(66, 133, 244, 0.2); border-color: #4285f4; color: #fff;
-                    transform: translateY(-1px);
-                }}
-                .loading-indicator {{
-                    position: absolute; right: 20px; top: 50%; transform: translateY(-50%);
-                    color: #4285f4; font-size: 1.2em; display: none;
-                }}
-
-                /* Sections */
-                .section {{ margin-bottom: 50px; text-align: left; width: 100%; }}
-                .section-title {{
-                    font-size: 1.6em; margin-bottom: 25px; color: #fff; font-weight: 600;
-                    display: flex; align-items: center; gap: 10px;
-                }}
-                .section-title::after {{ content: ''; flex: 1; height: 1px; background: linear-gradient(90deg, #333, transparent); }}
-
-                /* Grids */
-                .cards-grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(300px, 1fr)); gap: 20px; }}
-                .shortcuts-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(140px, 1fr)); gap: 20px; max-width: 900px; margin: 0 auto; }}
-
-                /* Cards */
-                .card, .shortcut-card {{
-                    background: rgba(30, 30, 30, 0.6); backdrop-filter: blur(10px);
-                    border: 1px solid rgba(255, 255, 255, 0.1); border-radius: 16px;
-                    padding: 24px; transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-                    cursor: pointer; text-decoration: none; color: inherit;
-                    display: flex; flex-direction: column; align-items: flex-start; /* Align items to start for cards */
-                    position: relative; overflow: hidden;
-                }}
-                .shortcut-card {{ align-items: center; text-align: center; }} /* Center for shortcuts */
-
-                .card::before, .shortcut-card::before {{
-                    content: ''; position: absolute; top: 0; left: 0; right: 0; bottom: 0;
-                    background: linear-gradient(45deg, transparent, rgba(66, 133, 244, 0.1), transparent);
-                    opacity: 0; transition: opacity 0.3s ease;
-                }}
-                .card:hover, .shortcut-card:hover {{
-                    transform: translateY(-4px) scale(1.02);
-                    border-color: rgba(66, 133, 244, 0.3);
-                    box-shadow: 0 20px 40px rgba(0, 0, 0, 0.4);
-                }}
-                .card:hover::before, .shortcut-card:hover::before {{ opacity: 1; }}
-
-                .card-favicon, .shortcut-icon {{
-                    width: 48px; height: 48px; border-radius: 12px; margin-bottom: 15px;
-                    background: rgba(255, 255, 255, 0.1); display: flex; align-items: center;
-                    justify-content: center; font-size: 24px; position: relative; z-index: 1;
-                }}
-                .shortcut-icon {{ font-size: 36px; margin-bottom: 12px; }}
-
-                .card-title, .shortcut-name {{
-                    font-weight: 600; margin-bottom: 8px; color: #fff; font-size: 1.1em;
-                    position: relative; z-index: 1;
-                }}
-                .shortcut-name {{ font-size: 0.95em; }}
-
-                .card-url {{
-                    font-size: 0.9em; color: #888; overflow: hidden; text-overflow: ellipsis;
-                    white-space: nowrap; margin-bottom: 5px; position: relative; z-index: 1;
-                    width: 100%; /* Ensure URL takes full width for ellipsis */
-                }}
-
-                .card-meta {{
-                    font-size: 0.8em; color: #666; display: flex; justify-content: space-between;
-                    align-items: center; position: relative; z-index: 1; width: 100%;
-                }}
-                .visit-count {{
-                    background: rgba(66, 133, 244, 0.2); padding: 2px 8px; border-radius: 12px;
-                    font-size: 0.75em;
-                }}
-                .shortcut-category {{ font-size: 0.8em; color: #666; margin-top: 5px; position: relative; z-index: 1; }}
-
-                /* Actions */
-                .actions {{
-                    display: flex; justify-content: center; gap: 20px; margin-top: 30px; flex-wrap: wrap;
-                }}
-                .action-btn {{
-                    background: rgba(66, 133, 244, 0.2); border: 1px solid rgba(66, 133, 244, 0.3);
-                    color: #e0e0e0; padding: 12px 24px; border-radius: 25px; cursor: pointer;
-                    font-size: 0.9em; transition: all 0.3s ease; text-decoration: none;
-                    display: inline-flex; align-items: center; gap: 8px;
-                }}
-                .action-btn:hover {{
-                    background: rgba(66, 133, 244, 0.3); border-color: #4285f4;
-                    transform: translateY(-2px); box-shadow: 0 8px 20px rgba(0, 0, 0, 0.4);
-                }}
-
-                /* Empty State */
-                .empty-state {{
-                    text-align: center; color: #666; grid-column: 1 / -1; padding: 60px 20px;
-                    font-style: italic;
-                }}
-                .empty-state .icon {{ font-size: 4em; margin-bottom: 20px; opacity: 0.5; }}
-
-                /* Features Banner */
-                .features-banner {{
-                    background: linear-gradient(135deg, rgba(66, 133, 244, 0.1), rgba(52, 168, 83, 0.1));
-                    border: 1px solid rgba(66, 133, 244, 0.2); border-radius: 16px;
-                    padding: 25px; margin: 30px 0; text-align: left;
-                }}
-                .features-banner h3 {{ color: #4285f4; margin-bottom: 15px; font-size: 1.3em; }}
-                .features-list {{
-                    list-style: none; display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-                    gap: 10px;
-                }}
-                .features-list li {{ padding: 8px 0; display: flex; align-items: center; gap: 10px; }}
-
-                /* Responsive adjustments */
-                @media (max-width: 768px) {{
-                    .container {{ padding: 15px; }}
-                    .logo {{ font-size: 2.5em; }}
-                    .cards-grid {{ grid-template-columns: 1fr; }}
-                    .shortcuts-grid {{ grid-template-columns: repeat(auto-fit, minmax(120px, 1fr)); }}
-                    .search-engines {{ flex-wrap: wrap; }}
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1 class="logo">🌑 Null Browser</h1>
-                    <p class="tagline">Enhanced Edition - Privacy-focused browsing with advanced features</p>
-                </div>
-
-                <div class="features-banner">
-                    <h3>🚀 Enhanced Features</h3>
-                    <ul class="features-list">
-                        <li>🎥 Advanced video downloader with multiple quality options</li>
-                        <li>🔒 Enhanced privacy with TOR support</li>
-                        <li>📚 Smart bookmarks and history management</li>
-                        <li>⚡ Performance optimizations and smooth scrolling</li>
-                        <li>🎨 Beautiful dark theme with modern design</li>
-                        <li>⌨️ Comprehensive keyboard shortcuts</li>
-                    </ul>
-                </div>
-
-                <div class="search-section">
-                    <div class="search-container">
-                        <input type="text" class="search-input" placeholder="Search the web or enter a URL..." autofocus>
-                        <span class="loading-indicator">Loading...</span>
-                        <div class="search-engines">
-                            <a href="#" class="search-engine" data-engine="duckduckgo">🦆 DuckDuckGo</a>
-                            <a href="#" class="search-engine" data-engine="google">🔍 Google</a>
-                            <a href="#" class="search-engine" data-engine="bing">🅱️ Bing</a>
-                            <a href="#" class="search-engine" data-engine="startpage">🔒 StartPage</a>
-                        </div>
-                    </div>
-                </div>
-
-                <div class="section">
-                    <h2 class="section-title">🚀 Quick Access</h2>
-                    <div class="shortcuts-grid" id="shortcutsGrid"></div>
-                </div>
-
-                <div class="section" id="mostVisitedSection">
-                    <h2 class="section-title">⭐ Most Visited</h2>
-                    <div class="cards-grid" id="mostVisitedGrid"></div>
-                </div>
-
-                <div class="section" id="recentSection">
-                    <h2 class="section-title">📜 Recently Visited</h2>
-                    <div class="cards-grid" id="recentGrid"></div>
-                </div>
-
-                <div class="actions">
-                    <button class="action-btn" onclick="clearHistory()">
-                        🗑️ Clear History
-                    </button>
-                    <button class="action-btn" onclick="showSettings()">
-                        ⚙️ Settings
-                    </button>
-                    <button class="action-btn" onclick="showDownloads()">
-                        📥 Downloads
-                    </button>
-                </div>
-            </div>
-
-            <script>
-                const recentSites = {recent_sites_js};
-                const mostVisited = {most_visited_js};
-                const shortcuts = {shortcuts_js};
-                const searchInput = document.querySelector('.search-input');
-                const loadingIndicator = document.querySelector('.loading-indicator');
-
-                function formatTimeAgo(dateString) {{
-                    const date = new Date(dateString);
-                    const now = new Date();
-                    const diffInSeconds = Math.floor((now - date) / 1000);
-
-                    if (diffInSeconds < 60) return 'Just now';
-                    if (diffInSeconds < 3600) return `${{Math.floor(diffInSeconds / 60)}}m ago`;
-                    if (diffInSeconds < 86400) return `${{Math.floor(diffInSeconds / 3600)}}h ago`;
-                    if (diffInSeconds < 604800) return `${{Math.floor(diffInSeconds / 86400)}}d ago`;
-                    return date.toLocaleDateString();
-                }}
-
-                function renderShortcuts() {{
-                    const container = document.getElementById('shortcutsGrid');
-                    container.innerHTML = '';
-                    if (shortcuts.length === 0) {{
-                        container.innerHTML = '<div class="empty-state"><span class="icon">✨</span><p>No shortcuts yet. Add your favorites!</p></div>';
-                        return;
-                    }}
-                    shortcuts.forEach(shortcut => {{
-                        const card = document.createElement('a');
-                        card.className = 'shortcut-card';
-                        card.href = shortcut.url;
-                        card.innerHTML = `
-                            <div class="shortcut-icon">${{shortcut.icon}}</div>
-                            <div class="shortcut-name">${{shortcut.name}}</div>
-                            <div class="shortcut-category">${{shortcut.category || ''}}</div>
-                        `;
-                        container.appendChild(card);
-                    }});
-                }}
-
-                function renderMostVisited() {{
-                    const container = document.getElementById('mostVisitedGrid');
-                    const section = document.getElementById('mostVisitedSection');
-                    if (mostVisited.length === 0) {{
-                        section.style.display = 'none';
-                        return;
-                    }}
-                    section.style.display = 'block';
-                    container.innerHTML = '';
-                    mostVisited.forEach(site => {{
-                        const card = document.createElement('a');
-                        card.className = 'card';
-                        card.href = site.url;
-                        card.innerHTML = `
-                            <div class="card-favicon">${{site.favicon}}</div>
-                            <div class="card-title">${{site.title}}</div>
-                            <div class="card-url">${{site.url}}</div>
-                            <div class="card-meta">
-                                <span class="visit-count">${{site.visitCount}} visits</span>
-                            </div>
-                        `;
-                        container.appendChild(card);
-                    }});
-                }}
-
-                function renderRecent() {{
-                    const container = document.getElementById('recentGrid');
-                    const section = document.getElementById('recentSection');
-                    if (recentSites.length === 0) {{
-                        section.style.display = 'none';
-                        return;
-                    }}
-                    section.style.display = 'block';
-                    container.innerHTML = '';
-                    recentSites.forEach(site => {{
-                        const card = document.createElement('a');
-                        card.className = 'card';
-                        card.href = site.url;
-                        card.innerHTML = `
-                            <div class="card-favicon">${{site.favicon}}</div>
-                            <div class="card-title">${{site.title}}</div>
-                            <div class="card-url">${{site.url}}</div>
-                            <div class="card-meta">
-                                <span>${{formatTimeAgo(site.visitTime)}}</span>
-                                ${{site.visitCount > 1 ? `<span class="visit-count">${{site.visitCount}} visits</span>` : ''}}
-                            </div>
-                        `;
-                        container.appendChild(card);
-                    }});
-                }}
-
-                function handleSearch(query, engine = 'duckduckgo') {{
-                    loadingIndicator.style.display = 'inline'; // Show loading indicator
-                    const engines = {{
-                        'duckduckgo': 'https://duckduckgo.com/?q=',
-                        'google': 'https://www.google.com/search?q=',
-                        'bing': 'https://www.bing.com/search?q=',
-                        'startpage': 'https://www.startpage.com/sp/search?query='
-                    }};
-                    if (query.includes('.') && !query.includes(' ')) {{
-                        const url = query.startsWith('http') ? query : `https://${{query}}`;
-                        window.location.href = url;
-                    }} else {{
-                        const searchUrl = engines[engine] + encodeURIComponent(query);
-                        window.location.href = searchUrl;
-                    }}
-                }}
-
-                function clearHistory() {{ window.location.href = 'null://clear-history'; }}
-                function showSettings() {{ window.location.href = 'null://settings'; }}
-                function showDownloads() {{ window.location.href = 'null://downloads'; }}
-
-                searchInput.addEventListener('keypress', (e) => {{
-                    if (e.key === 'Enter') {{ handleSearch(e.target.value); }}
-                }});
-                document.querySelectorAll('.search-engine').forEach(engine => {{
-                    engine.addEventListener('click', (e) => {{
-                        e.preventDefault();
-                        const query = searchInput.value;
-                        if (query) {{ handleSearch(query, e.target.dataset.engine); }}
-                    }});
-                }});
-
-                // Hide loading indicator if page loads without search
-                window.addEventListener('load', () => {{
-                    loadingIndicator.style.display = 'none';
-                }});
-
-                renderShortcuts();
-                renderMostVisited();
-                renderRecent();
-            </script>
-        </body>
-        </html>
-        """
 
     # --- Navigation Methods ---
     def go_back(self):
@@ -1996,7 +5924,7 @@ class EnhancedNullBrowser(QMainWindow):
         """Navigates the current tab to the enhanced homepage."""
         current_browser = self.tabs.currentWidget()
         if current_browser:
-            current_browser.setHtml(self._get_enhanced_homepage_html())
+            current_browser.setUrl(QUrl(HOMEPAGE_URL))
             self.statusBar().showMessage("Navigated to homepage.")
 
     def focus_url_bar(self):
@@ -2007,7 +5935,7 @@ class EnhancedNullBrowser(QMainWindow):
 
     def toggle_sidebar(self):
         """Toggles the visibility of the sidebar."""
-        self.sidebar.setVisible(not self.sidebar.isVisible())
+        self._set_sidebar_visible(not self.sidebar.isVisible())
         self.statusBar().showMessage(f"Sidebar {'shown' if self.sidebar.isVisible() else 'hidden'}.")
 
     def toggle_fullscreen(self):
@@ -2098,19 +6026,21 @@ class EnhancedNullBrowser(QMainWindow):
         self.statusBar().showMessage("Find in page closed.")
 
     # --- Tab Management ---
-    def add_new_tab(self, url: str = None, label: str = "New Tab"):
+    def add_new_tab(self, url: str = None, label: str = "New Tab", preloaded: bool = True):
         """
         Adds a new tab to the browser.
-        If a URL is provided, loads it; otherwise, loads the homepage.
+        If a URL is provided, loads it; otherwise, shows the homepage, taking an already loaded one from the
+        new tab pool when there is one and preloaded is set.
         """
-        browser_view = QWebEngineView()
-        web_page = EnhancedWebPage(self.profile, self)
-        browser_view.setPage(web_page)
+        pooled_view = self.services.new_tab_pool.take(self) if preloaded and not url else None
+        browser_view = pooled_view if pooled_view is not None else NewTabPool.create_view(self.profile, self)
 
         # Connect signals for tab management
         browser_view.titleChanged.connect(lambda title, b=browser_view: self._update_tab_title(b, title))
         browser_view.urlChanged.connect(lambda qurl, b=browser_view: self._update_tab_url(b, qurl))
+        browser_view.iconChanged.connect(lambda icon, b=browser_view: self._update_tab_icon(b, icon))
         browser_view.loadFinished.connect(self._on_page_load_finished)
+        browser_view.loadFinished.connect(lambda ok, b=browser_view: ok and self.history_manager.thumbnails.request(b))
         browser_view.loadStarted.connect(lambda: self.statusBar().showMessage(f"Loading {browser_view.url().host()}..."))
         browser_view.loadProgress.connect(lambda p: self.statusBar().showMessage(f"Loading {browser_view.url().host()}... {p}%"))
 
@@ -2118,10 +6048,11 @@ class EnhancedNullBrowser(QMainWindow):
         tab_index = self.tabs.addTab(browser_view, label)
         self.tabs.setCurrentIndex(tab_index)
 
-        if url:
-            browser_view.setUrl(QUrl(url))
-        else:
-            browser_view.setHtml(self._get_enhanced_homepage_html())
+        if pooled_view is None:
+            browser_view.setUrl(QUrl(url or HOMEPAGE_URL))
+        elif browser_view.title():
+            # Signals the page sent while it waited in the pool went unheard.
+            self._update_tab_title(browser_view, browser_view.title())
 
         self.statusBar().showMessage(f"New tab opened: {url if url else 'Homepage'}")
         return browser_view
@@ -2172,20 +6103,35 @@ class EnhancedNullBrowser(QMainWindow):
                 self.tabs.setTabText(i, display_title)
                 break
 
+    def _update_tab_icon(self, browser_view: QWebEngineView, icon: QIcon):
+        """
+        Shows a page's favicon on its tab and stores it in the favicon cache.
+        While a page has no icon yet (it is cleared on every navigation) the cached one for its site is shown.
+        """
+        url_str = browser_view.url().toString()
+        if icon.isNull():
+            icon = self.history_manager.icons.icon_for_url(url_str) or QIcon()
+        else:
+            self.history_manager.icons.store(url_str, browser_view.page().iconUrl().toString(), icon)
+        index = self.tabs.indexOf(browser_view)
+        if index >= 0:
+            self.tabs.setTabIcon(index, icon)
+
     def _update_tab_url(self, browser_view: QWebEngineView, qurl: QUrl):
         """
         Updates the URL bar and security indicator when a tab's URL changes.
-        Also adds the visit to history.
+        Also adds the visit to history when the change loaded a new document.
         """
         url_str = qurl.toString()
         if browser_view == self.tabs.currentWidget():
             self.url_bar.setText(url_str)
             self._update_security_indicator(url_str)
+            self._update_bookmark_star(url_str)
 
-        # Add to history only for valid web pages
-        if not url_str.startswith(('data:', 'about:', 'chrome:', 'devtools:', 'null:')):
-            title = browser_view.page().title()
-            self.history_manager.add_visit(url_str, title)
+        # Add to history only for valid web pages, once per document rather than per pushState or #fragment
+        page = browser_view.page()
+        if page.take_new_document(qurl) and not url_str.startswith(('data:', 'about:', 'chrome:', 'devtools:', 'null:')):
+            self.history_manager.add_visit(url_str, page.title(), page.last_transition)
 
     def _update_url_bar_and_security(self):
         """Updates the URL bar and security indicator when the active tab changes."""
@@ -2194,11 +6140,23 @@ class EnhancedNullBrowser(QMainWindow):
             url_str = current_browser.url().toString()
             self.url_bar.setText(url_str)
             self._update_security_indicator(url_str)
+            self._update_bookmark_star(url_str)
             self.statusBar().showMessage(f"Current tab: {current_browser.page().title()}")
 
+    def _update_bookmark_star(self, url_str: str = None):
+        """Fills the toolbar star when the current page (or url_str) is bookmarked."""
+        if url_str is None:
+            current_browser = self.tabs.currentWidget()
+            url_str = current_browser.url().toString() if current_browser else ''
+        if self.history_manager.is_bookmarked(url_str):
+            self.bookmark_action.setText("⭐")
+            self.bookmark_action.setToolTip("Remove bookmark (Ctrl+D)")
+        else:
+            self.bookmark_action.setText("☆")
+            self.bookmark_action.setToolTip("Bookmark this page (Ctrl+D)")
+
     def _on_page_load_finished(self, success: bool):
-        """Callback when a page finishes loading."""
-        self.refresh_sidebar() # Refresh sidebar to show updated history/bookmarks
+        """Callback when a page finishes loading; the sidebar follows history through its models, not page loads."""
         current_browser = self.tabs.currentWidget()
         if current_browser:
             if success:
@@ -2216,13 +6174,16 @@ class EnhancedNullBrowser(QMainWindow):
         else:
             self.statusBar().showMessage("Please enter a URL or search query.")
 
-    def _load_url_in_current_tab(self, url_str: str):
+    def _load_url_in_current_tab(self, url_str: str, transition: int = None):
         """
         Loads a given URL in the current active tab, with smart URL handling.
+        An explicit transition (e.g. TRANSITION_BOOKMARK) overrides the one derived from the navigation type.
         """
         current_browser = self.tabs.currentWidget()
         if not current_browser:
             current_browser = self.add_new_tab(url_str) # Create new tab if none exists
+        if transition is not None:
+            current_browser.page().set_next_transition(transition)
 
         # Smart URL handling: add https:// if it looks like a domain, otherwise search
         if not url_str.startswith(('http://', 'https://', 'file://', 'about:')):
@@ -2259,7 +6220,7 @@ class EnhancedNullBrowser(QMainWindow):
 
     # --- Feature Actions ---
     def bookmark_page(self):
-        """Bookmarks the current page."""
+        """Bookmarks the current page, or removes its bookmark if it already has one."""
         current_browser = self.tabs.currentWidget()
         if not current_browser:
             self.statusBar().showMessage("No page open to bookmark.")
@@ -2268,10 +6229,12 @@ class EnhancedNullBrowser(QMainWindow):
         url = current_browser.url().toString()
         title = current_browser.page().title()
 
-        if url and not url.startswith(('about:', 'data:', 'null:')):
+        if self.history_manager.is_bookmarked(url):
+            self.history_manager.remove_bookmark(url)
+            self.statusBar().showMessage(f"Bookmark removed: {title}")
+        elif url and not url.startswith(('about:', 'data:', 'null:')):
+            # The star and the sidebar follow the bookmark_added signal; no dialog interrupts browsing.
             self.history_manager.add_bookmark(url, title)
-            QMessageBox.information(self, "Bookmarked", f"Page '{title}' has been bookmarked!")
-            self.refresh_sidebar()
             self.statusBar().showMessage(f"Bookmarked: {title}")
         else:
             QMessageBox.warning(self, "Cannot Bookmark", "This type of page cannot be bookmarked.")
@@ -2281,17 +6244,13 @@ class EnhancedNullBrowser(QMainWindow):
         """Displays the history dialog."""
         dialog = HistoryDialog(self, self.history_manager)
         dialog.exec_()
+        dialog.deleteLater() # Its models follow history_removed while they exist
         self.statusBar().showMessage("History dialog opened.")
 
     def clear_browsing_data(self):
         """Displays the clear browsing data dialog."""
         dialog = ClearDataDialog(self, self.history_manager)
         if dialog.exec_() == QDialog.Accepted:
-            self.refresh_sidebar()
-            # If the current page is the homepage, refresh it to reflect cleared data
-            current_browser = self.tabs.currentWidget()
-            if current_browser and current_browser.url().toString().startswith('data:'):
-                current_browser.setHtml(self._get_enhanced_homepage_html())
             self.statusBar().showMessage("Browsing data cleared.")
         else:
             self.statusBar().showMessage("Clear data operation cancelled.")
@@ -2336,8 +6295,9 @@ class EnhancedNullBrowser(QMainWindow):
             self.statusBar().showMessage("Failed to open downloads folder.")
 
     def closeEvent(self, event):
-        """Handles the application close event, saving settings."""
+        """Handles the window close event, saving settings; the last window also closes the history database."""
         self._save_settings()
+        self.services.detach(self) # Flushes queued history writes once no window is left
         event.accept()
 
 # --- Main Application Entry Point ---
@@ -0,0 +1,683 @@
+"""
+Micro-benchmarks for the Null Browser 3 storage layer.
+
+Run with "python benchmark.py" to execute every benchmark, or pass one or more
+benchmark names (e.g. "python benchmark.py history") to run a subset.
+All benchmarks work on a throwaway data directory, never on ~/.null_browser.
+"""
+import os
+import sys
+import time
+import resource
+import sqlite3
+import tempfile
+import statistics
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from PyQt5.QtCore import QEventLoop, QModelIndex, QTimer, QUrl
+from PyQt5.QtWidgets import QApplication, QListWidget, QListWidgetItem
+
+import Browser3
+
+
+_app = None
+
+
+def _application() -> QApplication:
+    """Returns the QApplication, creating it on first use; it is kept for the rest of the run."""
+    global _app
+    _app = QApplication.instance() or QApplication(sys.argv)
+    return _app
+
+
+def _timed(func, repeat: int) -> list:
+    """Calls func repeat times and returns the per-call latencies in milliseconds."""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list, unit: str = "ms"):
+    """Prints median and p95 for a list of latency samples."""
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"  {label:<34} median {statistics.median(ordered):8.3f} {unit}   p95 {p95:8.3f} {unit}")
+
+
+def _make_history_manager(data_dir: str) -> 'Browser3.HistoryManager':
+    """Creates a HistoryManager rooted in a temporary data directory."""
+    Browser3.BROWSER_DATA_DIR = data_dir
+    return Browser3.HistoryManager()
+
+
+# --- Legacy (per-call connection) implementation, kept for comparison ---
+def _legacy_add_visit(db_path: str, url: str, title: str):
+    """Mirrors the original add_visit: a fresh connection and commit per call."""
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            INSERT INTO history (url, title, domain, favicon, visit_count)
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT(url) DO UPDATE SET
+                title = ?,
+                visit_time = CURRENT_TIMESTAMP,
+                visit_count = visit_count + 1
+        ''', (url, title, 'example.com', '🌐', title))
+
+
+def _legacy_recent(db_path: str, limit: int):
+    """Mirrors the original get_recent_sites: a fresh connection per query."""
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute('''
+            SELECT url, title, visit_time, favicon, domain, visit_count
+            FROM history
+            ORDER BY visit_time DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+
+
+def bench_history(visits: int = 2000, queries: int = 500):
+    """Visits/sec, transactions and query latency for per-call connections vs. the pooled write-behind path."""
+    print(f"📊 History connection benchmark ({visits} visits, {queries} queries)")
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as pooled_dir:
+        legacy = _make_history_manager(legacy_dir)
+        legacy.close()
+        legacy_db = legacy.db_path
+        # The legacy code never enabled WAL, so measure it in the default rollback journal.
+        with sqlite3.connect(legacy_db) as conn:
+            conn.execute('PRAGMA journal_mode=DELETE')
+
+        start = time.perf_counter()
+        for i in range(visits):
+            _legacy_add_visit(legacy_db, f"https://example.com/page/{i % 300}", f"Page {i}")
+        legacy_rate = visits / (time.perf_counter() - start)
+        legacy_samples = _timed(lambda i: _legacy_recent(legacy_db, 15), queries)
+
+        pooled = _make_history_manager(pooled_dir)
+        start = time.perf_counter()
+        enqueue_samples = _timed(lambda i: pooled.add_visit(f"https://example.com/page/{i % 300}", f"Page {i}"), visits)
+        pooled.flush()  # Count the time until everything is actually on disk
+        pooled_rate = visits / (time.perf_counter() - start)
+        transactions = pooled.writer.transactions_committed
+        def uncached_recent(i):
+            pooled.db.generation += 1 # Same effect on the cache as a committed write
+            pooled.get_recent_sites(15)
+        pooled_samples = _timed(uncached_recent, queries)
+        cached_samples = _timed(lambda i: pooled.get_recent_sites(15), queries)
+        pooled.close()
+
+    print(f"  {'add_visit (per-call connection)':<34} {legacy_rate:10.0f} visits/s")
+    print(f"  {'add_visit (write-behind, WAL)':<34} {pooled_rate:10.0f} visits/s")
+    print(f"  {'transactions (per-call / batched)':<34} {visits:>10} / {transactions}")
+    _report("add_visit call on the GUI thread", enqueue_samples)
+    _report("get_recent_sites (per-call)", legacy_samples)
+    _report("get_recent_sites (long-lived)", pooled_samples)
+    _report("get_recent_sites (cached)", cached_samples)
+
+
+def _populate_history(manager: 'Browser3.HistoryManager', rows: int):
+    """Bulk-inserts synthetic history rows spread over a few thousand domains."""
+    words = ["python", "qt", "browser", "privacy", "tor", "video", "news", "docs", "guide", "forum",
+             "release", "download", "music", "recipe", "weather", "travel", "science", "linux"]
+    def generate():
+        for i in range(rows):
+            domain = f"site{i % 5000}.example.com"
+            title = f"{words[i % len(words)].title()} {words[(i // 7) % len(words)]} article {i}"
+            visits = 1 + i % 40
+            yield (f"https://{domain}/{words[(i // 3) % len(words)]}/{i}", title, domain, "🌐", visits, visits * 100.0)
+    with manager.db.write() as conn:
+        conn.executemany('''
+            INSERT INTO history (url, title, domain, favicon, visit_count, frecency) VALUES (?, ?, ?, ?, ?, ?)
+        ''', generate())
+
+
+def bench_search(rows: int = 500_000, queries: int = 200):
+    """search_history latency on a large history, FTS5 index vs. the LIKE fallback."""
+    print(f"📊 History search benchmark ({rows} rows, {queries} queries)")
+    # Rare terms match a handful of rows, common ones 10-20% of history; two-term queries AND a pair.
+    term_sets = {
+        "rare": ["4242", "site4999", "forum 1234"],
+        "common": ["pyth", "weather", "docs", "video"],
+        "two-term": ["privacy guide", "linux rel", "tor video"],
+    }
+    terms = [term for term_set in term_sets.values() for term in term_set]
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = _make_history_manager(data_dir)
+        start = time.perf_counter()
+        _populate_history(manager, rows)
+        print(f"  {'populate (with FTS triggers)':<34} {time.perf_counter() - start:10.2f} s")
+        if manager.fts_enabled:
+            for kind, term_set in term_sets.items():
+                _report(f"search_history (FTS5, {kind})",
+                        _timed(lambda i: manager.search_history(term_set[i % len(term_set)]), queries))
+        manager.fts_enabled = False
+        _report("search_history (LIKE)", _timed(lambda i: manager.search_history(terms[i % len(terms)]), queries // 10))
+        manager.close()
+
+
+def bench_autocomplete(entries: int = 100_000, queries: int = 2000):
+    """URL bar autocomplete: index build time and per-keystroke query latency."""
+    print(f"📊 Autocomplete benchmark ({entries} entries, {queries} queries)")
+    words = ["python", "qt", "browser", "privacy", "tor", "video", "news", "docs", "guide", "forum",
+             "release", "download", "music", "recipe", "weather", "travel", "science", "linux"]
+    rows = [(f"https://site{i % 7000}.example.com/{words[i % len(words)]}/{i}",
+             f"{words[(i // 5) % len(words)].title()} {words[(i // 11) % len(words)]} {i}",
+             float((i * 7919) % 5000)) for i in range(entries)]
+    bookmarks = [(f"https://bookmark{i}.example.org/", f"Bookmark {i}") for i in range(2000)]
+
+    start = time.perf_counter()
+    index = Browser3.AutocompleteIndex.build(rows, bookmarks)
+    print(f"  {'build':<34} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    # Every prefix of a few typed strings, as the URL bar sees them keystroke by keystroke.
+    typed = ["python guide", "site42", "github.com", "w", "bookmark 17", "linux rel", "zzz"]
+    keystrokes = [text[:n] for text in typed for n in range(1, len(text) + 1)]
+    _report("query (top 8)", _timed(lambda i: index.query(keystrokes[i % len(keystrokes)]), queries))
+    _report("add_visit (incremental)", _timed(
+        lambda i: index.add_visit(f"https://new{i}.example.net/page", f"New page {i}", 100.0), queries))
+
+
+def _make_chrome_history(path: str, rows: int):
+    """Writes a Chrome-style "History" database with the columns the importer reads."""
+    with sqlite3.connect(path) as conn:
+        conn.execute('''
+            CREATE TABLE urls (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR,
+                               visit_count INTEGER, typed_count INTEGER, last_visit_time INTEGER, hidden INTEGER)
+        ''')
+        now = int(time.time() * 1_000_000) + Browser3.CHROME_EPOCH_OFFSET_US
+        conn.executemany('INSERT INTO urls VALUES (?, ?, ?, ?, ?, ?, 0)', (
+            (i, f"https://site{i % 9000}.example.com/article/{i}?ref=feed", f"Article {i} on site {i % 9000}",
+             1 + i % 30, i % 3, now - i * 30_000_000) for i in range(rows)))
+        conn.execute('CREATE INDEX urls_url_index ON urls (url)') # As in Chrome; the importer reads in url order
+
+
+def bench_import(rows: int = 1_000_000):
+    """Streaming import of a Chrome history and NDJSON export/re-import: throughput and peak memory."""
+    print(f"📊 History import/export benchmark ({rows} rows)")
+    with tempfile.TemporaryDirectory() as data_dir:
+        source = os.path.join(data_dir, "History")
+        _make_chrome_history(source, rows)
+        manager = _make_history_manager(data_dir)
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for label, transfer in (
+                ("import Chrome History", lambda: Browser3.HistoryImporter(manager, source)),
+                ("export NDJSON", lambda: Browser3.HistoryExporter(manager, os.path.join(data_dir, "h.ndjson"))),
+                ("re-import NDJSON (all existing)", lambda: Browser3.HistoryImporter(manager, os.path.join(data_dir, "h.ndjson")))):
+            worker = transfer()
+            start = time.perf_counter()
+            worker.run() # Runs the transfer on this thread
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<34} {elapsed:10.2f} s {worker.rows_done / elapsed:12.0f} rows/s")
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+        print(f"  {'peak RSS growth':<34} {growth / 1024:10.1f} MB")
+        manager.close()
+
+
+def _legacy_save_bookmarks(path: str, bookmarks: list):
+    """Mirrors the original save_bookmarks: an indented, in-place rewrite on every change."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(bookmarks, f, indent=2, ensure_ascii=False)
+
+
+def bench_bookmarks(bookmarks: int = 50_000, changes: int = 500):
+    """Bookmarks: migration from bookmarks.json, starring latency and lazy loading of the sidebar tree."""
+    print(f"📊 Bookmark benchmark ({bookmarks} bookmarks, {changes} changes)")
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = os.path.join(data_dir, Browser3.BOOKMARKS_FILE_NAME)
+        existing = [{'url': f"https://bookmark{i}.example.org/page", 'title': f"Bookmark {i}",
+                     'folder': f"Folder {i % 50}", 'added_time': "2024-01-01T00:00:00", 'favicon': "🌐"}
+                    for i in range(bookmarks)]
+        _legacy_save_bookmarks(path, existing)
+
+        legacy = list(existing)
+        def legacy_add(i):
+            url = f"https://new{i}.example.net/"
+            if not any(b['url'] == url for b in legacy):
+                legacy.append({'url': url, 'title': f"New {i}", 'folder': "General"})
+                _legacy_save_bookmarks(path, legacy)
+        legacy_samples = _timed(legacy_add, changes // 10)
+
+        start = time.perf_counter()
+        manager = _make_history_manager(data_dir)
+        print(f"  {'migrate bookmarks.json':<34} {(time.perf_counter() - start) * 1000:10.1f} ms")
+        store = manager.bookmarks
+        _report("is_bookmarked", _timed(lambda i: manager.is_bookmarked(f"https://bookmark{i * 97 % bookmarks}.example.org/page"), changes))
+        _report("add (scan + rewrite)", legacy_samples)
+        _report("add (indexed, write-behind)", _timed(
+            lambda i: manager.add_bookmark(f"https://star{i}.example.net/", f"Star {i}"), changes))
+
+        model = Browser3.BookmarkTreeModel(store)
+        start = time.perf_counter()
+        model.fetchMore(Browser3.QModelIndex())
+        folder = model.index(0, 0)
+        model.fetchMore(folder)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  {'open sidebar + expand one folder':<34} {elapsed:10.1f} ms {len(model._items):8} of {len(store)} rows loaded")
+        manager.close()
+
+
+def _make_bookmark_html(path: str, bookmarks: int):
+    """Writes a Netscape bookmark file with folders nested two levels deep, 100 bookmarks per folder."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+                '<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+        for i in range(bookmarks):
+            if i % 1000 == 0:
+                f.write(('    </DL><p>\n' if i else '') + f'    <DT><H3 ADD_DATE="1700000000">Topic {i // 1000}</H3>\n    <DL><p>\n')
+            if i % 100 == 0:
+                f.write(f'        <DT><H3>Group {i // 100} &amp; more</H3>\n        <DL><p>\n')
+            f.write(f'            <DT><A HREF="https://site{i % 9000}.example.com/article/{i}" ADD_DATE="{1700000000 + i}"'
+                    f' TAGS="news,topic{i % 7}">Article {i} &mdash; site {i % 9000}</A>\n')
+            if i % 100 == 99:
+                f.write('        </DL><p>\n')
+        f.write('    </DL><p>\n</DL><p>\n')
+
+
+def bench_bookmark_import(bookmarks: int = 100_000):
+    """Streaming import of a Netscape bookmark HTML file: throughput and peak memory."""
+    print(f"📊 Bookmark HTML import benchmark ({bookmarks} bookmarks)")
+    with tempfile.TemporaryDirectory() as data_dir:
+        source = os.path.join(data_dir, "bookmarks.html")
+        _make_bookmark_html(source, bookmarks)
+        manager = _make_history_manager(data_dir)
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        importer = Browser3.BookmarkImporter(manager, source, manager.bookmarks.new_folder("Imported"))
+        start = time.perf_counter()
+        importer.run() # Runs the import on this thread
+        elapsed = time.perf_counter() - start
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+        print(f"  {'import':<34} {elapsed:10.2f} s {importer.rows_done / elapsed:12.0f} rows/s")
+        print(f"  {'file size':<34} {os.path.getsize(source) / 1024 / 1024:10.1f} MB")
+        print(f"  {'peak RSS growth':<34} {growth / 1024:10.1f} MB")
+        manager.close()
+
+
+class _SlowSiteHandler(BaseHTTPRequestHandler):
+    """Stand-in web server: answers after a fixed delay; paths starting with /dead are 404s."""
+    delay = 0.05
+
+    def _respond(self):
+        time.sleep(self.delay)
+        self.send_response(404 if self.path.startswith('/dead') else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_link_check(bookmarks: int = 3000, hosts: int = 50):
+    """Bookmark link health check against a local server with 50 ms responses, spread over many loopback hosts."""
+    print(f"📊 Bookmark link check benchmark ({bookmarks} bookmarks, {hosts} hosts)")
+    server = ThreadingHTTPServer(('', 0), _SlowSiteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    class DirectProxy:
+        def get_proxy_config(self):
+            return {"type": "direct"}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = _make_history_manager(data_dir)
+        folder_id = manager.bookmarks.folder_id("Benchmark")
+        for i in range(bookmarks):
+            path = "dead" if i % 10 == 0 else "page"
+            manager.bookmarks.add(f"http://127.0.0.{1 + i % hosts}:{server.server_port}/{path}/{i}", f"Page {i}", folder_id)
+        manager.flush()
+        checker = Browser3.BookmarkLinkChecker(manager, DirectProxy())
+        start = time.perf_counter()
+        checker.run() # Runs the check on this thread
+        elapsed = time.perf_counter() - start
+        print(f"  {'check':<34} {elapsed:10.2f} s {checker.rows_done / elapsed:12.0f} links/s")
+        print(f"  {'broken found':<34} {checker.counts[Browser3.LINK_BROKEN]:10}")
+        print(f"  {'serial HEAD estimate':<34} {bookmarks * _SlowSiteHandler.delay:10.2f} s")
+        manager.close()
+    server.shutdown()
+
+
+def _legacy_favicon_for_domain(domain: str) -> str:
+    """Mirrors the original get_favicon_for_domain: substring scan of the map, then the TLD list."""
+    for key, icon in Browser3.FaviconMatcher.DEFAULT_MAP.items():
+        if '.' in key and key in domain.lower():
+            return icon
+    for tld in ('edu', 'gov', 'org', 'mil', 'news', 'blog', 'shop'):
+        if domain.endswith('.' + tld):
+            return Browser3.FaviconMatcher.DEFAULT_MAP[tld]
+    return '🌐'
+
+
+def bench_favicon(domains: int = 20_000, lookups: int = 500_000):
+    """Domain to favicon lookup: the old linear substring scan against the suffix trie, cold and memoized."""
+    print(f"📊 Favicon lookup benchmark ({domains} domains, {lookups} lookups)")
+    known = ["github.com", "gist.github.com", "scholar.google.com", "en.wikipedia.org", "www.youtube.com"]
+    names = [known[i % len(known)] if i % 4 == 0 else f"www.site{i}.example.com" for i in range(domains)]
+    # Revisits follow browsing habits: a few domains take most visits.
+    visits = [names[(i * i) % 200 if i % 5 else i % domains] for i in range(lookups)]
+
+    def per_lookup(lookup, sequence) -> float:
+        start = time.perf_counter()
+        for domain in sequence:
+            lookup(domain)
+        return (time.perf_counter() - start) / len(sequence) * 1e9
+
+    start = time.perf_counter()
+    matcher = Browser3.FaviconMatcher()
+    print(f"  {'build trie':<34} {(time.perf_counter() - start) * 1000:10.3f} ms")
+    print(f"  {'legacy scan':<34} {per_lookup(_legacy_favicon_for_domain, visits):10.0f} ns/lookup")
+    print(f"  {'trie (no memo)':<34} {per_lookup(matcher._match, visits):10.0f} ns/lookup")
+    print(f"  {'trie + memo':<34} {per_lookup(matcher.lookup, visits):10.0f} ns/lookup")
+    print(f"  {'memo hit rate':<34} {matcher.lookup.cache_info().hits / lookups:10.1%}")
+
+
+def _time_to_load(view, url: str, timeout_ms: int = 10_000) -> float:
+    """Milliseconds from pointing a view at url until it reports loadFinished, or None on timeout."""
+    loop = QEventLoop()
+    view.loadFinished.connect(loop.quit)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    finished = []
+    view.loadFinished.connect(finished.append)
+    start = time.perf_counter()
+    view.setUrl(QUrl(url))
+    loop.exec_()
+    view.loadFinished.disconnect(loop.quit)
+    view.loadFinished.disconnect(finished.append)
+    return (time.perf_counter() - start) * 1000 if finished else None
+
+
+def bench_homepage(rows: int = 100_000, tabs: int = 200):
+    """New tab page: render latency, bytes handed to Chromium per tab, and new tab to loadFinished."""
+    print(f"📊 Homepage benchmark ({rows} history rows, {tabs} new tabs)")
+    app = QApplication.instance() or QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as data_dir:
+        Browser3.BROWSER_DATA_DIR = data_dir
+        services = Browser3.BrowserServices.instance()
+        manager = services.history_manager
+        _populate_history(manager, rows)
+
+        def render_after_change(i):
+            manager.db.generation += 1 # What a committed visit does to the cached homepage
+            services.homepage_html()
+        _report("render (history changed)", _timed(render_after_change, tabs))
+        _report("render (unchanged)", _timed(lambda i: services.homepage_html(), tabs))
+        html = services.homepage_html().encode('utf-8')
+        static_html = (Browser3.HOMEPAGE.head + Browser3.HOMEPAGE.tail).encode('utf-8')
+        assets = sum(len(data) for content_type, data in Browser3.HOMEPAGE.assets.values())
+        print(f"  {'page bytes per new tab':<34} {len(html):10} B")
+        print(f"  {'of which data':<34} {len(html) - len(static_html):10} B")
+        print(f"  {'static assets (compiled once)':<34} {assets:10} B")
+
+        view = Browser3.QWebEngineView()
+        view.setPage(Browser3.EnhancedWebPage(services.profile, None))
+        samples = []
+        for i in range(min(tabs, 50)):
+            elapsed = _time_to_load(view, Browser3.HOMEPAGE_URL)
+            if elapsed is None:
+                break
+            samples.append(elapsed)
+        if samples:
+            _report("new tab to loadFinished", samples)
+        else:
+            print(f"  {'new tab to loadFinished':<34}        n/a (no loadFinished from the web engine)")
+        view.deleteLater()
+        services.shutdown()
+        app.processEvents()
+
+
+def _wait(ms: int):
+    """Runs the event loop for ms milliseconds."""
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec_()
+
+
+def bench_new_tab(tabs: int = 50):
+    """Ctrl+T to first paint: building a start page view from scratch against taking one from the new tab pool."""
+    print(f"📊 New tab benchmark ({tabs} tabs)")
+    app = QApplication.instance() or QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as data_dir:
+        Browser3.BROWSER_DATA_DIR = data_dir
+        window = Browser3.EnhancedNullBrowser()
+        window.show()
+        pool = window.services.new_tab_pool
+
+        def open_tab(preloaded):
+            def run(i):
+                window.add_new_tab(preloaded=preloaded)
+                app.processEvents()
+            return run
+
+        def close_tabs():
+            while window.tabs.count() > 1:
+                view = window.tabs.widget(1)
+                window.tabs.removeTab(1)
+                view.deleteLater()
+            app.processEvents()
+
+        _report("new tab (built on demand)", _timed(open_tab(False), tabs))
+        close_tabs()
+        samples = []
+        for i in range(tabs):
+            pool._fill()
+            if not pool.views:
+                break
+            _wait(300) # Lets the pooled start page load, as it would while the user reads the current tab
+            samples.extend(_timed(open_tab(True), 1))
+        close_tabs()
+        if samples:
+            _report("new tab (from the pool)", samples)
+        else:
+            print(f"  {'new tab (from the pool)':<34}        n/a (pool disabled or over its memory limit)")
+        memory_mb = Browser3.process_memory_mb()
+        if memory_mb is not None:
+            print(f"  {'browser + web processes':<34} {memory_mb:10.0f} MiB")
+        window.services.shutdown()
+        window.deleteLater()
+        app.processEvents()
+
+
+def bench_thumbnails(loads: int = 2000, captures: int = 20):
+    """Start page thumbnails: cost added to each loadFinished, GUI-thread grab time and off-thread encode time."""
+    print(f"📊 Thumbnail benchmark ({loads} page loads, {captures} captures)")
+    app = QApplication.instance() or QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as data_dir:
+        Browser3.BROWSER_DATA_DIR = data_dir
+        window = Browser3.EnhancedNullBrowser()
+        window.resize(1400, 900)
+        window.show()
+        thumbnails = window.history_manager.thumbnails
+        view = window.add_new_tab("https://example.com/")
+        app.processEvents()
+        _report("request() per loadFinished", [ms * 1000 for ms in _timed(lambda i: thumbnails.request(view), loads)], "µs")
+        size = Browser3.THUMBNAIL_SIZE
+        rect = Browser3.QRect(0, 0, view.width(), view.width() * size.height() // size.width())
+        images = []
+        _report("grab() on the GUI thread", _timed(lambda i: images.append(view.grab(rect).toImage()), captures))
+        _report(f"scale + {thumbnails.format} encode (worker)",
+                _timed(lambda i: thumbnails._encode(0, f"https://example.com/{i}", images[i]), captures))
+        window.services.shutdown()
+        window.deleteLater()
+        app.processEvents()
+
+
+def _legacy_refresh_history_list(history_list, manager: 'Browser3.HistoryManager'):
+    """Mirrors the original _refresh_history_list, run on every loadFinished: clear, query, rebuild every item."""
+    history_list.clear()
+    for site in manager.get_recent_sites(10):
+        icon = manager.icons.icon(site.domain)
+        item = QListWidgetItem(site.title if icon else f"{site.favicon} {site.title}")
+        if icon:
+            item.setIcon(icon)
+        item.setData(Browser3.Qt.UserRole, site.url)
+        history_list.addItem(item)
+
+
+def bench_sidebar(rows: int = 100_000, visits: int = 2000):
+    """Sidebar history list per visit: rebuilding the QListWidget against the incremental model, shown and hidden."""
+    print(f"📊 Sidebar benchmark ({rows} history rows, {visits} visits)")
+    _application()
+    with tempfile.TemporaryDirectory() as data_dir:
+        Browser3.BROWSER_DATA_DIR = data_dir
+        manager = _make_history_manager(data_dir)
+        _populate_history(manager, rows)
+        urls = [f"https://site{i % 500}.example/page" for i in range(visits)]
+
+        history_list = QListWidget()
+        def legacy(i):
+            manager.add_visit(urls[i], "Page")
+            manager.db.generation += 1 # The committed visit invalidates the cached query
+            _legacy_refresh_history_list(history_list, manager)
+        _report("rebuild on each page load", _timed(legacy, visits))
+
+        model = Browser3.RecentHistoryModel(manager)
+        view = Browser3.QListView()
+        view.setModel(model)
+        model.set_active(True)
+        _report("incremental model, shown", [ms * 1000 for ms in _timed(lambda i: manager.add_visit(urls[i], "Page"), visits)], "µs")
+        model.set_active(False)
+        _report("incremental model, hidden", [ms * 1000 for ms in _timed(lambda i: manager.add_visit(urls[i], "Page"), visits)], "µs")
+        manager.close()
+
+
+def bench_history_dialog(rows: int = 500_000, sessions: int = 20):
+    """History dialog search: GUI-thread time per keystroke and time until the first results show."""
+    print(f"📊 History dialog benchmark ({rows} rows, {sessions} typed queries)")
+    app = QApplication.instance() or QApplication(sys.argv)
+    queries = ["privacy guide", "site42", "linux rel", "weather", "tor video", "forum 123"]
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = _make_history_manager(data_dir)
+        _populate_history(manager, rows)
+        for fts in ([True, False] if manager.fts_enabled else [False]):
+            manager.fts_enabled = fts
+            label = "FTS5" if fts else "LIKE"
+            query = queries[0]
+            _report(f"old: per keystroke ({label})",
+                    _timed(lambda i: manager.search_history(query[:i % len(query) + 1], 100), len(query) * 2))
+            dialog = Browser3.HistoryDialog(None, manager)
+            keystrokes, first_results = [], []
+            for i in range(sessions if fts else max(sessions // 5, 1)):
+                query = queries[i % len(queries)]
+                dialog.search_input.clear()
+                app.processEvents()
+                loop = QEventLoop()
+                shown = []
+                def on_rows(*args):
+                    if not shown:
+                        shown.append(time.perf_counter())
+                        loop.quit()
+                dialog.history_model.rowsInserted.connect(on_rows)
+                start = time.perf_counter()
+                for n in range(1, len(query) + 1):
+                    keystrokes.extend(_timed(lambda j: dialog.search_input.setText(query[:n]), 1))
+                    app.processEvents()
+                QTimer.singleShot(10_000, loop.quit)
+                loop.exec_()
+                dialog.history_model.rowsInserted.disconnect(on_rows)
+                if shown:
+                    first_results.append((shown[0] - start) * 1000)
+            _report(f"new: GUI per keystroke ({label})", keystrokes)
+            if first_results:
+                _report(f"new: typing to results ({label})", first_results)
+            dialog.done(0)
+        manager.close()
+
+
+def bench_history_browser(rows: int = 1_000_000):
+    """History dialog browsing: opening, scrolling to the oldest entry and back, against OFFSET paging."""
+    print(f"📊 History browser benchmark ({rows} rows)")
+    app = QApplication.instance() or QApplication(sys.argv)
+    page = Browser3.HISTORY_BROWSER_PAGE
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = _make_history_manager(data_dir)
+        _populate_history(manager, rows)
+        conn = manager.db.read()
+        depths = range(0, rows, max(rows // 50, page))
+        _report("old: OFFSET page, same depths", _timed(lambda i: conn.execute(
+            "SELECT url, title FROM history ORDER BY visit_time DESC, id DESC LIMIT ? OFFSET ?",
+            (page, depths[i])).fetchall(), len(depths)))
+
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        dialog = Browser3.HistoryDialog(None, manager)
+        app.processEvents()
+        print(f"  {'open dialog':<34} {(time.perf_counter() - start) * 1000:10.2f} ms")
+        model = dialog.browser_model
+        fetches = []
+        while model.canFetchMore(QModelIndex()):
+            fetches.extend(_timed(lambda i: model.fetchMore(QModelIndex()), 1))
+        _report("new: keyset page (fetchMore)", fetches)
+        total = model.rowCount()
+        _report("new: scroll back, evicted page", _timed(lambda i: model.index(total * (50 - i) // 51).data(), 50))
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+        print(f"  {'peak RSS growth, all rows':<34} {growth / 1024:10.1f} MB")
+        dialog.done(0)
+        manager.close()
+
+
+def bench_bulk_delete(rows: int = 500_000, urls: int = 5000, visits_per_url: int = 10):
+    """Deleting a domain's history: one delete_history_entry per URL against the set-based domain delete."""
+    print(f"📊 Bulk history delete benchmark ({rows} rows, {urls} URLs x {visits_per_url} visits per domain)")
+    _application()
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = _make_history_manager(data_dir)
+        _populate_history(manager, rows)
+        step = rows // urls
+        with manager.db.write() as conn:
+            # Give each of a few domains urls entries spread over the whole table, and visits_per_url visits each.
+            for n, domain in enumerate(["old.example", "bulk.example", "www.forget.example"]):
+                conn.execute("UPDATE history SET domain = ?, url = 'https://' || ? || '/' || id WHERE id % ? = ?",
+                             (domain, domain, step, n + 1))
+            conn.executemany("""
+                INSERT INTO visits (url_id, visit_time)
+                SELECT id, visit_time - ? FROM history WHERE domain IN ('old.example', 'bulk.example', 'www.forget.example')
+            """, [(n,) for n in range(visits_per_url)])
+        old = [row[0] for row in manager.db.read().execute(
+            "SELECT url FROM history WHERE domain = 'old.example' LIMIT 200")]
+        samples = _timed(lambda i: manager.delete_history_entry(old[i]), len(old))
+        _report("old: delete_history_entry per URL", samples)
+        print(f"  {'old: whole domain, estimated':<34} {statistics.median(samples) * urls / 1000:10.2f} s")
+        for label, delete in (("new: delete all from domain", lambda: manager.delete_domain_history(["bulk.example"])),
+                              ("new: forget site", lambda: manager.forget_site("forget.example"))):
+            start = time.perf_counter()
+            deleted = len(delete())
+            print(f"  {label:<34} {time.perf_counter() - start:10.3f} s  ({deleted} URLs, {deleted * visits_per_url} visits)")
+        manager.close()
+
+
+BENCHMARKS = {
+    "history": bench_history,
+    "search": bench_search,
+    "autocomplete": bench_autocomplete,
+    "import": bench_import,
+    "bookmarks": bench_bookmarks,
+    "bookmark_import": bench_bookmark_import,
+    "link_check": bench_link_check,
+    "favicon": bench_favicon,
+    "homepage": bench_homepage,
+    "new_tab": bench_new_tab,
+    "thumbnails": bench_thumbnails,
+    "sidebar": bench_sidebar,
+    "history_dialog": bench_history_dialog,
+    "history_browser": bench_history_browser,
+    "bulk_delete": bench_bulk_delete,
+}
+
+
+def main():
+    """Runs the benchmarks named on the command line, or all of them."""
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main()
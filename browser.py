@@ -2,6 +2,8 @@ import sys
 import socket
 import json
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from urllib.parse import urlparse
 from PyQt5.QtCore import QUrl, pyqtSignal, QObject
@@ -13,6 +15,9 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage, QWebEngineProfile
 
+HISTORY_LIMIT = 50  # Entries kept (and shown on the homepage)
+HISTORY_COMPACT_BYTES = 256 * 1024  # Journal size that triggers a background compaction
+
 # Check if TOR is running
 def is_tor_running():
     try:
@@ -23,9 +28,21 @@ def is_tor_running():
         return False
 
 class HistoryManager:
-    def __init__(self):
-        self.history_file = os.path.join(os.path.expanduser("~"), ".null_browser_history.json")
-        self.history = self.load_history()
+    # History is an append-only journal: one JSON line per visit, or {"event": "clear"}.
+    # Replaying it gives the entries; it is rewritten from memory once it grows past HISTORY_COMPACT_BYTES
+    # (or twice its compacted size, for large limits).
+    def __init__(self, limit=HISTORY_LIMIT):
+        self.history_file = os.path.join(os.path.expanduser("~"), ".null_browser_history.jsonl")
+        self.legacy_file = os.path.join(os.path.expanduser("~"), ".null_browser_history.json")
+        self.limit = limit
+        self.entries = OrderedDict()  # url -> visit, oldest first
+        self.lock = threading.Lock()
+        self.journal = None
+        self.compactor = None
+        self.pending = []  # Lines appended while a compaction runs
+        self.compacted_size = 0
+        self.generation = 0  # Bumped by clear_history; a compaction of an older generation is discarded
+        self.load_history()
         self.shortcuts = [
             {"name": "Proton Mail", "url": "https://mail.proton.me/u/0/inbox", "icon": "📧"},
             {"name": "YouTube", "url": "https://youtube.com", "icon": "📺"},
@@ -37,34 +54,119 @@ class HistoryManager:
             {"name": "Amazon", "url": "https://amazon.com", "icon": "📦"}
         ]
 
+    @property
+    def history(self):
+        return list(reversed(self.entries.values()))
+
     def load_history(self):
+        rewrite = False
         try:
             if os.path.exists(self.history_file):
                 with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    for line in f:
+                        try:
+                            self.apply_event(json.loads(line))
+                        except (ValueError, KeyError):
+                            rewrite = True  # Torn last line from a crash
+                self.compacted_size = os.path.getsize(self.history_file)
+                rewrite = rewrite or self.compacted_size > HISTORY_COMPACT_BYTES
+            elif os.path.exists(self.legacy_file):
+                # Pre-journal history: a JSON list, newest first
+                with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                    for visit in reversed(json.load(f)):
+                        self.apply_event(visit)
+                rewrite = True
         except Exception as e:
             print(f"Error loading history: {e}")
-        return []
+        if rewrite:
+            self.compact(list(self.entries.values()), self.generation)
+        try:
+            self.journal = open(self.history_file, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"Error opening history journal: {e}")
 
-    def save_history(self):
+    def apply_event(self, event):
+        if event.get('event') == 'clear':
+            self.entries.clear()
+            return
+        self.entries.pop(event['url'], None)
+        self.entries[event['url']] = event
+        while len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+
+    def append_event(self, event):
+        # Caller holds self.lock
+        line = json.dumps(event, ensure_ascii=False) + '\n'
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, indent=2, ensure_ascii=False)
+            self.journal.write(line)
+            self.journal.flush()
         except Exception as e:
             print(f"Error saving history: {e}")
+            return
+        if self.compactor:
+            self.pending.append(line)
+        elif self.journal.tell() > max(HISTORY_COMPACT_BYTES, 2 * self.compacted_size):
+            self.pending = []
+            self.compactor = threading.Thread(target=self.compact, args=(list(self.entries.values()), self.generation),
+                                              daemon=True)
+            self.compactor.start()
+
+    def compact(self, snapshot, generation):
+        # Write the snapshot beside the journal, then swap it in with the lines appended meanwhile.
+        # The caller registers as self.compactor (with self.pending emptied) when taking the snapshot.
+        temp_file = self.history_file + '.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                for visit in snapshot:
+                    f.write(json.dumps(visit, ensure_ascii=False) + '\n')
+            with self.lock:
+                if generation != self.generation:
+                    os.remove(temp_file)  # History was cleared meanwhile; the snapshot must not come back
+                    return
+                with open(temp_file, 'a', encoding='utf-8') as f:
+                    f.writelines(self.pending)
+                    f.flush()
+                    os.fsync(f.fileno())
+                reopen = self.journal is not None
+                if reopen:
+                    self.journal.close()  # Windows can't replace a file that is open
+                try:
+                    os.replace(temp_file, self.history_file)
+                    self.compacted_size = os.path.getsize(self.history_file)
+                finally:
+                    if reopen:
+                        self.journal = open(self.history_file, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"Error compacting history: {e}")
+        finally:
+            with self.lock:
+                self.pending = []
+                self.compactor = None
+
+    def save_history(self):
+        # Called on exit: wait for a running compaction, then leave a compact journal behind
+        while True:
+            with self.lock:
+                compactor = self.compactor
+                if compactor is None:
+                    # Register like a background compaction, so visits journalled meanwhile are kept
+                    snapshot = list(self.entries.values())
+                    generation = self.generation
+                    self.pending = []
+                    self.compactor = threading.current_thread()
+                    break
+            compactor.join()
+        self.compact(snapshot, generation)
 
     def add_visit(self, url, title):
         if not url or url.startswith('data:') or url.startswith('about:'):
             return
         
-        # Remove existing entry for same URL
-        self.history = [item for item in self.history if item.get('url') != url]
-        
         # Get favicon (simplified)
         domain = urlparse(url).netloc.lower()
         favicon = self.get_favicon_for_domain(domain)
         
-        # Add new entry at the beginning
+        # Move the entry to the newest end and journal it
         visit = {
             'title': title or domain,
             'url': url,
@@ -73,13 +175,9 @@ class HistoryManager:
             'domain': domain
         }
         
-        self.history.insert(0, visit)
-        
-        # Keep only last 50 entries
-        self.history = self.history[:50]
-        
-        # Save to file
-        self.save_history()
+        with self.lock:
+            self.apply_event(visit)
+            self.append_event(visit)
 
     def get_favicon_for_domain(self, domain):
         # Map common domains to emoji favicons
@@ -122,11 +220,33 @@ class HistoryManager:
             return '🌐'
 
     def clear_history(self):
-        self.history = []
-        self.save_history()
+        # Empty the journal right away, so no cleared visit stays on disk until the next compaction
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+            self.pending = []
+            try:
+                if self.journal is not None:
+                    self.journal.seek(0)
+                    self.journal.truncate()
+                    self.journal.flush()
+                    os.fsync(self.journal.fileno())
+                else:
+                    open(self.history_file, 'w', encoding='utf-8').close()
+                self.compacted_size = 0
+                if os.path.exists(self.legacy_file):
+                    os.remove(self.legacy_file)  # Pre-journal history is only read when the journal is missing
+            except Exception as e:
+                print(f"Error clearing history: {e}")
 
     def get_recent_sites(self, limit=10):
-        return self.history[:limit]
+        with self.lock:
+            recent = []
+            for visit in reversed(self.entries.values()):
+                if len(recent) == limit:
+                    break
+                recent.append(visit)
+            return recent
 
 class CustomWebPage(QWebEnginePage):
     def __init__(self, profile, browser_instance):
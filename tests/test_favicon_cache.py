@@ -0,0 +1,128 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QBuffer, QIODevice
+from PyQt5.QtGui import QColor, QIcon, QImage, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+import Browser3
+
+
+def _png(color: str) -> bytes:
+    image = QImage(16, 16, QImage.Format_ARGB32)
+    image.fill(QColor(color))
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(buffer.data())
+
+
+class _IconHandler(BaseHTTPRequestHandler):
+    """Serves a solid PNG for /<color>.ico, as a site's favicon URL would."""
+    def do_GET(self):
+        body = _png(self.path.strip('/').split('.')[0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FaviconCacheTest(unittest.TestCase):
+    """FaviconCache storing icons fetched from a local server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _IconHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        Browser3.BROWSER_DATA_DIR = self.data_dir.name
+        self.manager = Browser3.HistoryManager()
+        self.addCleanup(self.manager.close)
+        self.cache = self.manager.icons
+
+    def _fetch(self, path: str) -> QIcon:
+        pixmap = QPixmap()
+        with urllib.request.urlopen(self.base + path) as response:
+            pixmap.loadFromData(response.read())
+        return QIcon(pixmap)
+
+    def _store(self, page_url: str, path: str) -> QIcon:
+        icon = self._fetch(path)
+        self.cache.store(page_url, self.base + path, icon)
+        return icon
+
+    def _files(self) -> dict:
+        """Icon files on disk, by name, once the writer has caught up."""
+        self.manager.flush()
+        files = {}
+        for name in os.listdir(self.cache.directory):
+            with open(os.path.join(self.cache.directory, name), 'rb') as f:
+                files[name] = f.read()
+        return files
+
+    def test_files_are_named_by_sha256(self):
+        """Each stored icon is one PNG file named by the SHA-256 of its contents."""
+        self._store("https://red.example/", "/red.ico")
+        files = self._files()
+        self.assertEqual(len(files), 1)
+        name, data = next(iter(files.items()))
+        self.assertTrue(data.startswith(b'\x89PNG'))
+        self.assertEqual(name, hashlib.sha256(data).hexdigest() + '.png')
+        self.assertEqual(self.cache.read("red.example"), data)
+
+    def test_hosts_share_one_file(self):
+        """Hosts showing the same icon, from the same or different icon URLs, share one file."""
+        self._store("https://a.example/", "/red.ico")
+        self._store("https://b.example/", "/red.ico")
+        self.cache.store("https://c.example/", self.base + "/copy/red.ico", self._fetch("/red.ico"))
+        self.assertEqual(len(self._files()), 1)
+        self.assertEqual(len(self.cache), 1)
+        for host in ("a.example", "b.example", "c.example"):
+            self.assertIsNotNone(self.cache.icon(host), host)
+        hosts = self.manager.db.read().execute('SELECT COUNT(DISTINCT hash), COUNT(*) FROM favicon_hosts').fetchone()
+        self.assertEqual(hosts, (1, 3))
+
+    def test_least_recently_used_evicted_past_max_bytes(self):
+        """Past max_bytes the least recently used icon goes, with its file and the hosts using it."""
+        self._store("https://red.example/", "/red.ico")
+        self._store("https://blue.example/", "/blue.ico")
+        self._store("https://red.example/other", "/red.ico") # Red is now used more recently than blue
+        green = self._fetch("/green.ico")
+        red_size = len(self._files()[self.cache._hosts["red.example"] + '.png'])
+        self.cache.max_bytes = red_size + len(Browser3.FaviconCache._encode(green))
+        self.cache.store("https://green.example/", self.base + "/green.ico", green)
+
+        self.assertIsNone(self.cache.icon("blue.example"))
+        self.assertIsNotNone(self.cache.icon("red.example"))
+        self.assertIsNotNone(self.cache.icon("green.example"))
+        files = self._files()
+        self.assertEqual(set(files), {self.cache._hosts[host] + '.png' for host in ("red.example", "green.example")})
+        self.assertLessEqual(sum(map(len, files.values())), self.cache.max_bytes)
+        rows = self.manager.db.read().execute('SELECT host FROM favicon_hosts ORDER BY host').fetchall()
+        self.assertEqual(rows, [("green.example",), ("red.example",)])
+
+
+if __name__ == '__main__':
+    unittest.main()
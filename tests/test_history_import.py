@@ -0,0 +1,84 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+import Browser3
+
+
+class HistoryImportTest(unittest.TestCase):
+    """HistoryImporter on NDJSON files."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        Browser3.BROWSER_DATA_DIR = self.data_dir.name
+        self.manager = Browser3.HistoryManager()
+        self.addCleanup(self.manager.close)
+
+    def _write_file(self, name: str, lines: list) -> str:
+        path = os.path.join(self.data_dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in lines)
+        return path
+
+    def _import(self, path: str) -> tuple:
+        importer = Browser3.HistoryImporter(self.manager, path)
+        results = []
+        importer.transfer_finished.connect(lambda success, message: results.append((success, message)))
+        importer.run() # Runs the import on this thread
+        return results[0]
+
+    def test_non_object_lines_are_skipped(self):
+        """Lines holding JSON scalars, lists or broken JSON are counted and the rest is imported."""
+        path = self._write_file('mixed.ndjson', [
+            json.dumps({'url': 'https://one.example/', 'title': 'One'}),
+            '[1, 2]', '"text"', '5', 'null', '{broken',
+            json.dumps({'url': 'https://two.example/', 'title': 'Two'})])
+        success, message = self._import(path)
+        self.assertTrue(success)
+        self.assertIn("Skipped 5", message)
+        urls = {row[0] for row in self.manager.db.read().execute('SELECT url FROM history')}
+        self.assertEqual(urls, {'https://one.example/', 'https://two.example/'})
+
+    def test_scalar_first_line_is_rejected(self):
+        """detect_source raises ValueError rather than TypeError for a file that is not JSON objects."""
+        for first in ('5', '"text"', 'null', '{broken'):
+            path = self._write_file('scalar.ndjson', [first])
+            with self.assertRaises(ValueError):
+                Browser3.HistoryImporter.detect_source(path)
+
+    def test_merge_keeps_fts_consistent(self):
+        """Re-importing newer titles over existing entries updates the full-text index."""
+        if not self.manager.fts_enabled:
+            self.skipTest("SQLite has no FTS5")
+        now = int(time.time() * 1_000_000)
+        self._import(self._write_file('first.ndjson', [
+            json.dumps({'url': f'https://site.example/{i}', 'title': f'Alpha {i}', 'visit_time': now - 1000})
+            for i in range(50)]))
+        self._import(self._write_file('second.ndjson', [
+            json.dumps({'url': f'https://site.example/{i}', 'title': f'Bravo {i}', 'visit_time': now})
+            for i in range(0, 50, 2)]))
+        with self.manager.db.write() as conn:
+            try:
+                conn.execute("INSERT INTO history_fts(history_fts, rank) VALUES ('integrity-check', 1)")
+            except sqlite3.DatabaseError as e:
+                self.fail(f"FTS index out of sync: {e}")
+            bravo = conn.execute("SELECT COUNT(*) FROM history_fts WHERE history_fts MATCH 'bravo'").fetchone()[0]
+            alpha = conn.execute("SELECT COUNT(*) FROM history_fts WHERE history_fts MATCH 'alpha'").fetchone()[0]
+        self.assertEqual((bravo, alpha), (25, 25))
+
+
+if __name__ == '__main__':
+    unittest.main()
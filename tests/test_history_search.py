@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+import Browser3
+
+
+class HistorySearchTest(unittest.TestCase):
+    """search_history on the FTS5 index."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        Browser3.BROWSER_DATA_DIR = self.data_dir.name
+        self.manager = Browser3.HistoryManager()
+        self.addCleanup(self.manager.close)
+        if not self.manager.fts_enabled:
+            self.skipTest("SQLite has no FTS5")
+
+    def test_old_frequent_entry_beats_newer_matches(self):
+        """An entry inserted long ago but visited often is found past FTS_CANDIDATE_LIMIT newer matches."""
+        now = int(time.time() * 1_000_000)
+        newer = Browser3.FTS_CANDIDATE_LIMIT + 100
+        with self.manager.db.write() as conn:
+            conn.execute('''
+                INSERT INTO history (url, title, domain, favicon, visit_time, visit_count, frecency)
+                VALUES ('https://wiki.example/daily', 'Daily recipes', 'wiki.example', '🌐', ?, 400, 40000.0)
+            ''', (now - 3600 * 1_000_000,))
+            conn.executemany('''
+                INSERT INTO history (url, title, domain, favicon, visit_time, visit_count, frecency)
+                VALUES (?, ?, 'blog.example', '🌐', ?, 1, 100.0)
+            ''', [(f'https://blog.example/{i}', f'Recipes {i}', now - i) for i in range(newer)])
+        urls = [entry.url for entry in self.manager.search_history("recipes", 20)]
+        self.assertIn('https://wiki.example/daily', urls)
+        self.assertEqual(urls[0], 'https://wiki.example/daily')
+
+    def test_limit_beyond_candidate_limit(self):
+        """A search asking for more than FTS_CANDIDATE_LIMIT rows gets them."""
+        with self.manager.db.write() as conn:
+            conn.executemany('''
+                INSERT INTO history (url, title, domain, favicon, visit_count, frecency)
+                VALUES (?, 'Forum thread', 'forum.example', '🌐', 1, 100.0)
+            ''', [(f'https://forum.example/{i}',) for i in range(Browser3.FTS_CANDIDATE_LIMIT * 2)])
+        limit = Browser3.FTS_CANDIDATE_LIMIT + 50
+        self.assertEqual(len(self.manager.search_history("forum", limit)), limit)
+
+
+if __name__ == '__main__':
+    unittest.main()
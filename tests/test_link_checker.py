@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+import Browser3
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in web server, as benchmark.py's _SlowSiteHandler: /no-head refuses HEAD with 405, /loop redirects
+    to itself and anything else is a 200. Every request is recorded as (method, path).
+    """
+    requests = []
+
+    def _respond(self):
+        self.requests.append((self.command, self.path))
+        if self.path == '/no-head' and self.command == 'HEAD':
+            self.send_response(405)
+        elif self.path == '/loop':
+            self.send_response(302)
+            self.send_header('Location', '/loop')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class _DirectProxy:
+    def get_proxy_config(self):
+        return {"type": "direct"}
+
+
+class BookmarkLinkCheckerTest(unittest.TestCase):
+    """BookmarkLinkChecker against a local server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication(sys.argv)
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _SiteHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        Browser3.BROWSER_DATA_DIR = self.data_dir.name
+        self.manager = Browser3.HistoryManager()
+        self.addCleanup(self.manager.close)
+        _SiteHandler.requests = []
+
+    def _bookmark(self, *paths: str):
+        folder_id = self.manager.bookmarks.folder_id("Links")
+        for path in paths:
+            self.manager.bookmarks.add(self.base + path, path, folder_id)
+        self.manager.flush()
+
+    def _check(self, force: bool = False) -> Browser3.BookmarkLinkChecker:
+        checker = Browser3.BookmarkLinkChecker(self.manager, _DirectProxy(), force)
+        checker.run() # Runs the check on this thread
+        return checker
+
+    def _result(self, path: str) -> tuple:
+        return self.manager.db.read().execute('SELECT state, status, final_url FROM link_checks WHERE url = ?',
+                                              (self.base + path,)).fetchone()
+
+    def test_head_refused_retried_as_get(self):
+        """A server answering HEAD with 405 is asked again with GET, and the link is ok."""
+        self._bookmark('/no-head')
+        self._check()
+        self.assertEqual(_SiteHandler.requests, [('HEAD', '/no-head'), ('GET', '/no-head')])
+        self.assertEqual(self._result('/no-head'), (Browser3.LINK_OK, 200, None))
+
+    def test_redirect_loop_is_broken(self):
+        """A redirect loop is followed LINK_CHECK_MAX_REDIRECTS times, then classified as broken."""
+        self._bookmark('/loop')
+        checker = self._check()
+        self.assertEqual(len(_SiteHandler.requests), Browser3.LINK_CHECK_MAX_REDIRECTS + 1)
+        self.assertEqual(self._result('/loop')[:2], (Browser3.LINK_BROKEN, 302))
+        self.assertEqual(checker.counts[Browser3.LINK_BROKEN], 1)
+
+    def test_fresh_results_reused_unless_forced(self):
+        """Links checked within LINK_CHECK_TTL_S are skipped; a forced check requests them again."""
+        self._bookmark('/page', '/no-head')
+        self.assertEqual(self._check().rows_done, 2)
+        requests = len(_SiteHandler.requests)
+
+        self.assertEqual(self._check().rows_done, 0)
+        self.assertEqual(len(_SiteHandler.requests), requests)
+
+        self.assertEqual(self._check(force=True).rows_done, 2)
+        self.assertEqual(len(_SiteHandler.requests), requests * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()